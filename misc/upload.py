@@ -1,6 +1,6 @@
 #!/usr/bin/python3
 
-# usage: tpng.py [-h] --json JSON --m4a M4A --token TOKEN --url URL
+# usage: tpng.py [-h] --json JSON --m4a M4A --token TOKEN --url URL [--stream]
 
 # Process some integers.
 
@@ -10,6 +10,7 @@
 #   --m4a M4A      The M4A audio file
 #   --token TOKEN  The System recorder token
 #   --url URL      The url to TP-NG ie http://panik.io
+#   --stream       Upload the audio as multipart/form-data instead of base64
 
 
 import json, base64, requests, time, argparse
@@ -19,6 +20,7 @@ parser.add_argument('--json', type=str, help='The json file to send', required=T
 parser.add_argument('--m4a', type=str, help='The M4A audio file', required=True)
 parser.add_argument('--token', type=str, help='The System recorder token', required=True)
 parser.add_argument('--url', type=str, help='The url to TP-NG API ie http://panik.io/apiv1', required=True)
+parser.add_argument('--stream', action='store_true', help='Upload the audio as multipart/form-data instead of base64')
 
 args = parser.parse_args()
 
@@ -30,22 +32,34 @@ URL = args.url
 with open(JSON, "r") as FILE:
         DATA = json.load(FILE)
 
-with open(M4A, "rb") as FILE:
+name = M4A.split("/")[-1]
+
+if args.stream:
+    def send():
+        with open(M4A, "rb") as AUDIO:
+            return requests.post(
+                f"{URL.rstrip('/')}/radio/transmission/create/stream",
+                data={"recorder": Recordertoken, "json": json.dumps(DATA), "name": name},
+                files={"audio_file": (name, AUDIO, "audio/mp4")},
+            )
+else:
+    with open(M4A, "rb") as FILE:
         AUDIO = base64.b64encode(FILE.read())
 
-name = M4A.split("/")[-1]
+    payload = {
+            "recorder": Recordertoken,
+            "json": DATA,
+            "name": name,
+            "audio_file": AUDIO.decode()
+    }
 
-payload = {
-        "recorder": Recordertoken,
-        "json": DATA,
-        "name": name,
-        "audio_file": AUDIO.decode()
-}
+    def send():
+        return requests.post(f"{URL.rstrip('/')}/radio/transmission/create", json=payload)
 
 try:
-    Request = requests.post(f"{URL.rstrip('/')}/radio/transmission/create", json=payload)
+    Request = send()
 except:
-    Request = requests.post(f"{URL.rstrip('/')}/radio/transmission/create", json=payload)
+    Request = send()
 
 if Request.ok:
     print(Request.text)
@@ -54,9 +68,9 @@ print(Request.text)
 i =0
 while not Request.ok:
     print(f"[*] RE-TRYING TX {name}")
-    Request = requests.post(f"{URL.rstrip('/')}/radio/transmission/create", json=payload)
+    Request = send()
     time.sleep(5)
     i += 1
     if i >= 5:
        print(f"[!] FAILED RE-TRYING TX {name}")
-       break
\ No newline at end of file
+       break
@@ -0,0 +1,114 @@
+import json
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+import paho.mqtt.client as mqtt
+
+from mqtt.utils.mqtt_client import MqttServerClient
+from mqtt.utils.routing import transmission_topics
+from mqtt.utils.standin_broker import StandInBroker
+
+class Command(BaseCommand):
+    help = 'Measures sustained MQTT publish rates against a local mosquitto stand-in'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=5000, help='Transmissions published through the pooled client')
+        parser.add_argument('--legacy-messages', type=int, default=200, help='Transmissions published connecting per message')
+        parser.add_argument('--qos', type=int, nargs='+', default=[0, 1], help='QoS levels to measure')
+        parser.add_argument('--host', type=str, default=None, help='Benchmark a real broker instead of the stand-in')
+        parser.add_argument('--port', type=int, default=1883)
+
+    def _transmission(self) -> tuple[dict, bytes]:
+        _transmission = {
+            "UUID": str(uuid.uuid4()),
+            "system": str(uuid.uuid4()),
+            "system_name": "Benchmark",
+            "recorder": {"site_id": "1", "name": "bench"},
+            "talkgroup": {
+                "UUID": str(uuid.uuid4()),
+                "alpha_tag": "Bench Dispatch",
+                "agency": [{"UUID": str(uuid.uuid4()), "name": "Bench Fire"}],
+            },
+            "units": [],
+        }
+        return _transmission, json.dumps(_transmission).encode()
+
+    def _received(self, broker) -> int:
+        return broker.received if broker is not None else 0
+
+    def _wait_for(self, broker, expected: int, timeout: float = 30) -> None:
+        if broker is None:
+            return
+        deadline = time.monotonic() + timeout
+        while broker.received < expected and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def _legacy(self, host: str, port: int, count: int, qos: int, topics: list, payload: bytes, broker) -> tuple:
+        # What mqtt_client.new_tx did: a new client per message, publish without a network loop
+        before = self._received(broker)
+        clients = []
+        start = time.perf_counter()
+        for _ in range(count):
+            client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id=f"tpng--{uuid.uuid4()}")
+            client.connect(host=host, port=port, keepalive=60)
+            for topic in topics:
+                client.publish(topic=topic, payload=payload, qos=qos)
+            clients.append(client)
+        elapsed = time.perf_counter() - start
+
+        self._wait_for(broker, before + count * len(topics), timeout=2)
+        received = self._received(broker) - before
+        for client in clients:
+            client.disconnect()
+        return elapsed, received
+
+    def _pooled(self, host: str, port: int, count: int, qos: int, topics: list, payload: bytes, broker) -> tuple:
+        before = self._received(broker)
+        client = MqttServerClient(
+            uuid.uuid4(), "benchmark", (host, port, 60, None, None),
+            qos=qos, max_queue=1000, max_inflight=100,
+        )
+        client.start()
+        while not client.connected:
+            time.sleep(0.01)
+
+        start = time.perf_counter()
+        for _ in range(count):
+            client.submit(topics, payload)
+        client.queue.join()
+        while qos and client.published < count * len(topics):
+            time.sleep(0.001)
+        elapsed = time.perf_counter() - start
+
+        self._wait_for(broker, before + count * len(topics))
+        received = self._received(broker) - before
+        client.stop()
+        return elapsed, received
+
+    def handle(self, *args, **options):
+        broker = None
+        host, port = options['host'], options['port']
+        if host is None:
+            broker = StandInBroker().start()
+            host, port = broker.host, broker.port
+
+        _transmission, payload = self._transmission()
+        topics = transmission_topics(_transmission, set(), set())
+
+        self.stdout.write(f"{len(topics)} topics per transmission, {len(payload)} byte payload, broker {host}:{port}")
+        self.stdout.write(f"{'mode':<10} {'qos':>3} {'sent':>8} {'received':>9} {'msg/s':>10}")
+        try:
+            for qos in options['qos']:
+                for mode, runner, count in (
+                    ('legacy', self._legacy, options['legacy_messages']),
+                    ('pooled', self._pooled, options['messages']),
+                ):
+                    elapsed, received = runner(host, port, count, qos, topics, payload, broker)
+                    sent = count * len(topics)
+                    self.stdout.write(
+                        f"{mode:<10} {qos:>3} {sent:>8} {received if broker else '-':>9} {sent / elapsed:>10.0f}"
+                    )
+        finally:
+            if broker is not None:
+                broker.stop()
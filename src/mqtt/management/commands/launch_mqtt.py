@@ -1,63 +1,45 @@
-import json
 from gevent import monkey
 monkey.patch_all()
 
 from django.core.management.base import BaseCommand
-import pika
-import paho.mqtt.client as mqtt
 import gevent
 
 from django.conf import settings
 
 class Command(BaseCommand):
-    help = 'Listens on a RabbitMQ queue and forwards messages to an MQTT topic using gevent for asynchronous operations'
+    help = 'Listens on a RabbitMQ queue and publishes transmissions to every enabled MQTT server over long-lived clients'
 
-    # def add_arguments(self, parser):
-    #     parser.add_argument('--rabbitmq_queue', type=str, help='The RabbitMQ queue to subscribe to')
-    #     parser.add_argument('--mqtt_topic', type=str, help='The MQTT topic to publish messages to')
-    #     parser.add_argument('--mqtt_broker', type=str, help='The MQTT broker address')
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=settings.MQTT_CONSUMER_WORKERS, help='gevent workers handling messages')
+        parser.add_argument('--prefetch', type=int, default=settings.MQTT_CONSUMER_PREFETCH, help='Unacknowledged messages taken from RabbitMQ')
 
     def handle(self, *args, **options):
-        self.rabbitmq_queue = settings.MQTT_AMQP_QUQUE
-        self.broker_url = settings.CELERY_BROKER_URL
-        
-       
+        from mqtt.utils.bridge import MqttBridge
+        from mqtt.utils.mqtt_client import MqttPublisherPool
+
+        self.publishers = MqttPublisherPool()
+        self.publishers.sync()
+        self.bridge = MqttBridge(
+            self.publishers,
+            settings.CELERY_BROKER_URL,
+            settings.MQTT_AMQP_QUQUE,
+            settings.MQTT_DEAD_LETTER_QUEUE,
+            settings.MQTT_RETRY_QUEUE,
+            retry_delay=settings.MQTT_RETRY_DELAY,
+            workers=options['workers'],
+            prefetch=options['prefetch'],
+        )
+
         # Start the RabbitMQ consumer in a greenlet
-        gevent.spawn(self.start_rabbitmq_consumer)
+        consumer = gevent.spawn(self.bridge.run)
 
         # Start gevent's loop
         try:
-            gevent.wait()
+            consumer.join()
         except KeyboardInterrupt:
             print('Stopping...')
+            self.bridge.stop()
+            consumer.join(timeout=5)
         finally:
+            self.publishers.stop()
             print('Disconnected from MQTT.')
-
-    def start_rabbitmq_consumer(self):
-        from mqtt.utils.mqtt_client import new_tx
-
-        # Setup RabbitMQ connection and start consuming in a non-blocking manner
-        connection_params = pika.URLParameters(self.broker_url)
-        connection = pika.BlockingConnection(connection_params)
-        channel = connection.channel()
-        channel.queue_declare(queue=self.rabbitmq_queue, durable=True)
-
-        for method_frame, properties, body in channel.consume(self.rabbitmq_queue, inactivity_timeout=1, auto_ack=True):
-            if method_frame:
-                message = body.decode('utf-8')
-            else:
-                # Check if we should stop consuming (based on some condition or external signal)
-                # If so, break from the loop and close RabbitMQ connection
-                continue
-
-            try:
-                _transmission = json.loads(message)
-                new_tx(_transmission)
-                print(message)
-            except Exception as err:
-                print(f"ERROR: {err}")
-                print(message)
-
-        channel.cancel()
-        connection.close()
-        print('Disconnected from RabbitMQ.')
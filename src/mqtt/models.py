@@ -1,6 +1,7 @@
 import uuid
 from django.db import models
-from radio.models import System, Agency
+from django.dispatch import receiver
+from radio.models import System, SystemRecorder, TalkGroup, Agency
 
 class MqttServer(models.Model):
     UUID = models.UUIDField(
@@ -24,3 +25,27 @@ class MqttServer(models.Model):
             return self.name
         else:
             return f"{self.host}:{self.port}"
+
+# pylint: disable=unused-argument
+@receiver(models.signals.post_save, sender=MqttServer)
+@receiver(models.signals.post_delete, sender=MqttServer)
+@receiver(models.signals.m2m_changed, sender=MqttServer.systems.through)
+@receiver(models.signals.m2m_changed, sender=MqttServer.agencies.through)
+@receiver(models.signals.post_save, sender=System)
+@receiver(models.signals.post_delete, sender=System)
+@receiver(models.signals.post_save, sender=SystemRecorder)
+@receiver(models.signals.post_delete, sender=SystemRecorder)
+@receiver(models.signals.post_save, sender=TalkGroup)
+@receiver(models.signals.post_delete, sender=TalkGroup)
+@receiver(models.signals.m2m_changed, sender=TalkGroup.agency.through)
+@receiver(models.signals.post_save, sender=Agency)
+@receiver(models.signals.post_delete, sender=Agency)
+def update_mqtt_publishers(sender, *args, **kwargs):
+    """
+    Reloads the brokers launch_mqtt publishes to and their topic routes
+    """
+    from mqtt.utils.mqtt_client import record_mqtt_server_change
+
+    if kwargs.get("action", "post").startswith("pre"):
+        return
+    record_mqtt_server_change()
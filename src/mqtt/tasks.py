@@ -9,7 +9,7 @@ from mqtt.utils.mqtt_client import (
     _send_mqtt_message_signal
 )
 from mqtt.utils.publisher import (
-    RabbitMQPublisher
+    get_rabbitmq_publishers
 )
 
 logger = logging.getLogger(__name__)
@@ -28,9 +28,7 @@ def dispatch_transmission(_transmission: dict) -> None:
     """
     Does the logic to send user notifications
     """
-    publisher = RabbitMQPublisher(settings.MQTT_AMQP_QUQUE)
-    publisher.publish_message(_transmission)
-    publisher.close_connection()
+    get_rabbitmq_publishers(settings.MQTT_AMQP_QUQUE).publish(_transmission)
 
 
     
\ No newline at end of file
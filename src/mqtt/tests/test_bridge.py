@@ -0,0 +1,116 @@
+import json
+import threading
+import uuid
+
+from django.test import override_settings
+from rest_framework.test import APITestCase
+
+from mqtt.models import MqttServer
+from mqtt.utils.bridge import ACK, ATTEMPTS_HEADER, DEAD_LETTER, RETRY, MqttBridge
+from mqtt.utils.mqtt_client import MqttPublisherPool
+from mqtt.utils.standin_broker import StandInBroker
+from mqtt.tests.test_mqtt_client import wait_for
+
+TRANSMISSION = json.dumps({
+    "UUID": str(uuid.uuid4()),
+    "system": str(uuid.uuid4()),
+    "system_name": "County",
+    "recorder": {"site_id": "1", "name": "north"},
+    "talkgroup": {"UUID": str(uuid.uuid4()), "alpha_tag": "Fire", "agency": []},
+}).encode()
+
+
+class RecordingBridge(MqttBridge):
+    def __init__(self, publishers):
+        super().__init__(publishers, "memory://", "tpng_mqtt", "tpng_mqtt.dead", "tpng_mqtt.retry")
+        self.settled = {}
+        self.event = threading.Event()
+
+    def settle(self, channel, delivery_tag, body, outcome, error=None, attempts=0):
+        self.settled[delivery_tag] = outcome
+        self.event.set()
+
+
+class RecordingChannel:
+    is_closed = False
+
+    def __init__(self):
+        self.published = []
+        self.acked = []
+
+    def basic_publish(self, exchange, routing_key, body, properties):
+        self.published.append((routing_key, body, properties.headers))
+
+    def basic_ack(self, delivery_tag):
+        self.acked.append(delivery_tag)
+
+
+@override_settings(MQTT_RELOAD_INTERVAL=3600, RESOLUTION_CACHE_VERSION_CHECK=0)
+class MqttBridgeTests(APITestCase):
+    def setUp(self):
+        self.pool = MqttPublisherPool()
+        self.bridge = RecordingBridge(self.pool)
+
+    def tearDown(self):
+        self.pool.stop()
+
+    def test_unreadable_dead_lettered(self):
+        '''Test messages that are not transmissions are dead-lettered'''
+        self.bridge.handle(None, 1, 0, b"not json")
+        self.bridge.handle(None, 2, 0, b"[]")
+
+        self.assertEqual(self.bridge.settled, {1: DEAD_LETTER, 2: DEAD_LETTER})
+
+    def test_no_servers_acked(self):
+        '''Test messages no MQTT server wants are acked'''
+        self.bridge.handle(None, 1, 0, TRANSMISSION)
+
+        self.assertEqual(self.bridge.settled, {1: ACK})
+
+    def test_acked_after_publish(self):
+        '''Test messages are acked once every MQTT server has published them'''
+        broker = StandInBroker().start()
+        try:
+            MqttServer.objects.create(host=broker.host, port=broker.port)
+            MqttServer.objects.create(host=broker.host, port=broker.port)
+
+            with override_settings(MQTT_PUBLISH_QOS=1):
+                self.bridge.handle(None, 1, 0, TRANSMISSION)
+            self.assertTrue(self.bridge.event.wait(5))
+        finally:
+            self.pool.stop()
+            broker.stop()
+
+        self.assertEqual(self.bridge.settled, {1: ACK})
+        self.assertEqual(broker.received, 12)
+
+    @override_settings(MQTT_PUBLISH_QUEUE_SIZE=1, MQTT_PUBLISH_QUEUE_TIMEOUT=0)
+    def test_failed_retried(self):
+        '''Test a failed publish is retried however many times it has failed before'''
+        MqttServer.objects.create(host="127.0.0.1", port=1)
+
+        # One message waits in the sender for a connection, one in the queue
+        self.bridge.handle(None, 1, 0, TRANSMISSION)
+        client = list(self.pool.clients.values())[0]
+        self.assertTrue(wait_for(lambda: client.queue.qsize() == 0))
+        self.bridge.handle(None, 2, 0, TRANSMISSION)
+
+        self.bridge.handle(None, 3, 0, TRANSMISSION)
+        self.bridge.handle(None, 4, 5, TRANSMISSION)
+        self.assertEqual(self.bridge.settled, {3: RETRY, 4: RETRY})
+
+        # Waiting messages fail when their client stops
+        self.pool.stop()
+        self.assertEqual(self.bridge.settled, {1: RETRY, 2: RETRY, 3: RETRY, 4: RETRY})
+
+    def test_settle(self):
+        '''Test retries go to the retry queue with their attempt count and only unreadable messages are dead-lettered'''
+        channel = RecordingChannel()
+        MqttBridge._settle(self.bridge, channel, 1, TRANSMISSION, RETRY, "MQTT publish failed", 2)
+        MqttBridge._settle(self.bridge, channel, 2, b"not json", DEAD_LETTER, "unreadable")
+
+        self.assertEqual(channel.acked, [1, 2])
+        self.assertEqual(channel.published, [
+            ("tpng_mqtt.retry", TRANSMISSION, {ATTEMPTS_HEADER: 3, "x-tpng-error": "MQTT publish failed"}),
+            ("tpng_mqtt.dead", b"not json", {"x-tpng-error": "unreadable"}),
+        ])
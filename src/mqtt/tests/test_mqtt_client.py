@@ -0,0 +1,138 @@
+import time
+import uuid
+
+from django.test import SimpleTestCase, override_settings
+from rest_framework.test import APITestCase
+
+from mqtt.models import MqttServer
+from mqtt.utils.mqtt_client import MqttPublisherPool, MqttServerClient
+from mqtt.utils.routing import transmission_topics
+from mqtt.utils.standin_broker import StandInBroker
+from radio.models import Agency, System, SystemACL
+
+SYSTEM = str(uuid.uuid4())
+TALKGROUP = str(uuid.uuid4())
+AGENCY = str(uuid.uuid4())
+
+TRANSMISSION = {
+    "UUID": str(uuid.uuid4()),
+    "system": SYSTEM,
+    "system_name": "County",
+    "recorder": {"site_id": "1", "name": "north"},
+    "talkgroup": {
+        "UUID": TALKGROUP,
+        "alpha_tag": "Fire Dispatch",
+        "agency": [{"UUID": AGENCY, "name": "County Fire"}],
+    },
+}
+
+
+def wait_for(condition, timeout: float = 5) -> bool:
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+class TransmissionTopicsTests(SimpleTestCase):
+    def test_all_topics(self):
+        '''Test an unfiltered broker gets the system, site, talkgroup and agency topics'''
+        self.assertEqual(
+            transmission_topics(TRANSMISSION, set(), set()),
+            [
+                f"system/{SYSTEM}",
+                "system/County",
+                "system/County/site/1",
+                "system/County/site/north",
+                f"system/{SYSTEM}/talkgroup/{TALKGROUP}",
+                "system/County/talkgroup/Fire Dispatch",
+                f"agency/{AGENCY}",
+                "agency/County Fire",
+            ],
+        )
+
+    def test_filtered_topics(self):
+        '''Test system and agency limits filter the topics'''
+        self.assertEqual(
+            transmission_topics(TRANSMISSION, {str(uuid.uuid4())}, {AGENCY}),
+            [f"agency/{AGENCY}", "agency/County Fire"],
+        )
+        self.assertEqual(transmission_topics(TRANSMISSION, {SYSTEM}, {str(uuid.uuid4())})[0], f"system/{SYSTEM}")
+
+
+class MqttServerClientTests(SimpleTestCase):
+    def setUp(self):
+        self.broker = StandInBroker().start()
+
+    def tearDown(self):
+        self.broker.stop()
+
+    def test_publishes_over_one_connection(self):
+        '''Test queued messages are published at QoS 1 over one connection'''
+        client = MqttServerClient(uuid.uuid4(), "test", (self.broker.host, self.broker.port, 60, None, None), qos=1)
+        client.start()
+        for _ in range(20):
+            client.submit(["tpng/a", "tpng/b"], b"{}")
+
+        self.assertTrue(wait_for(lambda: client.published == 40))
+        client.stop()
+
+        self.assertEqual(self.broker.topics, {"tpng/a": 20, "tpng/b": 20})
+        self.assertEqual(self.broker.connections, 1)
+
+    def test_full_queue_drops(self):
+        '''Test submit gives up on a full queue after its timeout'''
+        client = MqttServerClient(uuid.uuid4(), "test", ("127.0.0.1", 1, 60, None, None), max_queue=1)
+
+        self.assertTrue(client.submit(["tpng/a"], b"{}", timeout=0))
+        self.assertFalse(client.submit(["tpng/a", "tpng/b"], b"{}", timeout=0))
+        self.assertEqual(client.dropped, 2)
+
+
+@override_settings(MQTT_RELOAD_INTERVAL=3600, RESOLUTION_CACHE_VERSION_CHECK=0)
+class MqttPublisherPoolTests(APITestCase):
+    def setUp(self):
+        self.broker = StandInBroker().start()
+        self.pool = MqttPublisherPool()
+        self.acl: SystemACL = SystemACL.objects.create(name="Default", public=True)
+
+    def tearDown(self):
+        self.pool.stop()
+        self.broker.stop()
+
+    def test_hot_reload(self):
+        '''Test the pool follows MqttServer changes'''
+        system = System.objects.create(name="County", systemACL=self.acl)
+        mqtt_server = MqttServer.objects.create(host=self.broker.host, port=self.broker.port)
+
+        self.pool.sync()
+        client = self.pool.clients[str(mqtt_server.UUID)]
+        self.assertTrue(wait_for(lambda: client.connected))
+
+        # Filters change without reconnecting
+        mqtt_server.systems.add(system)
+        self.pool.sync()
+        self.assertIs(self.pool.clients[str(mqtt_server.UUID)], client)
+        self.assertEqual(client.routes.system_uuids, {str(system.UUID)})
+
+        # Connection settings change reconnects
+        mqtt_server.keepalive = 30
+        mqtt_server.save()
+        self.pool.sync()
+        self.assertIsNot(self.pool.clients[str(mqtt_server.UUID)], client)
+
+        mqtt_server.enabled = False
+        mqtt_server.save()
+        self.pool.sync()
+        self.assertEqual(self.pool.clients, {})
+
+    def test_publish(self):
+        '''Test a transmission is queued on the brokers it has topics on'''
+        agency = Agency.objects.create(name="Elsewhere")
+        MqttServer.objects.create(host=self.broker.host, port=self.broker.port)
+        filtered = MqttServer.objects.create(host=self.broker.host, port=self.broker.port)
+        filtered.agencies.add(agency)
+        filtered.systems.add(System.objects.create(name="Elsewhere", systemACL=self.acl))
+
+        self.assertEqual(self.pool.publish(TRANSMISSION, b"{}"), 8)
+        self.assertTrue(wait_for(lambda: self.broker.received == 8))
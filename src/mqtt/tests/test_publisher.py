@@ -0,0 +1,96 @@
+import pika
+
+from django.test import SimpleTestCase
+
+from mqtt.utils.publisher import RabbitMQPublisher, RabbitMQPublisherPool
+
+
+class RecordingChannel:
+    def __init__(self, connection):
+        self.connection = connection
+        self.is_open = True
+        self.confirming = False
+
+    def queue_declare(self, queue, durable):
+        self.connection.broker["declared"] += 1
+
+    def confirm_delivery(self):
+        self.confirming = True
+
+    def basic_publish(self, exchange, routing_key, body, properties):
+        if self.connection.broker["drop"]:
+            self.connection.broker["drop"] -= 1
+            self.is_open = self.connection.is_open = False
+            raise pika.exceptions.StreamLostError("connection reset")
+        self.connection.broker["published"].append((routing_key, body, properties.delivery_mode))
+
+
+class RecordingConnection:
+    def __init__(self, broker):
+        self.broker = broker
+        self.is_open = True
+
+    def channel(self):
+        return RecordingChannel(self)
+
+    def close(self):
+        self.is_open = False
+
+
+class RecordingPublisher(RabbitMQPublisher):
+    broker = None
+
+    def create_connection(self):
+        self.broker["connections"] += 1
+        return RecordingConnection(self.broker)
+
+
+class RecordingPublisherPool(RabbitMQPublisherPool):
+    def create_publisher(self):
+        return RecordingPublisher(self.queue_name, confirm=self.confirm)
+
+
+class RabbitMQPublisherPoolTests(SimpleTestCase):
+    def setUp(self):
+        RecordingPublisher.broker = {"connections": 0, "declared": 0, "drop": 0, "published": []}
+        self.broker = RecordingPublisher.broker
+        self.pool = RecordingPublisherPool("tpng_mqtt", size=2)
+
+    def test_connection_reused(self):
+        '''Test publishes share one connection and declare the queue once'''
+        for index in range(5):
+            self.pool.publish(f"tx-{index}")
+
+        self.assertEqual(self.broker["connections"], 1)
+        self.assertEqual(self.broker["declared"], 1)
+        self.assertEqual(
+            self.broker["published"],
+            [("tpng_mqtt", f"tx-{index}", 2) for index in range(5)],
+        )
+        with self.pool.publisher() as publisher:
+            self.assertTrue(publisher.channel.confirming)
+
+    def test_reconnects(self):
+        '''Test a publish on a dropped connection reconnects and is retried once'''
+        self.pool.publish("tx-1")
+        self.broker["drop"] = 1
+        self.pool.publish("tx-2")
+
+        self.assertEqual(self.broker["connections"], 2)
+        self.assertEqual([body for _, body, _ in self.broker["published"]], ["tx-1", "tx-2"])
+
+        self.broker["drop"] = 2
+        with self.assertRaises(pika.exceptions.AMQPError):
+            self.pool.publish("tx-3")
+        self.pool.publish("tx-4")
+        self.assertEqual([body for _, body, _ in self.broker["published"]], ["tx-1", "tx-2", "tx-4"])
+
+    def test_pool_size(self):
+        '''Test concurrent users get their own publisher up to the pool size'''
+        with self.pool.publisher() as first:
+            with self.pool.publisher() as second:
+                self.assertIsNot(first, second)
+
+        with self.pool.publisher() as publisher:
+            self.assertIn(publisher, (first, second))
+        self.assertEqual(self.broker["connections"], 2)
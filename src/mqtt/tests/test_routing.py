@@ -0,0 +1,104 @@
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+
+from rest_framework.test import APITestCase
+
+from mqtt.models import MqttServer
+from mqtt.utils.mqtt_client import MqttPublisherPool
+from mqtt.utils.routing import compile_routing_tables, transmission_topics
+from radio.models import Agency, System, SystemACL, SystemRecorder, TalkGroup
+
+
+class MqttRoutingTableTests(APITestCase):
+    def setUp(self):
+        acl: SystemACL = SystemACL.objects.create(name="Default", public=True)
+        self.system: System = System.objects.create(name="County", systemACL=acl)
+        self.other_system: System = System.objects.create(name="City", systemACL=acl)
+        self.recorder: SystemRecorder = SystemRecorder.objects.create(
+            system=self.system, name="north", site_id="1", enabled=True
+        )
+        self.talkgroup: TalkGroup = TalkGroup.objects.create(system=self.system, decimal_id=1, alpha_tag="Fire")
+        self.agency: Agency = Agency.objects.create(name="County Fire")
+        self.talkgroup.agency.add(self.agency)
+
+        self.mqtt_server: MqttServer = MqttServer.objects.create(host="127.0.0.1")
+
+    def _transmission(self, talkgroup: TalkGroup = None) -> dict:
+        talkgroup = talkgroup or self.talkgroup
+        return {
+            "system": str(self.system.UUID),
+            "system_name": self.system.name,
+            "recorder": {"site_id": "1", "name": "north", "recorder": str(self.recorder.UUID)},
+            "talkgroup": {
+                "UUID": str(talkgroup.UUID),
+                "alpha_tag": talkgroup.alpha_tag,
+                "agency": [{"UUID": str(agency.UUID), "name": agency.name} for agency in talkgroup.agency.all()],
+            },
+        }
+
+    def _table(self):
+        mqtt_servers = MqttServer.objects.prefetch_related("systems", "agencies")
+        return compile_routing_tables(mqtt_servers)[str(self.mqtt_server.UUID)]
+
+    def test_compiled_topics(self):
+        '''Test compiled routes match the payload routes without queries'''
+        table = self._table()
+        transmission = self._transmission()
+
+        with CaptureQueriesContext(connection) as queries:
+            topics = table.topics(transmission)
+
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(list(topics), transmission_topics(transmission, set(), set()))
+        self.assertIs(table.topics(transmission), topics)
+
+    def test_compile_queries(self):
+        '''Test every server's table is compiled in a fixed number of queries'''
+        MqttServer.objects.create(host="127.0.0.2").systems.add(self.system)
+
+        mqtt_servers = list(MqttServer.objects.prefetch_related("systems", "agencies"))
+        with CaptureQueriesContext(connection) as queries:
+            tables = compile_routing_tables(mqtt_servers)
+
+        self.assertEqual(len(tables), 2)
+        self.assertEqual(len(queries), 5)
+
+    def test_filtered_topics(self):
+        '''Test system and agency limits are compiled into the table'''
+        self.mqtt_server.systems.add(self.other_system)
+        self.assertEqual(
+            self._table().topics(self._transmission()),
+            (f"agency/{self.agency.UUID}", "agency/County Fire"),
+        )
+
+        self.mqtt_server.agencies.add(Agency.objects.create(name="City Police"))
+        self.assertEqual(self._table().topics(self._transmission()), ())
+
+    def test_unknown_talkgroup(self):
+        '''Test transmissions on talkgroups the table does not know are routed from the payload'''
+        table = self._table()
+        talkgroup: TalkGroup = TalkGroup.objects.create(system=self.system, decimal_id=2, alpha_tag="EMS")
+        transmission = self._transmission(talkgroup)
+
+        with CaptureQueriesContext(connection) as queries:
+            topics = table.topics(transmission)
+
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(list(topics), transmission_topics(transmission, set(), set()))
+
+    @override_settings(MQTT_RELOAD_INTERVAL=3600, RESOLUTION_CACHE_VERSION_CHECK=0)
+    def test_refreshed_on_change(self):
+        '''Test talkgroup changes recompile the pool's routes'''
+        pool = MqttPublisherPool()
+        try:
+            pool.sync()
+            self.talkgroup.alpha_tag = "Fire Dispatch"
+            self.talkgroup.save()
+            pool.sync()
+
+            topics = pool.clients[str(self.mqtt_server.UUID)].topics(self._transmission())
+        finally:
+            pool.stop()
+
+        self.assertIn("system/County/talkgroup/Fire Dispatch", topics)
@@ -0,0 +1,203 @@
+import json
+import time
+import logging
+
+from functools import partial
+
+import gevent
+import pika
+
+from gevent.queue import Queue
+from django.conf import settings
+
+from mqtt.utils.mqtt_client import MqttPublisherPool
+
+if settings.SEND_TELEMETRY:
+    from sentry_sdk import capture_exception
+
+logger = logging.getLogger(__name__)
+
+ACK = "ack"
+RETRY = "retry"
+DEAD_LETTER = "dead_letter"
+
+ATTEMPTS_HEADER = "x-tpng-attempts"
+
+
+class MqttBridge:
+    """
+    Consumes transmissions from RabbitMQ and publishes them to the MQTT servers
+
+    Up to `prefetch` messages are taken unacknowledged and handed to `workers`
+    gevent workers that route them to the publisher pool. A message is acked
+    once every MQTT server has published it. If a server fails to, the message
+    is moved to `retry_queue`, where it waits `retry_delay` seconds before
+    RabbitMQ dead-letters it back onto the queue, so a broker outage delays
+    messages instead of dropping them. Unacked messages go back to the queue
+    when the bridge stops or loses RabbitMQ, so delivery is at-least-once.
+
+    Only messages that cannot be parsed are republished to `dead_letter_queue`,
+    with the error in the x-tpng-error header. Retries carry their attempt
+    count in the x-tpng-attempts header
+    """
+
+    def __init__(
+        self,
+        publishers: MqttPublisherPool,
+        broker_url: str,
+        queue_name: str,
+        dead_letter_queue: str,
+        retry_queue: str,
+        retry_delay: float = 30,
+        workers: int = 4,
+        prefetch: int = 100,
+    ) -> None:
+        self.publishers = publishers
+        self.broker_url = broker_url
+        self.queue_name = queue_name
+        self.dead_letter_queue = dead_letter_queue
+        self.retry_queue = retry_queue
+        self.retry_delay = retry_delay
+        self.workers = workers
+        self.prefetch = prefetch
+        self.inbox = Queue()
+        self.acked = 0
+        self.retried = 0
+        self.dead_lettered = 0
+        self._running = False
+        self._connection = None
+        self._greenlets = []
+
+    def run(self) -> None:
+        """
+        Consumes until stopped, reconnecting to RabbitMQ when the connection drops
+        """
+        self._running = True
+        self._greenlets = [gevent.spawn(self._work) for _ in range(self.workers)]
+        try:
+            while self._running:
+                try:
+                    self._consume()
+                except pika.exceptions.AMQPError as error:
+                    if not self._running:
+                        break
+                    logger.warning(f"[!] MQTT bridge lost RabbitMQ - {error}, reconnecting")
+                    time.sleep(5)
+        finally:
+            gevent.killall(self._greenlets)
+
+    def stop(self) -> None:
+        self._running = False
+
+    def _consume(self) -> None:
+        connection = pika.BlockingConnection(pika.URLParameters(self.broker_url))
+        self._connection = connection
+        try:
+            channel = connection.channel()
+            channel.queue_declare(queue=self.queue_name, durable=True)
+            channel.queue_declare(queue=self.dead_letter_queue, durable=True)
+            channel.queue_declare(
+                queue=self.retry_queue,
+                durable=True,
+                arguments={
+                    "x-message-ttl": int(self.retry_delay * 1000),
+                    "x-dead-letter-exchange": "",
+                    "x-dead-letter-routing-key": self.queue_name,
+                },
+            )
+            channel.basic_qos(prefetch_count=self.prefetch)
+            channel.basic_consume(self.queue_name, on_message_callback=self._on_message)
+            logger.info(f"[+] MQTT bridge consuming {self.queue_name} with {self.workers} workers")
+
+            while self._running:
+                connection.process_data_events(time_limit=1)
+                # Pick up MqttServer and routing changes
+                self.publishers.sync()
+        finally:
+            self._connection = None
+            if connection.is_open:
+                # Unacked messages go back to the queue
+                connection.close()
+
+    def _on_message(self, channel, method, properties, body) -> None:
+        attempts = (properties.headers or {}).get(ATTEMPTS_HEADER, 0)
+        self.inbox.put((channel, method.delivery_tag, attempts, body))
+
+    def _work(self) -> None:
+        while True:
+            channel, delivery_tag, attempts, body = self.inbox.get()
+            try:
+                self.handle(channel, delivery_tag, attempts, body)
+            except Exception as error:
+                logger.error(f"[!] MQTT bridge failed handling a message - {error}")
+                if settings.SEND_TELEMETRY:
+                    capture_exception(error)
+                self.settle(channel, delivery_tag, body, RETRY, str(error), attempts)
+
+    def handle(self, channel, delivery_tag: int, attempts: int, body: bytes) -> None:
+        try:
+            _transmission = json.loads(body)
+            if not isinstance(_transmission, dict) or "system" not in _transmission:
+                raise ValueError("not a transmission")
+        except Exception as error:
+            logger.warning(f"[!] MQTT bridge dead-lettering an unreadable message - {error}")
+            self.settle(channel, delivery_tag, body, DEAD_LETTER, f"unreadable: {error}")
+            return
+
+        def on_done(ok: bool) -> None:
+            if ok:
+                self.settle(channel, delivery_tag, body, ACK)
+            else:
+                self.settle(channel, delivery_tag, body, RETRY, "MQTT publish failed", attempts)
+
+        # Blocks while the MQTT servers' queues are full
+        self.publishers.publish(_transmission, body, on_done=on_done)
+
+    def settle(
+        self, channel, delivery_tag: int, body: bytes, outcome: str, error: str = None, attempts: int = 0
+    ) -> None:
+        """
+        Acks, retries or dead-letters a message from any thread or greenlet
+        """
+        connection = self._connection
+        if connection is None or channel.is_closed:
+            # The message is redelivered on the next connection
+            return
+        try:
+            connection.add_callback_threadsafe(
+                partial(self._settle, channel, delivery_tag, body, outcome, error, attempts)
+            )
+        except Exception as error:
+            logger.warning(f"[!] MQTT bridge unable to settle a message - {error}")
+
+    def _settle(
+        self, channel, delivery_tag: int, body: bytes, outcome: str, error: str = None, attempts: int = 0
+    ) -> None:
+        if channel.is_closed:
+            return
+
+        if outcome == ACK:
+            channel.basic_ack(delivery_tag=delivery_tag)
+            self.acked += 1
+        elif outcome == RETRY:
+            if attempts and attempts % 10 == 0:
+                logger.warning(f"[!] MQTT bridge still retrying a message after {attempts} attempts - {error}")
+            channel.basic_publish(
+                exchange="",
+                routing_key=self.retry_queue,
+                body=body,
+                properties=pika.BasicProperties(
+                    delivery_mode=2, headers={ATTEMPTS_HEADER: attempts + 1, "x-tpng-error": error}
+                ),
+            )
+            channel.basic_ack(delivery_tag=delivery_tag)
+            self.retried += 1
+        else:
+            channel.basic_publish(
+                exchange="",
+                routing_key=self.dead_letter_queue,
+                body=body,
+                properties=pika.BasicProperties(delivery_mode=2, headers={"x-tpng-error": error}),
+            )
+            channel.basic_ack(delivery_tag=delivery_tag)
+            self.dead_lettered += 1
@@ -1,21 +1,20 @@
+import time
+import queue
 import logging
+import threading
 
-import gevent
-from django.dispatch import receiver
+from django.conf import settings
+from django.core.cache import cache as shared_cache
 
 import paho.mqtt.client as mqtt
 
 from mqtt.signals import mqtt_message
-
-from radio.models import (
-    TalkGroup,
-    Transmission,
-    System,
-    Agency
-)
+from mqtt.utils.routing import MqttRoutingTable, compile_routing_tables
 
 logger = logging.getLogger(__name__)
 
+MQTT_SERVERS_VERSION_KEY = "tpng:mqtt:version"
+
 def _send_mqtt_message_signal(sender, client, userdata, msg) -> None:
     mqtt_message.send(
         sender=sender,
@@ -23,264 +22,352 @@ def _send_mqtt_message_signal(sender, client, userdata, msg) -> None:
         userdata=userdata, 
         msg=msg
     )
- 
-def new_tx(_transmission: dict) -> None:
-    from mqtt.models import MqttServer
-    for mqtt_server in MqttServer.objects.filter(enabled=True):
-        _send_message(mqtt_server, _transmission)
-
-def _send_message(mqtt_server, _transmission) -> None:
-    client_id = 'tpng--' + str(mqtt_server.UUID)
-
-    systems: list[System] = mqtt_server.systems
-    agencies: list[Agency] = mqtt_server.agencies
-
-    client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id=client_id)
 
-    if mqtt_server.username and mqtt_server.password:
-        client.username_pw_set(
-            username=mqtt_server.username,
-            password=mqtt_server.password,
-        )
-
-    client.connect(
-        host = mqtt_server.host,
-        port = mqtt_server.port,
-        keepalive = mqtt_server.keepalive
-    )
-    # client.loop_start()
-
-
-    targets = []
-
-    if systems:
-        if _transmission["system"] in [ str(sys.UUID) for sys in systems.all()]:
-            targets += [
-                f"system/{_transmission["system"]}",
-                f"system/{_transmission["system_name"]}",
-                f"system/{_transmission["system_name"]}/site/{_transmission["recorder"]["site_id"]}",
-                f"system/{_transmission["system_name"]}/site/{_transmission["recorder"]["name"]}",
-            ]
-
-            if _transmission["talkgroup"]:
-                if "alpha_tag" in _transmission["talkgroup"]:
-                    targets += [
-                        f"system/{_transmission["system"]}/talkgroup/{_transmission["talkgroup"]["UUID"]}",
-                        f"system/{_transmission["system_name"]}/talkgroup/{_transmission["talkgroup"]["alpha_tag"]}",
-                    ]
-    else:
-        targets += [
-            f"system/{_transmission["system"]}",
-            f"system/{_transmission["system_name"]}",
-            f"system/{_transmission["system_name"]}/site/{_transmission["recorder"]["site_id"]}",
-            f"system/{_transmission["system_name"]}/site/{_transmission["recorder"]["name"]}",
-        ]
-
-        if "talkgroup" in _transmission:
-            if "alpha_tag" in _transmission["talkgroup"]:
-                targets += [
-                    f"system/{_transmission["system"]}/talkgroup/{_transmission["talkgroup"]["UUID"]}",
-                    f"system/{_transmission["system_name"]}/talkgroup/{_transmission["talkgroup"]["alpha_tag"]}",
-                ]
-
-    
-    if _transmission["talkgroup"]:
-        if agencies and _transmission["talkgroup"]["agency"]:
-            for agency in _transmission["talkgroup"]["agency"]:
-                agency: Agency
-                if agency in [ str(agency.UUID) for agency in agencies.all()]:
-                    targets += [
-                        f"agency/{agency.UUID}",
-                        f"agency/{agency.name}",
-                    ]
-        else:
-            for agency in _transmission["talkgroup"]["agency"]:
-                agency: Agency
-                targets += [
-                    f"agency/{agency.UUID}",
-                    f"agency/{agency.name}",
-                ]
-    
-    for topic in targets:
-        print(topic)
-        client.publish(
-            topic=topic,
-            payload=_transmission,
-        )
 
-class MqttSystemClient():
-    def __init__(self, mqtt_server) -> None:
-        
-        self.mqtt_server = mqtt_server
-        self.client_id = 'tpng--' + str(mqtt_server.UUID)
-
-        self.systems: list[System] = self.mqtt_server.systems
-        self.agencies: list[Agency] = self.mqtt_server.agencies
-
-        self.topicz: list[str] = []
-
-        self.client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id=self.client_id)
-        self._setup_callbacks()
-        self._setup_topics()
-
-    def _setup_topics(self) -> None:
-        if self.systems:
-            for system in self.systems.all():
-                self.topicz.append(
-                    f"system/{system.UUID}",
-                    f"system/{system.name}",
-                )
-
-            talkgroups = TalkGroup.objects.filter(
-                system__in=self.mqtt_server.systems.all()
-            )
-            for talkgroup in talkgroups:
-                self.topicz.append(
-                    f"system/{talkgroup.system.UUID}/talkgroup/{talkgroup.UUID}",
-                    f"system/{talkgroup.system.name}/talkgroup/{talkgroup.alpha_tag}",
-                )
-        else: 
-            for system in System.objects.all():
-                self.topicz.append(
-                    f"system/{system.UUID}",
-                    f"system/{system.name}",
-                )
-
-            for talkgroup in TalkGroup.objects.all():
-                self.topicz.append(
-                    f"system/{talkgroup.system.UUID}/talkgroup/{talkgroup.UUID}",
-                    f"system/{talkgroup.system.name}/talkgroup/{talkgroup.alpha_tag}",
-                )
-
-        if self.agencies:
-            for agency in self.agencies.all():
-                self.topicz.append(
-                    f"agency/{agency.UUID}",
-                    f"agency/{agency.name}",
-                )
-        else:
-            for agency in Agency.objects.all():
-                self.topicz.append(
-                    f"agency/{agency.UUID}",
-                    f"agency/{agency.name}",
-                )
-
-    def send(self, _transmission: dict) -> None:
-        targets = []
-
-        if self.systems:
-            if _transmission["system"] in [ str(sys.UUID) for sys in self.systems.all()]:
-                targets += [
-                    f"system/{_transmission["system"]}",
-                    f"system/{_transmission["system_name"]}",
-                    f"system/{_transmission["system_name"]}/site/{_transmission["recorder"]["site_id"]}",
-                    f"system/{_transmission["system_name"]}/site/{_transmission["recorder"]["name"]}",
-                ]
-
-                if _transmission["talkgroup"]:
-                    if "alpha_tag" in _transmission["talkgroup"]:
-                        targets += [
-                            f"system/{_transmission["system"]}/talkgroup/{_transmission["talkgroup"]["UUID"]}",
-                            f"system/{_transmission["system_name"]}/talkgroup/{_transmission["talkgroup"]["alpha_tag"]}",
-                        ]
-        else:
-            targets += [
-                f"system/{_transmission["system"]}",
-                f"system/{_transmission["system_name"]}",
-                f"system/{_transmission["system_name"]}/site/{_transmission["recorder"]["site_id"]}",
-                f"system/{_transmission["system_name"]}/site/{_transmission["recorder"]["name"]}",
-            ]
-
-            if "talkgroup" in _transmission:
-                if "alpha_tag" in _transmission["talkgroup"]:
-                    targets += [
-                        f"system/{_transmission["system"]}/talkgroup/{_transmission["talkgroup"]["UUID"]}",
-                        f"system/{_transmission["system_name"]}/talkgroup/{_transmission["talkgroup"]["alpha_tag"]}",
-                    ]
-
-        
-        if _transmission["talkgroup"]:
-            if self.agencies and _transmission["talkgroup"]["agency"]:
-                for agency in _transmission["talkgroup"]["agency"]:
-                    agency: Agency
-                    if agency in [ str(agency.UUID) for agency in self.agencies.all()]:
-                        targets += [
-                            f"agency/{agency.UUID}",
-                            f"agency/{agency.name}",
-                        ]
-            else:
-                for agency in _transmission["talkgroup"]["agency"]:
-                    agency: Agency
-                    targets += [
-                        f"agency/{agency.UUID}",
-                        f"agency/{agency.name}",
-                    ]
-        
-        for topic in targets:
-            print(topic)
-            self.client.publish(
-                topic=topic,
-                payload=_transmission,
-            )
-
-    def _setup_callbacks(self) -> None:
+class Settlement:
+    """
+    Calls on_done(ok) once, after `remaining` parts succeed or the first fails
+    """
+    __slots__ = ("remaining", "on_done", "settled", "_lock")
+
+    def __init__(self, remaining: int, on_done) -> None:
+        self.remaining = remaining
+        self.on_done = on_done
+        self.settled = False
+        self._lock = threading.Lock()
+
+    def done(self, ok: bool = True) -> None:
+        with self._lock:
+            if self.settled:
+                return
+            self.remaining -= 1
+            if ok and self.remaining > 0:
+                return
+            self.settled = True
+        self.on_done(ok)
+
+
+class MqttServerClient:
+    """
+    One long-lived paho client for an MqttServer
+
+    paho runs its network loop in its own thread and reconnects on its own,
+    backing off up to MQTT_RECONNECT_MAX_DELAY seconds. Messages wait in a
+    bounded queue for a sender thread that publishes them once the client is
+    connected, with at most MQTT_MAX_INFLIGHT QoS 1/2 publishes unacknowledged.
+    When the queue is full submit() blocks, which holds back the consumer.
+
+    A message submitted with on_done is settled once paho reports every topic
+    published (acknowledged by the broker for QoS 1/2), or failed when the
+    connection drops with QoS 0 messages unsent or the client stops
+    """
+
+    def __init__(
+        self,
+        server_uuid: str,
+        name: str,
+        connection: tuple,
+        routes: MqttRoutingTable = None,
+        qos: int = 0,
+        max_queue: int = 1000,
+        max_inflight: int = 20,
+        reconnect_max_delay: int = 60,
+    ) -> None:
+        self.uuid = str(server_uuid)
+        self.name = name
+        self.connection = connection
+        self.routes = routes or MqttRoutingTable()
+
+        self.qos = qos
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.published = 0
+        self.dropped = 0
+        self._connected = threading.Event()
+        self._pending: dict[int, Settlement] = {}
+        self._early = set()
+        self._lock = threading.Lock()
+        self._inflight = threading.Semaphore(max_inflight)
+        self._running = False
+        self._sender = None
+
+        self.client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id=f"tpng--{self.uuid}")
+        self.client.reconnect_delay_set(min_delay=1, max_delay=reconnect_max_delay)
+        self.client.max_inflight_messages_set(max_inflight)
         self.client.on_connect = self._on_connect
-        self.client.on_message = self._on_message
-
-    def _on_connect(self, client, userdata, flags, rc, *args, **kwargs) -> None:
-        logger.debug(f"Connected with result code {rc}")
-        for topic in self.topicz:
-            self.client.subscribe(topic)
-
-    def _on_message(self, client, userdata, msg, *args, **kwargs) -> None:
-        logger.debug(f"MQTT MESSAGE: {client} {userdata} {msg}")
-        from mqtt.tasks import send_mqtt_message_signal
-        send_mqtt_message_signal(
-            self,
-            client,
-            userdata,
-            msg
+        self.client.on_disconnect = self._on_disconnect
+        self.client.on_publish = self._on_publish
+
+    @classmethod
+    def from_server(cls, mqtt_server, routes: MqttRoutingTable, **kwargs) -> "MqttServerClient":
+        return cls(mqtt_server.UUID, str(mqtt_server), cls.connection_settings(mqtt_server), routes, **kwargs)
+
+    @staticmethod
+    def connection_settings(mqtt_server) -> tuple:
+        """
+        (host, port, keepalive, username, password), a change means reconnecting
+        """
+        return (
+            mqtt_server.host,
+            mqtt_server.port,
+            mqtt_server.keepalive,
+            mqtt_server.username,
+            mqtt_server.password,
         )
 
-    def start_mqtt_client(self):
-        if self.mqtt_server.username and self.mqtt_server.password:
-            self.client.username_pw_set(
-                username=self.mqtt_server.username,
-                password=self.mqtt_server.password,
-            )
-
-        self.client.connect(
-            host = self.mqtt_server.host,
-            port = self.mqtt_server.port,
-            keepalive = self.mqtt_server.keepalive
-        )
-        self.client.loop_start()
-
-class MqttClientManager():
-    def __init__(self) -> None:
-        from mqtt.models import MqttServer
+    @property
+    def connected(self) -> bool:
+        return self._connected.is_set()
 
-        self.mqtt_servers = MqttServer.objects.filter(enabled=True)
-        self.mqtt_clients: list[MqttSystemClient] = []
+    def topics(self, _transmission: dict) -> tuple[str]:
+        return self.routes.topics(_transmission)
 
-        self._setup_agency_clients()
-        self._setup_system_clients()
+    def start(self) -> None:
+        host, port, keepalive, username, password = self.connection
+        if username and password:
+            self.client.username_pw_set(username=username, password=password)
 
-    def _setup_agency_clients(self):
-        for client in self.mqtt_servers:
-            _mqtt = MqttSystemClient(client)
-            self.mqtt_clients.append(_mqtt)
+        self._running = True
+        self.client.connect_async(host=host, port=port, keepalive=keepalive)
+        self.client.loop_start()
+        self._sender = threading.Thread(target=self._send_loop, name=f"mqtt-{self.uuid}", daemon=True)
+        self._sender.start()
+
+    def stop(self, timeout: float = 5) -> None:
+        """
+        Gives the queue up to timeout seconds to drain, then disconnects,
+        messages still queued are failed
+        """
+        deadline = time.monotonic() + timeout
+        while self.connected and self.queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+        self._running = False
+        if self._sender is not None:
+            self._sender.join(timeout=1)
+        self.client.disconnect()
+        self.client.loop_stop()
+        if self.queue.unfinished_tasks:
+            logger.warning(f"[!] MQTT {self.name} stopped with {self.queue.unfinished_tasks} messages queued")
+
+        while True:
+            try:
+                topics, payload, on_done = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            self.queue.task_done()
+            if on_done is not None:
+                on_done(False)
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for settlement in pending.values():
+            if settlement is not None:
+                settlement.done(False)
+
+    def submit(self, topics: list[str], payload, timeout: float = None, on_done=None) -> bool:
+        """
+        Queues a payload for the topics, waiting up to timeout for room
+        """
+        try:
+            self.queue.put((topics, payload, on_done), timeout=timeout)
+            return True
+        except queue.Full:
+            self.dropped += len(topics)
+            logger.warning(f"[!] MQTT {self.name} queue is full, dropped {len(topics)} messages")
+            return False
+
+    def _on_connect(self, client, userdata, flags, reason_code, properties) -> None:
+        if reason_code.is_failure:
+            logger.warning(f"[!] MQTT {self.name} refused the connection - {reason_code}")
+            return
+        logger.info(f"[+] MQTT {self.name} connected")
+        self._connected.set()
+
+    def _on_disconnect(self, client, userdata, flags, reason_code, properties) -> None:
+        self._connected.clear()
+        if self._running:
+            logger.warning(f"[!] MQTT {self.name} disconnected - {reason_code}, reconnecting")
+
+        if not self.qos:
+            # paho only resends QoS 1/2 messages after reconnecting
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            for settlement in pending.values():
+                if settlement is not None:
+                    settlement.done(False)
+
+    def _on_publish(self, client, userdata, mid, reason_code, properties) -> None:
+        self.published += 1
+        if self.qos:
+            self._inflight.release()
+
+        with self._lock:
+            if mid not in self._pending:
+                # Published before the sender recorded the mid
+                self._early.add(mid)
+                return
+            settlement = self._pending.pop(mid)
+        if settlement is not None:
+            settlement.done()
+
+    def _track(self, mid: int, settlement: Settlement) -> None:
+        with self._lock:
+            if mid not in self._early:
+                self._pending[mid] = settlement
+                return
+            self._early.discard(mid)
+        if settlement is not None:
+            settlement.done()
+
+    def _publish(self, topic: str, payload):
+        """
+        Publishes once connected, returns the message id or None when stopped
+        """
+        while self._running:
+            if not self._connected.wait(timeout=0.5):
+                continue
+            if self.qos and not self._inflight.acquire(timeout=0.5):
+                continue
+
+            info = self.client.publish(topic=topic, payload=payload, qos=self.qos)
+            if info.rc == mqtt.MQTT_ERR_SUCCESS:
+                return info.mid
+            if self.qos:
+                self._inflight.release()
+            time.sleep(0.1)
+        return None
+
+    def _send_loop(self) -> None:
+        while self._running:
+            try:
+                topics, payload, on_done = self.queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+
+            settlement = Settlement(len(topics), on_done) if on_done is not None else None
+            try:
+                for topic in topics:
+                    mid = self._publish(topic, payload)
+                    if mid is None:
+                        raise RuntimeError("client stopped")
+                    self._track(mid, settlement)
+            except Exception as error:
+                logger.error(f"[!] MQTT {self.name} failed publishing - {error}")
+                if settlement is not None:
+                    settlement.done(False)
+            finally:
+                self.queue.task_done()
+
+
+class MqttPublisherPool:
+    """
+    Keeps an MqttServerClient per enabled MqttServer
+
+    MqttServer, system, recorder, talkgroup and agency changes bump a version in
+    the Django cache, sync() checks it every RESOLUTION_CACHE_VERSION_CHECK
+    seconds, recompiles the routing tables and rebuilds only the clients whose
+    connection settings changed. The servers are also re-read every
+    MQTT_RELOAD_INTERVAL seconds for cache backends that are not shared
+    """
 
-    def _setup_system_clients(self):
-        for client in self.mqtt_servers:
-            _mqtt = MqttSystemClient(client)
-            self.mqtt_clients.append(_mqtt)
+    def __init__(self) -> None:
+        self.clients: dict[str, MqttServerClient] = {}
+        self._version = None
+        self._checked = 0.0
+        self._loaded = 0.0
+
+    def _new_client(self, mqtt_server, routes: MqttRoutingTable) -> MqttServerClient:
+        return MqttServerClient.from_server(
+            mqtt_server,
+            routes,
+            qos=settings.MQTT_PUBLISH_QOS,
+            max_queue=settings.MQTT_PUBLISH_QUEUE_SIZE,
+            max_inflight=settings.MQTT_MAX_INFLIGHT,
+            reconnect_max_delay=settings.MQTT_RECONNECT_MAX_DELAY,
+        )
 
-    def launch(self) -> None:
-        for client in self.mqtt_clients:
-            gevent.spawn( client.start_mqtt_client())
-            #gevent.spawn(client.start_mqtt_client)
+    def reload(self) -> None:
+        from mqtt.models import MqttServer
 
-    def dispatch(self, _transmission: dict) -> None:
-        for client in self.mqtt_clients:
-            client.send(_transmission)
+        mqtt_servers = {
+            str(mqtt_server.UUID): mqtt_server
+            for mqtt_server in MqttServer.objects.filter(enabled=True).prefetch_related("systems", "agencies")
+        }
+        routes = compile_routing_tables(mqtt_servers.values())
+        self._loaded = time.monotonic()
+
+        for server_uuid in list(self.clients):
+            mqtt_server = mqtt_servers.get(server_uuid)
+            client = self.clients[server_uuid]
+            if mqtt_server is None or client.connection_settings(mqtt_server) != client.connection:
+                logger.info(f"[+] MQTT {client.name} removed or changed, stopping its client")
+                del self.clients[server_uuid]
+                client.stop()
+
+        for server_uuid, mqtt_server in mqtt_servers.items():
+            client = self.clients.get(server_uuid)
+            if client is not None:
+                client.name = str(mqtt_server)
+                client.routes = routes[server_uuid]
+                continue
+            client = self._new_client(mqtt_server, routes[server_uuid])
+            client.start()
+            self.clients[server_uuid] = client
+
+    def sync(self) -> None:
+        now = time.monotonic()
+        if self._version is not None and now - self._checked < settings.RESOLUTION_CACHE_VERSION_CHECK:
+            return
+        self._checked = now
+
+        try:
+            version = shared_cache.get(MQTT_SERVERS_VERSION_KEY, 0)
+        except Exception as error:
+            logger.warning(f"[!] Unable to read MQTT server version - {error}")
+            version = self._version
+
+        if version != self._version or now - self._loaded >= settings.MQTT_RELOAD_INTERVAL:
+            self.reload()
+            self._version = version
+
+    def publish(self, _transmission: dict, payload, on_done=None) -> int:
+        """
+        Queues a transmission on every broker it has topics on, returns the topic count
+
+        on_done(ok) is called once every broker has published it, or as soon
+        as one of them fails to
+        """
+        self.sync()
+
+        routes = [(client, client.topics(_transmission)) for client in list(self.clients.values())]
+        routes = [(client, topics) for client, topics in routes if topics]
+        settlement = Settlement(len(routes), on_done) if on_done is not None else None
+        if settlement is not None and not routes:
+            on_done(True)
+
+        on_published = settlement.done if settlement is not None else None
+        queued = 0
+        for client, topics in routes:
+            if client.submit(topics, payload, timeout=settings.MQTT_PUBLISH_QUEUE_TIMEOUT, on_done=on_published):
+                queued += len(topics)
+            elif settlement is not None:
+                settlement.done(False)
+        return queued
+
+    def stop(self) -> None:
+        for client in self.clients.values():
+            client.stop()
+        self.clients = {}
+
+
+def record_mqtt_server_change() -> None:
+    """
+    Tells running MQTT publisher pools to reload their servers and routes
+    """
+    try:
+        try:
+            shared_cache.incr(MQTT_SERVERS_VERSION_KEY)
+        except ValueError:
+            shared_cache.add(MQTT_SERVERS_VERSION_KEY, 0, None)
+            shared_cache.incr(MQTT_SERVERS_VERSION_KEY)
+    except Exception as error:
+        logger.warning(f"[!] Unable to record MQTT server change - {error}")
@@ -1,33 +1,170 @@
+import os
 import pika
+import queue
 import logging
+import threading
+
+from contextlib import contextmanager
 
 from django.conf import settings
 
 logger = logging.getLogger(__name__)
 
 class RabbitMQPublisher:
-    def __init__(self, queue_name):
+    """
+    Publishes persistent messages to a queue over a connection kept between messages
+
+    The queue is declared once per connection. With confirm set the channel is
+    in publisher confirm mode, so publish_message returns once the broker has
+    taken the message. A publish on a dropped connection reconnects and is
+    retried once
+    """
+
+    def __init__(self, queue_name, confirm=True):
         self.queue_name = queue_name
-        self.connection = self.create_connection()
-        self.channel = self.connection.channel()
-        self.declare_queue()
+        self.confirm = confirm
+        self.connection = None
+        self.channel = None
+        self.connect()
 
     def create_connection(self):
         parameters = pika.URLParameters(settings.CELERY_BROKER_URL)
         return pika.BlockingConnection(parameters)
 
+    def connect(self):
+        self.connection = self.create_connection()
+        self.channel = self.connection.channel()
+        self.declare_queue()
+        if self.confirm:
+            self.channel.confirm_delivery()
+
     def declare_queue(self):
         self.channel.queue_declare(queue=self.queue_name, durable=True)
 
+    @property
+    def is_open(self):
+        return (
+            self.connection is not None and self.connection.is_open
+            and self.channel is not None and self.channel.is_open
+        )
+
     def publish_message(self, message):
-        self.channel.basic_publish(exchange='',
-                                   routing_key=self.queue_name,
-                                   body=message,
-                                   properties=pika.BasicProperties(
-                                       delivery_mode=2,  # make message persistent
-                                   ))
+        for attempt in range(2):
+            try:
+                if not self.is_open:
+                    self.connect()
+                self.channel.basic_publish(exchange='',
+                                           routing_key=self.queue_name,
+                                           body=message,
+                                           properties=pika.BasicProperties(
+                                               delivery_mode=2,  # make message persistent
+                                           ))
+                break
+            except (pika.exceptions.UnroutableError, pika.exceptions.NackError):
+                raise
+            except pika.exceptions.AMQPError as error:
+                # Idle connections are dropped by the broker's heartbeat check
+                self.close_connection()
+                if attempt:
+                    raise
+                logger.info(f"[!] Reconnecting to RabbitMQ - {error!r}")
         logger.debug(f" [x] Sent '{message}'")
 
     def close_connection(self):
-        self.connection.close()
+        try:
+            if self.connection is not None and self.connection.is_open:
+                self.connection.close()
+        except Exception:
+            pass
+        self.connection = None
+        self.channel = None
+
+
+class RabbitMQPublisherPool:
+    """
+    Up to `size` RabbitMQPublishers for a queue, shared by a worker's greenlets
+
+    A BlockingConnection must not be used by two greenlets at once, each
+    publish checks a publisher out and returns it afterwards
+    """
+
+    def __init__(self, queue_name, size=4, confirm=True):
+        self.queue_name = queue_name
+        self.size = size
+        self.confirm = confirm
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _checkout(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            create = self._created < self.size
+            if create:
+                self._created += 1
+        if not create:
+            return self._idle.get()
+
+        try:
+            return self.create_publisher()
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
+
+    def create_publisher(self):
+        return RabbitMQPublisher(self.queue_name, confirm=self.confirm)
+
+    @contextmanager
+    def publisher(self):
+        publisher = self._checkout()
+        try:
+            yield publisher
+        except Exception:
+            # Start the next user on a fresh connection
+            publisher.close_connection()
+            raise
+        finally:
+            self._idle.put(publisher)
+
+    def publish(self, message):
+        with self.publisher() as publisher:
+            publisher.publish_message(message)
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close_connection()
+            except queue.Empty:
+                break
+
+
+_pools = {}
+_pools_pid = None
+_pools_lock = threading.Lock()
+
+
+def get_rabbitmq_publishers(queue_name) -> RabbitMQPublisherPool:
+    """
+    Returns this process's publisher pool for a queue, creating it on first use
+    """
+    global _pools, _pools_pid
+    with _pools_lock:
+        if _pools_pid != os.getpid():
+            # Forked workers must not share the parent's connections
+            _pools = {}
+            _pools_pid = os.getpid()
 
+        pool = _pools.get(queue_name)
+        if pool is None:
+            pool = RabbitMQPublisherPool(
+                queue_name,
+                size=settings.MQTT_PUBLISHER_POOL_SIZE,
+                confirm=settings.MQTT_PUBLISHER_CONFIRMS,
+            )
+            _pools[queue_name] = pool
+        return pool
@@ -0,0 +1,157 @@
+import logging
+
+from collections import defaultdict
+
+from radio.models import Agency, System, SystemRecorder, TalkGroup
+
+logger = logging.getLogger(__name__)
+
+
+def transmission_topics(_transmission: dict, system_uuids: set, agency_uuids: set) -> list[str]:
+    """
+    Topics a transmission is published to on a broker limited to the given
+    systems and agencies, an empty set means all of them
+
+    Built from the payload alone, for transmissions a routing table does not know yet
+    """
+    system = _transmission["system"]
+    system_name = _transmission.get("system_name") or system
+    recorder = _transmission.get("recorder") or {}
+    talkgroup = _transmission.get("talkgroup") or {}
+
+    targets = []
+    if not system_uuids or str(system) in system_uuids:
+        targets += [
+            f"system/{system}",
+            f"system/{system_name}",
+            f"system/{system_name}/site/{recorder.get('site_id')}",
+            f"system/{system_name}/site/{recorder.get('name')}",
+        ]
+        if "alpha_tag" in talkgroup:
+            targets += [
+                f"system/{system}/talkgroup/{talkgroup['UUID']}",
+                f"system/{system_name}/talkgroup/{talkgroup['alpha_tag']}",
+            ]
+
+    for agency in talkgroup.get("agency") or []:
+        if not agency_uuids or str(agency["UUID"]) in agency_uuids:
+            targets += [
+                f"agency/{agency['UUID']}",
+                f"agency/{agency['name']}",
+            ]
+
+    return list(dict.fromkeys(targets))
+
+
+class MqttRoutingTable:
+    """
+    Precomputed topics for one MqttServer
+
+    systems    - system UUID -> system topics
+    recorders  - recorder UUID -> site topics
+    talkgroups - talkgroup UUID -> talkgroup and agency topics
+
+    Every known system, recorder and talkgroup has an entry, the ones outside the
+    server's limits map to no topics. Resolved routes are kept per
+    (system, recorder, talkgroup), a transmission naming anything the table does
+    not know is routed from its payload instead
+    """
+
+    def __init__(self, system_uuids: set = None, agency_uuids: set = None) -> None:
+        self.system_uuids = system_uuids or set()
+        self.agency_uuids = agency_uuids or set()
+        self.systems: dict[str, tuple] = {}
+        self.recorders: dict[str, tuple] = {}
+        self.talkgroups: dict[str, tuple] = {}
+        self._routes: dict[tuple, tuple] = {}
+
+    def routes_system(self, system_uuid: str) -> bool:
+        return not self.system_uuids or system_uuid in self.system_uuids
+
+    def routes_agency(self, agency_uuid: str) -> bool:
+        return not self.agency_uuids or agency_uuid in self.agency_uuids
+
+    def topics(self, _transmission: dict) -> tuple[str]:
+        key = (
+            str(_transmission["system"]),
+            str((_transmission.get("recorder") or {}).get("recorder")),
+            str((_transmission.get("talkgroup") or {}).get("UUID")),
+        )
+        routes = self._routes.get(key)
+        if routes is not None:
+            return routes
+
+        system_uuid, recorder_uuid, talkgroup_uuid = key
+        if system_uuid not in self.systems or recorder_uuid not in self.recorders or talkgroup_uuid not in self.talkgroups:
+            return tuple(transmission_topics(_transmission, self.system_uuids, self.agency_uuids))
+
+        routes = tuple(dict.fromkeys(
+            self.systems[system_uuid] + self.recorders[recorder_uuid] + self.talkgroups[talkgroup_uuid]
+        ))
+        self._routes[key] = routes
+        return routes
+
+
+def compile_routing_tables(mqtt_servers) -> dict[str, MqttRoutingTable]:
+    """
+    Builds the routing table of every MqttServer in five queries
+
+    Expects the servers' systems and agencies to be prefetched
+    """
+    systems = dict(
+        (str(system_uuid), name) for system_uuid, name in System.objects.values_list("UUID", "name")
+    )
+    recorders = [
+        (str(recorder_uuid), str(system_uuid), site_id, name)
+        for recorder_uuid, system_uuid, site_id, name in SystemRecorder.objects.values_list(
+            "UUID", "system_id", "site_id", "name"
+        )
+    ]
+    talkgroups = [
+        (str(talkgroup_uuid), str(system_uuid), alpha_tag)
+        for talkgroup_uuid, system_uuid, alpha_tag in TalkGroup.objects.values_list(
+            "UUID", "system_id", "alpha_tag"
+        )
+    ]
+    agencies = dict(
+        (str(agency_uuid), name) for agency_uuid, name in Agency.objects.values_list("UUID", "name")
+    )
+    talkgroup_agencies = defaultdict(list)
+    for talkgroup_uuid, agency_uuid in TalkGroup.agency.through.objects.values_list("talkgroup_id", "agency_id"):
+        talkgroup_agencies[str(talkgroup_uuid)].append(str(agency_uuid))
+
+    tables = {}
+    for mqtt_server in mqtt_servers:
+        table = MqttRoutingTable(
+            set(str(system.UUID) for system in mqtt_server.systems.all()),
+            set(str(agency.UUID) for agency in mqtt_server.agencies.all()),
+        )
+
+        for system_uuid, name in systems.items():
+            table.systems[system_uuid] = (
+                (f"system/{system_uuid}", f"system/{name}") if table.routes_system(system_uuid) else ()
+            )
+
+        for recorder_uuid, system_uuid, site_id, name in recorders:
+            system_name = systems.get(system_uuid, system_uuid)
+            table.recorders[recorder_uuid] = (
+                (f"system/{system_name}/site/{site_id}", f"system/{system_name}/site/{name}")
+                if table.routes_system(system_uuid) else ()
+            )
+
+        for talkgroup_uuid, system_uuid, alpha_tag in talkgroups:
+            routes = []
+            if table.routes_system(system_uuid):
+                routes += [
+                    f"system/{system_uuid}/talkgroup/{talkgroup_uuid}",
+                    f"system/{systems.get(system_uuid, system_uuid)}/talkgroup/{alpha_tag}",
+                ]
+            for agency_uuid in talkgroup_agencies[talkgroup_uuid]:
+                if table.routes_agency(agency_uuid):
+                    routes += [f"agency/{agency_uuid}", f"agency/{agencies[agency_uuid]}"]
+            table.talkgroups[talkgroup_uuid] = tuple(routes)
+
+        tables[str(mqtt_server.UUID)] = table
+
+    logger.debug(f"[+] Compiled MQTT routes for {len(tables)} servers - {len(talkgroups)} talkgroups")
+    return tables
@@ -0,0 +1,96 @@
+import socketserver
+import threading
+
+from collections import Counter
+
+CONNECT = 0x10
+CONNACK = 0x20
+PUBLISH = 0x30
+PUBACK = 0x40
+PUBREC = 0x50
+PUBREL = 0x60
+PUBCOMP = 0x70
+PINGREQ = 0xC0
+PINGRESP = 0xD0
+DISCONNECT = 0xE0
+
+
+class _MqttHandler(socketserver.BaseRequestHandler):
+    def _read(self, size: int) -> bytes:
+        data = b""
+        while len(data) < size:
+            chunk = self.request.recv(size - len(data))
+            if not chunk:
+                raise ConnectionError("client went away")
+            data += chunk
+        return data
+
+    def _read_packet(self) -> tuple[int, bytes]:
+        header = self._read(1)[0]
+        length, multiplier = 0, 1
+        while True:
+            digit = self._read(1)[0]
+            length += (digit & 0x7F) * multiplier
+            if not digit & 0x80:
+                break
+            multiplier *= 128
+        return header, self._read(length) if length else b""
+
+    def handle(self) -> None:
+        broker: StandInBroker = self.server.broker
+        broker.connections += 1
+        try:
+            while True:
+                header, body = self._read_packet()
+                kind = header & 0xF0
+                if kind == CONNECT:
+                    self.request.sendall(bytes([CONNACK, 2, 0, 0]))
+                elif kind == PUBLISH:
+                    qos = (header >> 1) & 0x03
+                    topic_length = int.from_bytes(body[:2], "big")
+                    broker.record(body[2:2 + topic_length].decode())
+                    if qos:
+                        packet_id = body[2 + topic_length:4 + topic_length]
+                        self.request.sendall(bytes([PUBACK if qos == 1 else PUBREC, 2]) + packet_id)
+                elif kind == PUBREL:
+                    self.request.sendall(bytes([PUBCOMP, 2]) + body[:2])
+                elif kind == PINGREQ:
+                    self.request.sendall(bytes([PINGRESP, 0]))
+                elif kind == DISCONNECT:
+                    return
+        except (ConnectionError, OSError):
+            return
+
+
+class StandInBroker:
+    """
+    Minimal MQTT 3.1.1 broker standing in for mosquitto in benchmarks and tests
+
+    Accepts every CONNECT, acknowledges QoS 1/2 publishes and counts the
+    messages received per topic, nothing is routed to subscribers
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0) -> None:
+        self.server = socketserver.ThreadingTCPServer((host, port), _MqttHandler)
+        self.server.daemon_threads = True
+        self.server.broker = self
+        self.host, self.port = self.server.server_address
+        self.connections = 0
+        self.topics = Counter()
+        self._lock = threading.Lock()
+
+    @property
+    def received(self) -> int:
+        return sum(self.topics.values())
+
+    def record(self, topic: str) -> None:
+        with self._lock:
+            self.topics[topic] += 1
+
+    def start(self) -> "StandInBroker":
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
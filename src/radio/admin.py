@@ -12,6 +12,8 @@ from radio.models import (
     Unit,
     Transmission,
     Incident,
+    AudioTombstone,
+    PruneCheckpoint,
     TalkGroupACL,
     ScanList,
     Scanner,
@@ -207,6 +209,27 @@ class IncidentAdmin(admin.ModelAdmin):
     list_display = ("name", "time", "system", "description")
     list_filter = ("system",)
 
+@admin.register(AudioTombstone)
+class AudioTombstoneAdmin(admin.ModelAdmin):
+    ordering = ("created",)
+    list_display = ("name", "created", "attempts", "next_attempt", "last_error")
+    list_filter = ("attempts",)
+    search_fields = ("name",)
+
+@admin.register(PruneCheckpoint)
+class PruneCheckpointAdmin(admin.ModelAdmin):
+    ordering = ("-updated",)
+    list_display = (
+        "system",
+        "cutoff",
+        "last_start_time",
+        "finished",
+        "rows_deleted",
+        "bytes_reclaimed",
+        "updated",
+    )
+    readonly_fields = ("last_start_time", "last_UUID", "rows_deleted", "bytes_reclaimed")
+
 @admin.register(TalkGroupACL)
 class TalkgroupACLAdmin(admin.ModelAdmin):
     ordering = ("-name",)
@@ -408,6 +408,8 @@ class TransmissionFilter(filters.FilterSet):
     length__gt = django_filters.NumberFilter(field_name='length', lookup_expr='gt')
     length__lt = django_filters.NumberFilter(field_name='length', lookup_expr='lt')
 
+    unit = django_filters.UUIDFilter(method='filter_unit')
+
     order_by_field = 'ordering'
     ordering = OrderingFilter(
         # fields(('model field name', 'parameter name'),)
@@ -430,6 +432,7 @@ class TransmissionFilter(filters.FilterSet):
             "end_time",
             "talkgroup",
             "encrypted",
+            "emergency",
             #"units",
             "frequency",
             #"frequencys",
@@ -441,6 +444,10 @@ class TransmissionFilter(filters.FilterSet):
             "tones_detected",
         ]
 
+    def filter_unit(self, queryset, name, value):
+        # JSON containment so the lookup is served by radio_tx_units_gin
+        return queryset.filter(units__contains=[{"unit": {"UUID": str(value)}}])
+
 class GlobalAnnouncementFilter(filters.FilterSet):
     name = django_filters.CharFilter(lookup_expr='icontains')
     description = django_filters.CharFilter(lookup_expr='icontains')
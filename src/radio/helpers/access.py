@@ -0,0 +1,194 @@
+import uuid
+import logging
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q, QuerySet
+
+from radio.helpers.cache import VersionedCache
+from radio.models import (
+    ScanList,
+    Scanner,
+    System,
+    SystemACL,
+    TalkGroup,
+    TalkGroupACL,
+    UserProfile,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class UserAccess:
+    """
+    Materialized talkgroup access for a single user
+
+    systems      - systems the user can see (SystemACL member or public)
+    readable     - talkgroups the user can listen to
+    downloadable - talkgroups the user can download
+    """
+    __slots__ = ("systems", "readable", "downloadable")
+
+    def __init__(self, systems: frozenset, readable: frozenset, downloadable: frozenset) -> None:
+        self.systems = systems
+        self.readable = readable
+        self.downloadable = downloadable
+
+    def can_read(self, talkgroup_uuid) -> bool:
+        return str(talkgroup_uuid) in self.readable
+
+    def can_download(self, talkgroup_uuid) -> bool:
+        return str(talkgroup_uuid) in self.downloadable
+
+
+access_cache = VersionedCache("access", track_keys=True, authorization=True)
+
+
+def build_user_access(user_uuid: str) -> UserAccess:
+    """
+    Builds a user's access index from the System and TalkGroup ACLs
+    """
+    systems = (
+        System.objects.filter(
+            systemACL__in=SystemACL.objects.filter(Q(users__UUID=user_uuid) | Q(public=True))
+        )
+        .values_list("UUID", "enable_talkgroup_acls")
+        .distinct()
+    )
+
+    system_uuids = set()
+    open_systems = []
+    acl_systems = []
+    for system_uuid, enable_talkgroup_acls in systems:
+        system_uuids.add(str(system_uuid))
+        if enable_talkgroup_acls:
+            acl_systems.append(system_uuid)
+        else:
+            open_systems.append(system_uuid)
+
+    readable = set(
+        str(talkgroup_uuid)
+        for talkgroup_uuid in TalkGroup.objects.filter(system__in=open_systems).values_list("UUID", flat=True)
+    )
+    downloadable = set(readable)
+
+    if acl_systems:
+        acl_talkgroups = TalkGroupACL.objects.filter(
+            users__UUID=user_uuid, allowed_talkgroups__system__in=acl_systems
+        ).values_list("allowed_talkgroups__UUID", "download_allowed")
+
+        for talkgroup_uuid, download_allowed in acl_talkgroups:
+            readable.add(str(talkgroup_uuid))
+            if download_allowed:
+                downloadable.add(str(talkgroup_uuid))
+
+    return UserAccess(frozenset(system_uuids), frozenset(readable), frozenset(downloadable))
+
+
+def get_user_access(user_uuid: str) -> UserAccess:
+    """
+    Returns the (cached) access index for a user
+    """
+    return access_cache.get_or_load(str(user_uuid), lambda: build_user_access(user_uuid))
+
+
+def invalidate_user_access(user_uuids=None) -> None:
+    """
+    Drops the access index for the given users, or for everyone when None
+
+    Runs now and again on commit, so a reader racing the ACL change can not
+    keep a stale index cached after the change lands
+    """
+    if user_uuids is None:
+        access_cache.invalidate()
+        transaction.on_commit(access_cache.invalidate)
+        return
+
+    keys = [str(user_uuid) for user_uuid in user_uuids]
+    if not keys:
+        return
+
+    access_cache.invalidate_keys(keys)
+    transaction.on_commit(lambda: access_cache.invalidate_keys(keys))
+
+
+def talkgroup_acl_users(acl_uuids) -> list:
+    """
+    Returns the users in the given talkgroup ACLs
+    """
+    return list(
+        UserProfile.objects.filter(talkgroupacl__UUID__in=list(acl_uuids))
+        .values_list("UUID", flat=True)
+        .distinct()
+    )
+
+
+def transmission_access_predicate(user_uuid: str) -> Q:
+    """
+    Single SQL predicate matching the transmissions a user can read
+
+    The system must be public or have the user in its SystemACL, and talkgroup ACL
+    systems additionally need a TalkGroupACL of the user covering the talkgroup
+    """
+    system_member = SystemACL.users.through.objects.filter(
+        systemacl_id=OuterRef("system__systemACL_id"),
+        userprofile_id=user_uuid,
+    )
+    talkgroup_allowed = TalkGroupACL.allowed_talkgroups.through.objects.filter(
+        talkgroup_id=OuterRef("talkgroup_id"),
+        talkgroupacl__users=user_uuid,
+    )
+
+    return (
+        (Q(system__systemACL__public=True) | Exists(system_member))
+        & (Q(system__enable_talkgroup_acls=False) | Exists(talkgroup_allowed))
+    )
+
+
+def filter_transmissions_for_user(queryset: QuerySet, user: UserProfile) -> QuerySet:
+    """
+    Restricts a Transmission queryset to what the user can read
+    """
+    if user.site_admin:
+        return queryset
+    return queryset.filter(transmission_access_predicate(user.UUID))
+
+
+def authorize_tx_sources(user: UserProfile, sources: list) -> dict[str, list[str]]:
+    """
+    Resolves talkgroup, scanlist and scanner UUIDs to the talkgroups the user can read
+
+    Returns {source UUID: [talkgroup UUIDs]}, sources the user can not see are left out
+    """
+    source_uuids = set()
+    for source in sources:
+        try:
+            source_uuids.add(uuid.UUID(str(source)))
+        except ValueError:
+            continue
+
+    visible = Q()
+    if not user.site_admin:
+        visible = Q(owner=user) | Q(community_shared=True) | Q(public=True)
+
+    resolved = {}
+    for talkgroup_uuid in TalkGroup.objects.filter(UUID__in=source_uuids).values_list("UUID", flat=True):
+        resolved[str(talkgroup_uuid)] = [str(talkgroup_uuid)]
+
+    for scanlist_uuid, talkgroup_uuid in ScanList.talkgroups.through.objects.filter(
+        scanlist__in=ScanList.objects.filter(visible, UUID__in=source_uuids)
+    ).values_list("scanlist_id", "talkgroup_id"):
+        resolved.setdefault(str(scanlist_uuid), []).append(str(talkgroup_uuid))
+
+    for scanner_uuid, talkgroup_uuid in ScanList.talkgroups.through.objects.filter(
+        scanlist__scanner__in=Scanner.objects.filter(visible, UUID__in=source_uuids)
+    ).values_list("scanlist__scanner", "talkgroup_id"):
+        resolved.setdefault(str(scanner_uuid), []).append(str(talkgroup_uuid))
+
+    if user.site_admin:
+        return {source: list(dict.fromkeys(talkgroups)) for source, talkgroups in resolved.items()}
+
+    access: UserAccess = get_user_access(user.UUID)
+    return {
+        source: list(dict.fromkeys(talkgroup for talkgroup in talkgroups if access.can_read(talkgroup)))
+        for source, talkgroups in resolved.items()
+    }
@@ -0,0 +1,247 @@
+import time
+import logging
+import threading
+
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache as shared_cache
+from django.db import transaction
+
+from radio.helpers.cache import is_shared_cache
+from radio.models import UserAlert
+
+logger = logging.getLogger(__name__)
+
+ALERT_INDEX_VERSION_KEY = "tpng:alerts:version"
+# Changes older than this many versions are not replayed, the index is rebuilt instead
+ALERT_INDEX_MAX_REPLAY = 1000
+
+ALERT_FIELDS = (
+    "UUID",
+    "user_id",
+    "name",
+    "web_notification",
+    "app_rise_notification",
+    "app_rise_urls",
+    "emergency_only",
+    "count",
+    "trigger_time",
+    "title",
+    "body",
+)
+
+
+class IndexedAlert:
+    """
+    The parts of an enabled UserAlert needed to send its notifications
+    """
+    __slots__ = ALERT_FIELDS
+
+    def __init__(self, **fields) -> None:
+        for field in ALERT_FIELDS:
+            setattr(self, field, fields[field])
+
+
+def _change_key(version: int) -> str:
+    return f"tpng:alerts:change:{version}"
+
+
+class AlertIndex:
+    """
+    In-process inverted index of enabled user alerts
+
+    by_talkgroup - talkgroup UUID -> alert UUIDs
+    by_unit      - unit UUID -> alert UUIDs
+
+    Every UserAlert change bumps a version in the Django cache and records the
+    alert that changed under that version. Processes check the version every
+    RESOLUTION_CACHE_VERSION_CHECK seconds and reload only the alerts that
+    changed, falling back to a full rebuild when changes are missing. Version
+    bumps never reach other processes through a cache backend that is not
+    shared, so there every check rebuilds the index instead
+    """
+
+    def __init__(self, cache=None, shared: bool = None) -> None:
+        self.cache = cache if cache is not None else shared_cache
+        # None follows the CACHES backend
+        self.shared = shared
+        self.alerts: dict[str, IndexedAlert] = {}
+        self.by_talkgroup = defaultdict(set)
+        self.by_unit = defaultdict(set)
+        self._watching = {}
+        self._version = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _load(alert_uuids=None) -> tuple[list, list, list]:
+        alerts = UserAlert.objects.filter(enabled=True)
+        talkgroups = UserAlert.talkgroups.through.objects.filter(useralert__enabled=True)
+        units = UserAlert.units.through.objects.filter(useralert__enabled=True)
+        if alert_uuids is not None:
+            alerts = alerts.filter(UUID__in=alert_uuids)
+            talkgroups = talkgroups.filter(useralert_id__in=alert_uuids)
+            units = units.filter(useralert_id__in=alert_uuids)
+
+        return (
+            list(alerts.values(*ALERT_FIELDS)),
+            list(talkgroups.values_list("useralert_id", "talkgroup_id")),
+            list(units.values_list("useralert_id", "unit_id")),
+        )
+
+    def _remove(self, alert_uuid: str) -> None:
+        self.alerts.pop(alert_uuid, None)
+        talkgroups, units = self._watching.pop(alert_uuid, ((), ()))
+        for index, keys in ((self.by_talkgroup, talkgroups), (self.by_unit, units)):
+            for key in keys:
+                index[key].discard(alert_uuid)
+                if not index[key]:
+                    del index[key]
+
+    def _add(self, alerts: list, talkgroups: list, units: list) -> None:
+        for fields in alerts:
+            self.alerts[str(fields["UUID"])] = IndexedAlert(**fields)
+            self._watching[str(fields["UUID"])] = (set(), set())
+        for alert_uuid, talkgroup_uuid in talkgroups:
+            self.by_talkgroup[str(talkgroup_uuid)].add(str(alert_uuid))
+            self._watching.setdefault(str(alert_uuid), (set(), set()))[0].add(str(talkgroup_uuid))
+        for alert_uuid, unit_uuid in units:
+            self.by_unit[str(unit_uuid)].add(str(alert_uuid))
+            self._watching.setdefault(str(alert_uuid), (set(), set()))[1].add(str(unit_uuid))
+
+    def _is_shared(self) -> bool:
+        return is_shared_cache() if self.shared is None else self.shared
+
+    def _read_version(self):
+        try:
+            version = self.cache.get(ALERT_INDEX_VERSION_KEY)
+            if version is None:
+                self.cache.add(ALERT_INDEX_VERSION_KEY, 0, None)
+                version = self.cache.get(ALERT_INDEX_VERSION_KEY, 0)
+            return version
+        except Exception as error:
+            logger.warning(f"[!] Unable to read alert index version - {error}")
+            return None
+
+    def rebuild(self, version: int = None) -> None:
+        """
+        Loads every enabled alert in three queries
+        """
+        if version is None:
+            version = self._read_version()
+        loaded = self._load()
+        with self._lock:
+            self.alerts = {}
+            self.by_talkgroup = defaultdict(set)
+            self.by_unit = defaultdict(set)
+            self._watching = {}
+            self._add(*loaded)
+            self._version = version
+        logger.debug(f"[+] Built alert index - {len(self.alerts)} alerts")
+
+    def reload(self, alert_uuids) -> None:
+        """
+        Reloads single alerts, dropping the ones that are gone or disabled
+        """
+        alert_uuids = set(str(alert_uuid) for alert_uuid in alert_uuids)
+        loaded = self._load(alert_uuids)
+        with self._lock:
+            for alert_uuid in alert_uuids:
+                self._remove(alert_uuid)
+            self._add(*loaded)
+
+    def sync(self) -> None:
+        """
+        Applies the alert changes other processes recorded since the last check
+        """
+        now = time.monotonic()
+        if self._version is not None and now - self._checked < settings.RESOLUTION_CACHE_VERSION_CHECK:
+            return
+        self._checked = now
+
+        version = self._read_version()
+        if (
+            version is None or self._version is None or version < self._version
+            or not self._is_shared()
+        ):
+            self.rebuild(version)
+            return
+        if version == self._version:
+            return
+        if version - self._version > ALERT_INDEX_MAX_REPLAY:
+            self.rebuild(version)
+            return
+
+        keys = [_change_key(change) for change in range(self._version + 1, version + 1)]
+        try:
+            changes = self.cache.get_many(keys)
+        except Exception:
+            changes = {}
+        if len(changes) != len(keys):
+            self.rebuild(version)
+            return
+
+        self.reload(changes.values())
+        self._version = version
+
+    def match(self, talkgroup_uuid: str, unit_uuids) -> tuple[list, dict]:
+        """
+        Returns the alerts for a transmission
+
+        ([alerts watching the talkgroup], {alert UUID: (alert, [matched unit UUIDs])})
+        """
+        self.sync()
+
+        talkgroup_alerts = [
+            self.alerts[alert_uuid]
+            for alert_uuid in self.by_talkgroup.get(str(talkgroup_uuid), ())
+            if alert_uuid in self.alerts
+        ]
+
+        unit_alerts = {}
+        for unit_uuid in unit_uuids:
+            for alert_uuid in self.by_unit.get(str(unit_uuid), ()):
+                if alert_uuid not in self.alerts:
+                    continue
+                unit_alerts.setdefault(alert_uuid, (self.alerts[alert_uuid], []))[1].append(str(unit_uuid))
+
+        return talkgroup_alerts, unit_alerts
+
+
+alert_index = AlertIndex()
+
+
+def record_alert_change(alert_uuids) -> None:
+    """
+    Tells every process's alert index to reload the given alerts
+
+    Recorded now and again on commit, so an index reloading while the change
+    is still uncommitted picks it up afterwards
+    """
+    alert_uuids = [str(alert_uuid) for alert_uuid in alert_uuids]
+    if not alert_uuids:
+        return
+
+    def _record():
+        try:
+            try:
+                version = shared_cache.incr(ALERT_INDEX_VERSION_KEY, len(alert_uuids))
+            except ValueError:
+                shared_cache.add(ALERT_INDEX_VERSION_KEY, 0, None)
+                version = shared_cache.incr(ALERT_INDEX_VERSION_KEY, len(alert_uuids))
+
+            shared_cache.set_many(
+                {
+                    _change_key(version - offset): alert_uuid
+                    for offset, alert_uuid in enumerate(reversed(alert_uuids))
+                },
+                timeout=86400,
+            )
+        except Exception as error:
+            logger.warning(f"[!] Unable to record alert change - {error}")
+        # This process does not wait for the version check
+        alert_index.reload(alert_uuids)
+
+    _record()
+    transaction.on_commit(_record)
@@ -0,0 +1,312 @@
+import os
+import logging
+import posixpath
+
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from radio.models import AudioTombstone, PruneCheckpoint, Transmission
+
+logger = logging.getLogger(__name__)
+
+AUDIO_ROOT = "audio"
+
+# S3 DeleteObjects takes at most 1000 keys per call
+S3_DELETE_LIMIT = 1000
+
+# Claimed tombstones are left to other GC runs if this one dies before recording them
+AUDIO_GC_CLAIM_LEASE = timedelta(minutes=15)
+
+
+def get_audio_storage():
+    """
+    Returns the storage transmission audio lives in
+    """
+    return Transmission._meta.get_field("audio_file").storage
+
+
+def _is_s3(storage) -> bool:
+    return hasattr(storage, "bucket") and hasattr(storage, "_normalize_name")
+
+
+def _remove_empty_dirs(storage: FileSystemStorage, directories) -> None:
+    """
+    Removes emptied audio directories, deepest first, stopping at the audio root
+    """
+    root = os.path.realpath(storage.path(AUDIO_ROOT))
+    for directory in sorted(set(directories), key=lambda name: name.count("/"), reverse=True):
+        path = os.path.realpath(storage.path(directory))
+        while path.startswith(root + os.sep):
+            try:
+                os.rmdir(path)
+            except OSError:
+                # Not empty (or already gone), so neither are its parents
+                break
+            path = os.path.dirname(path)
+
+
+def _delete_s3(storage, names: list[str]) -> tuple[dict, dict]:
+    keys = {storage._normalize_name(name): name for name in names}
+    errors = {}
+
+    key_list = list(keys)
+    for index in range(0, len(key_list), S3_DELETE_LIMIT):
+        response = storage.bucket.delete_objects(
+            Delete={
+                "Objects": [{"Key": key} for key in key_list[index:index + S3_DELETE_LIMIT]],
+                "Quiet": True,
+            }
+        )
+        for error in response.get("Errors", []):
+            errors[keys.get(error["Key"], error["Key"])] = f"{error.get('Code')} {error.get('Message')}"
+
+    # S3 does not report sizes on delete
+    return {name: 0 for name in names if name not in errors}, errors
+
+
+def _delete_local(storage: FileSystemStorage, names: list[str]) -> tuple[dict, dict]:
+    reclaimed = {}
+    errors = {}
+    for name in names:
+        path = storage.path(name)
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+            reclaimed[name] = size
+        except FileNotFoundError:
+            reclaimed[name] = 0
+        except OSError as error:
+            errors[name] = str(error)
+
+    _remove_empty_dirs(storage, [posixpath.dirname(name) for name in names])
+    return reclaimed, errors
+
+
+def delete_audio_files(names: list[str]) -> tuple[dict, dict]:
+    """
+    Bulk removes audio from storage
+
+    Returns ({name: bytes reclaimed}, {name: error}), files that are already
+    gone count as removed
+    """
+    storage = get_audio_storage()
+    if _is_s3(storage):
+        return _delete_s3(storage, names)
+    if isinstance(storage, FileSystemStorage):
+        return _delete_local(storage, names)
+
+    reclaimed = {}
+    errors = {}
+    for name in names:
+        try:
+            storage.delete(name)
+            reclaimed[name] = 0
+        except Exception as error:
+            errors[name] = str(error)
+    return reclaimed, errors
+
+
+def iter_audio_files(prefix: str = AUDIO_ROOT):
+    """
+    Yields (name, size, modified) for every file under the audio root
+    """
+    storage = get_audio_storage()
+
+    if _is_s3(storage):
+        location = storage.location.strip("/")
+        for summary in storage.bucket.objects.filter(Prefix=f"{storage._normalize_name(prefix)}/"):
+            name = summary.key[len(location) + 1:] if location else summary.key
+            yield name, summary.size, summary.last_modified
+        return
+
+    if isinstance(storage, FileSystemStorage):
+        root = storage.path(prefix)
+        for dirpath, _, filenames in os.walk(root):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                stat = os.stat(path)
+                name = posixpath.join(prefix, os.path.relpath(path, root).replace(os.sep, "/"))
+                yield name, stat.st_size, datetime.fromtimestamp(stat.st_mtime, tz=dt_timezone.utc)
+        return
+
+    directories = [prefix]
+    while directories:
+        directory = directories.pop()
+        subdirectories, filenames = storage.listdir(directory)
+        directories.extend(posixpath.join(directory, subdirectory) for subdirectory in subdirectories)
+        for filename in filenames:
+            name = posixpath.join(directory, filename)
+            yield name, storage.size(name), storage.get_modified_time(name)
+
+
+def schedule_audio_gc() -> None:
+    """
+    Queues one audio GC run for after the current transaction commits
+
+    Runs are debounced to one per AUDIO_GC_DELAY seconds so a burst of deletes
+    ends up in a few large batches instead of a task per file
+    """
+    from radio.tasks import collect_audio_garbage
+
+    def _schedule():
+        try:
+            if not cache.add("tpng:audio-gc:scheduled", True, settings.AUDIO_GC_DELAY):
+                return
+        except Exception as error:
+            logger.warning(f"[!] Unable to debounce audio GC - {error}")
+        collect_audio_garbage.apply_async(countdown=settings.AUDIO_GC_DELAY)
+
+    transaction.on_commit(_schedule)
+
+
+def tombstone_audio(names: list[str], system_uuid=None) -> None:
+    """
+    Records audio that no longer belongs to a transmission for the audio GC
+    """
+    tombstones = [
+        AudioTombstone(name=name, system_UUID=system_uuid) for name in names if name
+    ]
+    if not tombstones:
+        return
+
+    AudioTombstone.objects.bulk_create(tombstones, ignore_conflicts=True)
+    schedule_audio_gc()
+
+
+def _claim_tombstones() -> list[AudioTombstone]:
+    """
+    Takes the next batch of due tombstones, pushing their next attempt past the
+    claim lease so other GC runs skip them while the files are removed
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        tombstones = list(
+            AudioTombstone.objects.select_for_update(skip_locked=True)
+            .filter(attempts__lt=settings.AUDIO_GC_MAX_ATTEMPTS, next_attempt__lte=now)
+            .order_by("created")[:min(settings.AUDIO_GC_BATCH_SIZE, S3_DELETE_LIMIT)]
+        )
+        AudioTombstone.objects.filter(UUID__in=[tombstone.UUID for tombstone in tombstones]).update(
+            next_attempt=now + AUDIO_GC_CLAIM_LEASE
+        )
+    return tombstones
+
+
+def _record_removals(tombstones: list[AudioTombstone], reclaimed: dict, errors: dict) -> timedelta:
+    """
+    Clears removed tombstones and backs off failed ones, returns the shortest backoff
+    """
+    now = timezone.now()
+    backoff = None
+    failed = []
+    system_bytes = defaultdict(int)
+    for tombstone in tombstones:
+        if tombstone.name in errors:
+            tombstone.attempts += 1
+            tombstone.last_error = errors[tombstone.name]
+            delay = timedelta(seconds=settings.AUDIO_GC_RETRY_DELAY * 2 ** (tombstone.attempts - 1))
+            tombstone.next_attempt = now + delay
+            backoff = delay if backoff is None else min(backoff, delay)
+            failed.append(tombstone)
+        elif tombstone.system_UUID and reclaimed[tombstone.name]:
+            system_bytes[tombstone.system_UUID] += reclaimed[tombstone.name]
+
+    with transaction.atomic():
+        AudioTombstone.objects.filter(
+            UUID__in=[tombstone.UUID for tombstone in tombstones if tombstone.name not in errors]
+        ).delete()
+        AudioTombstone.objects.bulk_update(failed, ["attempts", "last_error", "next_attempt"])
+
+        for system_uuid, size in system_bytes.items():
+            PruneCheckpoint.objects.filter(system_id=system_uuid).update(
+                bytes_reclaimed=F("bytes_reclaimed") + size
+            )
+    return backoff
+
+
+def _collect_audio_garbage() -> tuple[int, int]:
+    """
+    Removes tombstoned audio from storage in batches
+
+    Each batch is claimed in one transaction and recorded in another, so no row
+    locks are held while storage is called. Failed removals are retried after
+    AUDIO_GC_RETRY_DELAY seconds, doubled on each attempt, up to
+    AUDIO_GC_MAX_ATTEMPTS times.
+
+    Returns the files removed and bytes reclaimed (local storage only), queues
+    another run when tombstones are left after AUDIO_GC_MAX_BATCHES batches or
+    failed removals are waiting for a retry
+    """
+    from radio.tasks import collect_audio_garbage
+
+    removed = 0
+    reclaimed_total = 0
+    retry = None
+    for _ in range(settings.AUDIO_GC_MAX_BATCHES):
+        tombstones = _claim_tombstones()
+        if not tombstones:
+            break
+
+        reclaimed, errors = delete_audio_files([tombstone.name for tombstone in tombstones])
+        backoff = _record_removals(tombstones, reclaimed, errors)
+        if backoff is not None:
+            retry = backoff if retry is None else min(retry, backoff)
+
+        removed += len(reclaimed)
+        reclaimed_total += sum(reclaimed.values())
+        for name, error in errors.items():
+            logger.warning(f"[!] Unable to remove audio {name} - {error}")
+    else:
+        collect_audio_garbage.delay()
+
+    if retry is not None:
+        collect_audio_garbage.apply_async(countdown=retry.total_seconds())
+
+    if removed:
+        logger.info(f"Audio GC removed {removed} files ({reclaimed_total} bytes)")
+    return removed, reclaimed_total
+
+
+def _scan_orphan_audio(min_age_hours: int = 24, tombstone: bool = False, batch_size: int = 1000) -> dict:
+    """
+    Reconciles storage against the DB, finding audio no transmission points at
+
+    Files younger than min_age_hours are left alone so uploads that are still
+    being stored are not mistaken for orphans. With tombstone the orphans are
+    handed to the audio GC
+    """
+    cutoff = timezone.now() - timedelta(hours=min_age_hours)
+    stats = {"files": 0, "bytes": 0, "orphans": 0, "orphan_bytes": 0}
+
+    def _reconcile(batch: dict) -> None:
+        known = set(Transmission.objects.filter(audio_file__in=list(batch)).values_list("audio_file", flat=True))
+        known |= set(AudioTombstone.objects.filter(name__in=list(batch)).values_list("name", flat=True))
+
+        orphans = [name for name in batch if name not in known]
+        stats["orphans"] += len(orphans)
+        stats["orphan_bytes"] += sum(batch[name] for name in orphans)
+        if tombstone and orphans:
+            tombstone_audio(orphans)
+
+    batch = {}
+    for name, size, modified in iter_audio_files():
+        stats["files"] += 1
+        stats["bytes"] += size
+        if modified is not None and modified > cutoff:
+            continue
+
+        batch[name] = size
+        if len(batch) >= batch_size:
+            _reconcile(batch)
+            batch = {}
+
+    if batch:
+        _reconcile(batch)
+
+    return stats
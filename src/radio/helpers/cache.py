@@ -0,0 +1,299 @@
+import json
+import time
+import uuid
+import logging
+import threading
+
+from django.conf import settings
+from django.core.cache import cache as shared_cache
+
+from radio.models import (
+    System,
+    SystemRecorder,
+    TalkGroup,
+    Transmission,
+)
+
+logger = logging.getLogger(__name__)
+
+MISSING = object()
+
+
+def is_shared_cache() -> bool:
+    """
+    True when the Django cache is shared between processes, so cache version
+    bumps reach every web and worker process
+    """
+    backend = settings.CACHES["default"]["BACKEND"]
+    return not backend.endswith(("LocMemCache", "DummyCache"))
+
+
+class VersionedCache:
+    """
+    In-process cache whose entries are dropped whenever the namespace version moves
+
+    The version lives in the Django cache, so with a shared backend (memcached, redis,
+    db) an invalidation in one process is picked up by every other process within
+    RESOLUTION_CACHE_VERSION_CHECK seconds. Entries also expire after
+    RESOLUTION_CACHE_TTL seconds as a backstop for the per-process LocMem default
+
+    With track_keys, single entries can be invalidated through a per-key stamp
+    that is checked alongside the namespace version
+
+    Caches holding authorization data (API keys, ACLs) set authorization, on a
+    cache that is not shared their entries only live for
+    RESOLUTION_CACHE_VERSION_CHECK seconds so revoked access stops as quickly
+    in every process
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        max_entries: int = 10000,
+        track_keys: bool = False,
+        authorization: bool = False,
+    ) -> None:
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.track_keys = track_keys
+        self.authorization = authorization
+        self._version_key = f"tpng:resolution:{namespace}:version"
+        self._entries: dict = {}
+        self._version = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def ttl(self) -> float:
+        if self.authorization and not is_shared_cache():
+            return min(settings.RESOLUTION_CACHE_TTL, settings.RESOLUTION_CACHE_VERSION_CHECK)
+        return settings.RESOLUTION_CACHE_TTL
+
+    def _stamp_key(self, key) -> str:
+        return f"tpng:resolution:{self.namespace}:key:{key}"
+
+    def _sync_version(self) -> None:
+        now = time.monotonic()
+        if self._version is not None and now - self._checked < settings.RESOLUTION_CACHE_VERSION_CHECK:
+            return
+
+        keys = list(self._entries) if self.track_keys else []
+        try:
+            found = shared_cache.get_many([self._version_key] + [self._stamp_key(key) for key in keys])
+            version = found.get(self._version_key)
+            if version is None:
+                shared_cache.add(self._version_key, 0, None)
+                version = shared_cache.get(self._version_key, 0)
+        except Exception as error:
+            logger.warning(f"[!] Unable to read {self.namespace} cache version - {error}")
+            found, version = {}, -1
+
+        with self._lock:
+            if version != self._version or version == -1:
+                self._entries.clear()
+                self._version = version
+            else:
+                for key in keys:
+                    entry = self._entries.get(key)
+                    if entry is not None and entry[1] != found.get(self._stamp_key(key)):
+                        self._entries.pop(key, None)
+            self._checked = now
+
+    def get(self, key):
+        """
+        Returns the cached value or MISSING
+        """
+        self._sync_version()
+
+        entry = self._entries.get(key)
+        if entry is None:
+            return MISSING
+
+        expires, _, value = entry
+        if expires < time.monotonic():
+            self._entries.pop(key, None)
+            return MISSING
+        return value
+
+    def _read_stamp(self, key):
+        if not self.track_keys:
+            return None
+        try:
+            return shared_cache.get(self._stamp_key(key))
+        except Exception:
+            return None
+
+    def set(self, key, value, stamp=MISSING) -> None:
+        if stamp is MISSING:
+            stamp = self._read_stamp(key)
+
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                self._entries.clear()
+            self._entries[key] = (time.monotonic() + self.ttl, stamp, value)
+
+    def get_or_load(self, key, loader):
+        """
+        Returns the cached value, calling loader() on a miss
+        """
+        value = self.get(key)
+        if value is MISSING:
+            # Read the stamp first so an invalidation racing the load is not lost
+            stamp = self._read_stamp(key)
+            value = loader()
+            self.set(key, value, stamp)
+        return value
+
+    def invalidate(self) -> None:
+        """
+        Drops every entry in this namespace in all processes
+        """
+        with self._lock:
+            self._entries.clear()
+            self._version = None
+
+        try:
+            shared_cache.incr(self._version_key)
+        except ValueError:
+            shared_cache.set(self._version_key, 1, None)
+        except Exception as error:
+            logger.warning(f"[!] Unable to bump {self.namespace} cache version - {error}")
+
+    def invalidate_keys(self, keys) -> None:
+        """
+        Drops single entries in all processes, needs track_keys
+        """
+        keys = list(keys)
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+        stamp = uuid.uuid4().hex
+        try:
+            shared_cache.set_many(
+                {self._stamp_key(key): stamp for key in keys},
+                settings.RESOLUTION_CACHE_TTL + settings.RESOLUTION_CACHE_VERSION_CHECK
+            )
+        except Exception as error:
+            logger.warning(f"[!] Unable to stamp {self.namespace} cache keys - {error}")
+
+
+recorder_cache = VersionedCache("recorder", authorization=True)
+talkgroup_cache = VersionedCache("talkgroup")
+system_cache = VersionedCache("system")
+
+
+def get_recorder(api_key: str) -> SystemRecorder:
+    """
+    Resolves a recorder (with its system) by API key
+    """
+    return recorder_cache.get_or_load(
+        str(api_key),
+        lambda: SystemRecorder.objects.select_related("system").get(api_key=api_key)
+    )
+
+
+def get_system(system_uuid: str) -> System:
+    """
+    Resolves a system by UUID
+    """
+    return system_cache.get_or_load(
+        str(system_uuid),
+        lambda: System.objects.get(UUID=system_uuid)
+    )
+
+
+def get_talkgroup(system: System, decimal_id: int) -> TalkGroup:
+    """
+    Resolves a talkgroup by system and decimal ID, None if it does not exist yet
+    """
+    key = (str(system.UUID), int(decimal_id))
+    talkgroup = talkgroup_cache.get(key)
+    if talkgroup is MISSING:
+        talkgroup = TalkGroup.objects.filter(system=system, decimal_id=decimal_id).first()
+        if talkgroup is not None:
+            talkgroup_cache.set(key, talkgroup)
+    return talkgroup
+
+
+def get_talkgroups(system: System, decimal_ids) -> dict[int, TalkGroup]:
+    """
+    Resolves many talkgroups for a system, only the uncached ones hit the DB
+    """
+    talkgroups = {}
+    missing = []
+    for decimal_id in set(int(decimal_id) for decimal_id in decimal_ids):
+        talkgroup = talkgroup_cache.get((str(system.UUID), decimal_id))
+        if talkgroup is MISSING:
+            missing.append(decimal_id)
+        else:
+            talkgroups[decimal_id] = talkgroup
+
+    if missing:
+        for talkgroup in TalkGroup.objects.filter(system=system, decimal_id__in=missing):
+            talkgroup_cache.set((str(system.UUID), talkgroup.decimal_id), talkgroup)
+            talkgroups[talkgroup.decimal_id] = talkgroup
+
+    return talkgroups
+
+
+_transmission_payload_lock = threading.Lock()
+
+
+def _transmission_payload_key(transmission_uuid: str) -> str:
+    return f"tpng:socket:tx:{transmission_uuid}"
+
+
+def _cached_transmission_payloads(transmission_uuids) -> dict:
+    try:
+        found = shared_cache.get_many([_transmission_payload_key(tx_uuid) for tx_uuid in transmission_uuids])
+    except Exception as error:
+        logger.warning(f"[!] Unable to read transmission payload cache - {error}")
+        return {}
+    return {key.rsplit(":", 1)[-1]: value for key, value in found.items()}
+
+
+def get_transmission_payloads(transmission_uuids) -> dict[str, dict]:
+    """
+    Returns {UUID: {"talkgroup", "data"}} with TransmissionListSerializer data
+
+    Payloads are shared through the Django cache for SOCKET_TX_CACHE_TTL seconds and
+    misses are loaded under a process lock, so when every client asks for a new call
+    at once it is read from the DB once. Unknown UUIDs are left out
+    """
+    from radio.helpers.utils import UUIDEncoder, prime_transmission_counts, with_transmission_list_relations
+    from radio.serializers import TransmissionListSerializer
+
+    transmission_uuids = list(dict.fromkeys(str(tx_uuid) for tx_uuid in transmission_uuids))
+    payloads = _cached_transmission_payloads(transmission_uuids)
+    if len(payloads) == len(transmission_uuids):
+        return payloads
+
+    with _transmission_payload_lock:
+        # Whoever held the lock may have loaded them already
+        missing = [tx_uuid for tx_uuid in transmission_uuids if tx_uuid not in payloads]
+        payloads.update(_cached_transmission_payloads(missing))
+        missing = [tx_uuid for tx_uuid in missing if tx_uuid not in payloads]
+        if not missing:
+            return payloads
+
+        transmissions = list(with_transmission_list_relations(Transmission.objects.filter(UUID__in=missing)))
+        prime_transmission_counts(transmissions)
+        serialized = json.loads(json.dumps(
+            TransmissionListSerializer(transmissions, many=True).data, cls=UUIDEncoder
+        ))
+
+        loaded = {
+            str(transmission.UUID): {"talkgroup": str(transmission.talkgroup_id), "data": data}
+            for transmission, data in zip(transmissions, serialized)
+        }
+        try:
+            shared_cache.set_many(
+                {_transmission_payload_key(tx_uuid): payload for tx_uuid, payload in loaded.items()},
+                settings.SOCKET_TX_CACHE_TTL
+            )
+        except Exception as error:
+            logger.warning(f"[!] Unable to store transmission payloads - {error}")
+
+    payloads.update(loaded)
+    return payloads
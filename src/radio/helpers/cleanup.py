@@ -1,35 +1,207 @@
+import time
 import logging
 
-from datetime import timedelta
+from datetime import datetime, timedelta
 from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Min, Q
 from django.utils import timezone
 
-from radio.models import System, Transmission
+from radio.helpers.audio import tombstone_audio
+from radio.models import Incident, PruneCheckpoint, System, Transmission
 
 if settings.SEND_TELEMETRY:
     from sentry_sdk import capture_exception
 
 logger = logging.getLogger(__name__)
 
+
+def month_windows(start: datetime, end: datetime) -> list[tuple[datetime, datetime]]:
+    """
+    Splits [start, end) into calendar month windows
+    """
+    windows = []
+    window_start = start
+    while window_start < end:
+        month_start = window_start.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        if month_start.month == 12:
+            next_month = month_start.replace(year=month_start.year + 1, month=1)
+        else:
+            next_month = month_start.replace(month=month_start.month + 1)
+
+        window_end = min(next_month, end)
+        windows.append((window_start, window_end))
+        window_start = window_end
+
+    return windows
+
+
+class PruneBudget:
+    """
+    Rate limit and time budget shared by every system in one prune run
+    """
+
+    def __init__(self, max_rows_per_second: int = 0, run_seconds: int = 0) -> None:
+        self.max_rows_per_second = max_rows_per_second
+        self.started = time.monotonic()
+        self.deadline = self.started + run_seconds if run_seconds else None
+        self.rows = 0
+
+    @property
+    def exhausted(self) -> bool:
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    def spend(self, rows: int) -> None:
+        """
+        Records deleted rows, sleeping to hold the rows per second limit
+        """
+        self.rows += rows
+        if not self.max_rows_per_second:
+            return
+
+        ahead = self.rows / self.max_rows_per_second - (time.monotonic() - self.started)
+        if ahead > 0:
+            time.sleep(ahead)
+
+
+def _get_prune_checkpoint(system: System) -> PruneCheckpoint:
+    """
+    Returns the system's unfinished prune pass, starting a new one when the last finished
+    """
+    cutoff = timezone.now() - timedelta(days=system.prune_transmissions_after_days)
+    checkpoint, created = PruneCheckpoint.objects.get_or_create(system=system, defaults={"cutoff": cutoff})
+
+    if not created and checkpoint.finished is not None:
+        checkpoint.cutoff = cutoff
+        checkpoint.last_start_time = None
+        checkpoint.last_UUID = None
+        checkpoint.finished = None
+        checkpoint.save(update_fields=["cutoff", "last_start_time", "last_UUID", "finished", "updated"])
+
+    return checkpoint
+
+
+def _prune_transmission_chunk(checkpoint_uuid: str, batch_size: int):
+    """
+    Deletes the next chunk of a prune pass, oldest first
+
+    A pass works through the system one calendar month window at a time, and
+    chunks are keyed on (start_time, UUID) after the checkpoint inside the
+    current window, so every delete is a bounded range of the
+    (system, start_time, UUID) index. Once a window is empty the checkpoint
+    moves to the next month that has rows. Locked transmissions and rows another
+    transaction holds are skipped. Rows are deleted in SQL, the per-row post_delete
+    hook does not run, so the audio is tombstoned for the audio GC in the same
+    transaction
+
+    Returns (deleted, finished), or None when another worker holds the checkpoint
+    """
+    with transaction.atomic():
+        checkpoint: PruneCheckpoint = (
+            PruneCheckpoint.objects.select_for_update(skip_locked=True)
+            .filter(UUID=checkpoint_uuid, finished__isnull=True)
+            .first()
+        )
+        if checkpoint is None:
+            return None
+
+        expired = Transmission.objects.filter(
+            system_id=checkpoint.system_id, start_time__lt=checkpoint.cutoff, locked=False
+        )
+        window_start = checkpoint.last_start_time
+        if window_start is None:
+            window_start = expired.aggregate(oldest=Min("start_time"))["oldest"]
+        if window_start is None:
+            checkpoint.finished = timezone.now()
+            checkpoint.save(update_fields=["finished", "updated"])
+            return 0, True
+        window_end = month_windows(window_start, checkpoint.cutoff)[0][1]
+
+        chunk = expired.filter(start_time__gte=window_start, start_time__lt=window_end)
+        if checkpoint.last_UUID is not None:
+            chunk = chunk.filter(
+                Q(start_time__gt=checkpoint.last_start_time)
+                | Q(start_time=checkpoint.last_start_time, UUID__gt=checkpoint.last_UUID)
+            )
+
+        rows = list(
+            chunk.order_by("start_time", "UUID")
+            .select_for_update(skip_locked=True)
+            .values_list("UUID", "start_time", "audio_file")[:batch_size]
+        )
+        if not rows:
+            next_start = expired.filter(start_time__gte=window_end).aggregate(oldest=Min("start_time"))["oldest"]
+            if next_start is None:
+                checkpoint.finished = timezone.now()
+                checkpoint.save(update_fields=["finished", "updated"])
+                return 0, True
+
+            # The window is done, the next chunk starts at the next month with rows
+            checkpoint.last_start_time, checkpoint.last_UUID = next_start, None
+            checkpoint.save(update_fields=["last_start_time", "last_UUID", "updated"])
+            return 0, False
+
+        transmission_uuids = [row[0] for row in rows]
+        incidents = Incident.transmission.through.objects.filter(transmission_id__in=transmission_uuids)
+        incidents._raw_delete(incidents.db)
+        transmissions = Transmission.objects.filter(UUID__in=transmission_uuids)
+        deleted = transmissions._raw_delete(transmissions.db)
+        tombstone_audio([row[2] for row in rows], checkpoint.system_id)
+
+        checkpoint.last_UUID, checkpoint.last_start_time = rows[-1][0], rows[-1][1]
+        checkpoint.rows_deleted = F("rows_deleted") + deleted
+        checkpoint.save(update_fields=["last_UUID", "last_start_time", "rows_deleted", "updated"])
+
+    return deleted, False
+
+
+def _prune_system(system: System, budget: PruneBudget) -> bool:
+    """
+    Runs a system's prune pass until it finishes or the budget runs out
+
+    Returns False when the budget ran out, the checkpoint keeps the progress
+    """
+    checkpoint = _get_prune_checkpoint(system)
+    deleted_total = 0
+
+    while not budget.exhausted:
+        result = _prune_transmission_chunk(checkpoint.UUID, settings.PRUNE_BATCH_SIZE)
+        if result is None:
+            logger.info(f"Prune of system {str(system)} is running elsewhere, skipping")
+            return True
+
+        deleted, finished = result
+        deleted_total += deleted
+
+        if finished:
+            checkpoint.refresh_from_db()
+            logger.info(
+                f"Pruned {deleted_total} transmissions on system {str(system)} "
+                f"(total rows={checkpoint.rows_deleted} bytes={checkpoint.bytes_reclaimed})"
+            )
+            return True
+
+        budget.spend(deleted)
+
+    logger.info(f"Pruned {deleted_total} transmissions on system {str(system)}, resuming next run")
+    return False
+
+
 def _prune_transmissions() -> None:
     """
     Prunes transmissions when set in the database
     """
+    budget = PruneBudget(settings.PRUNE_MAX_ROWS_PER_SECOND, settings.PRUNE_RUN_SECONDS)
 
-    for system in System.objects.all():
+    for system in System.objects.filter(prune_transmissions=True):
         system: System
 
-        if system.prune_transmissions:
-            prunetime = timezone.now() - timedelta(
-                days=system.prune_transmissions_after_days
+        try:
+            if not _prune_system(system, budget):
+                return
+        except Exception as e:
+            if settings.SEND_TELEMETRY:
+                capture_exception(e)
+            logging.error(
+                f"[!] ERROR PRUNING TRANSMISSIONS ON SYSTEM {str(system)}"
             )
-            TXs = Transmission.objects.filter(system=system, start_time__lte=prunetime)
-
-            try:
-                TXs.delete()
-            except Exception as e:
-                if settings.SEND_TELEMETRY:
-                    capture_exception(e)
-                logging.error(
-                    f"[!] ERROR PRUNING TRANSMISSIONS ON SYSTEM {str(system)}"
-                )
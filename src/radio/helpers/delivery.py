@@ -0,0 +1,167 @@
+import time
+import logging
+import threading
+
+from collections import OrderedDict
+from functools import lru_cache
+
+import apprise
+import gevent
+
+from gevent.pool import Pool
+from django.conf import settings
+
+if settings.SEND_TELEMETRY:
+    from sentry_sdk import capture_exception
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=4096)
+def parse_apprise_urls(app_rise_urls: str) -> tuple[str]:
+    """
+    Splits a UserAlert's comma separated Apprise URLs into destinations
+    """
+    return tuple(dict.fromkeys(url.strip() for url in (app_rise_urls or "").split(",") if url.strip()))
+
+
+def build_digest(messages: list[tuple[str, str]]) -> tuple[str, str]:
+    """
+    Folds the (title, body) messages queued for a destination into one
+    """
+    if len(messages) == 1:
+        return messages[0]
+
+    title = f"{messages[0][0]} (+{len(messages) - 1} more)"
+    body = "\n\n".join(f"{title}\n{body}" for title, body in messages)
+    return title, body
+
+
+class AppriseDestination:
+    """
+    One Apprise URL, parsed once, with its own rate limit and backoff
+    """
+
+    def __init__(self, url: str) -> None:
+        self.url = url
+        self.apprise = apprise.Apprise()
+        self.valid = self.apprise.add(url)
+        self.pending: list[tuple[str, str]] = []
+        self.attempts = 0
+        self.failures = 0
+        self.next_send = 0.0
+        self.scheduled = False
+
+    def backoff(self) -> float:
+        return min(settings.APPRISE_BACKOFF_MAX, settings.APPRISE_MIN_INTERVAL * 2 ** self.failures)
+
+    def notify(self, title: str, body: str) -> bool:
+        return bool(self.apprise.notify(title=title, body=body))
+
+
+class AppriseDelivery:
+    """
+    Delivers Apprise notifications off the Celery task, on a bounded gevent pool
+
+    Messages for the same destination that arrive within APPRISE_DIGEST_WINDOW
+    seconds go out as one digest, a destination is sent to at most once every
+    APPRISE_MIN_INTERVAL seconds and failed sends back off exponentially, up to
+    APPRISE_MAX_ATTEMPTS tries
+    """
+
+    def __init__(self, max_destinations: int = 4096) -> None:
+        self.max_destinations = max_destinations
+        self.destinations: OrderedDict[str, AppriseDestination] = OrderedDict()
+        self.pool = Pool(settings.APPRISE_CONCURRENCY)
+        self._lock = threading.Lock()
+
+    def get_destination(self, url: str) -> AppriseDestination:
+        with self._lock:
+            destination = self.destinations.get(url)
+            if destination is None:
+                destination = AppriseDestination(url)
+                if not destination.valid:
+                    logger.warning(f"[!] Invalid Apprise URL {url.split('://')[0]}://...")
+                self.destinations[url] = destination
+                if len(self.destinations) > self.max_destinations:
+                    # Forget the least recently used idle destinations
+                    for stale_url in list(self.destinations)[:len(self.destinations) - self.max_destinations]:
+                        if not self.destinations[stale_url].pending:
+                            del self.destinations[stale_url]
+            self.destinations.move_to_end(url)
+            return destination
+
+    def submit(self, app_rise_urls: str, title: str, body: str) -> None:
+        for url in parse_apprise_urls(app_rise_urls):
+            destination = self.get_destination(url)
+            if not destination.valid:
+                continue
+
+            with self._lock:
+                destination.pending.append((title, body))
+                if destination.scheduled:
+                    continue
+                destination.scheduled = True
+
+            delay = max(settings.APPRISE_DIGEST_WINDOW, destination.next_send - time.monotonic())
+            gevent.spawn_later(delay, self.flush, destination)
+
+    def flush(self, destination: AppriseDestination) -> None:
+        """
+        Sends what is queued for a destination as one message
+        """
+        with self._lock:
+            messages, destination.pending = destination.pending, []
+            destination.scheduled = False
+        if messages:
+            self.pool.spawn(self._deliver, destination, messages)
+
+    def flush_all(self) -> None:
+        for destination in list(self.destinations.values()):
+            self.flush(destination)
+        self.pool.join()
+
+    def _deliver(self, destination: AppriseDestination, messages: list[tuple[str, str]]) -> None:
+        title, body = build_digest(messages)
+        try:
+            sent = destination.notify(title, body)
+        except Exception as error:
+            if settings.SEND_TELEMETRY:
+                capture_exception(error)
+            sent = False
+
+        if sent:
+            destination.attempts = 0
+            destination.failures = 0
+            destination.next_send = time.monotonic() + settings.APPRISE_MIN_INTERVAL
+            logger.debug(f"[+] BROADCASTED {len(messages)} TO APPRISE")
+            return
+
+        destination.attempts += 1
+        destination.failures += 1
+        destination.next_send = time.monotonic() + destination.backoff()
+        if destination.attempts >= settings.APPRISE_MAX_ATTEMPTS:
+            logger.warning(f"[!] Dropping {len(messages)} Apprise messages after {destination.attempts} attempts")
+            destination.attempts = 0
+            return
+
+        logger.warning(f"[!] Apprise delivery failed, retrying {len(messages)} messages in {destination.backoff():.0f}s")
+        with self._lock:
+            destination.pending[:0] = messages
+            if destination.scheduled:
+                return
+            destination.scheduled = True
+        gevent.spawn_later(destination.next_send - time.monotonic(), self.flush, destination)
+
+
+_delivery = None
+
+
+def get_apprise_delivery() -> AppriseDelivery:
+    """
+    Returns the process's Apprise delivery service
+    """
+    global _delivery
+    if _delivery is None:
+        _delivery = AppriseDelivery()
+    return _delivery
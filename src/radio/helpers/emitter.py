@@ -0,0 +1,226 @@
+import os
+import json
+import time
+import atexit
+import logging
+import threading
+
+from collections import defaultdict
+
+import socketio
+
+from django.conf import settings
+
+from radio.helpers.utils import UUIDEncoder
+
+if settings.SEND_TELEMETRY:
+    from sentry_sdk import capture_exception
+
+logger = logging.getLogger(__name__)
+
+
+def talkgroup_room(talkgroup_uuid) -> str:
+    """
+    Room a talkgroup's transmissions are pushed to, only authorized sockets join it
+    """
+    return f"tx_{talkgroup_uuid}"
+
+
+class SocketEmitter(socketio.KombuManager):
+    """
+    Write-only KombuManager that keeps its broker connection and producer between emits
+
+    The stock manager builds a producer (and declares the exchange) on every publish
+    and gives up silently when the broker is away. Here the producer is declared once
+    per connection, the connection is checked every SOCKET_EMIT_HEALTH_CHECK seconds
+    and dropped connections are rebuilt, and a publish that still fails raises so the
+    caller can retry it
+    """
+
+    def __init__(self, url: str, max_retries: int = 3, health_check: float = 30) -> None:
+        super().__init__(url, write_only=True)
+        self.max_retries = max_retries
+        self.health_check = health_check
+        self._producer = None
+        self._checked = 0.0
+
+    def reset(self) -> None:
+        """
+        Drops the broker connection, the next emit opens a new one
+        """
+        try:
+            self.publisher_connection.release()
+        except Exception:
+            pass
+        self.publisher_connection = self._connection()
+        self._producer = None
+        self._checked = 0.0
+
+    def check_health(self) -> None:
+        now = time.monotonic()
+        if self._producer is not None and now - self._checked < self.health_check:
+            return
+
+        if not self.publisher_connection.connected:
+            if self._producer is not None:
+                logger.warning("[!] Socket emitter lost its broker connection, reconnecting")
+            self.reset()
+            self.publisher_connection.ensure_connection(max_retries=self.max_retries)
+        self._checked = now
+
+    def _producer_publish(self, connection):
+        if self._producer is None:
+            self._producer = connection.Producer(exchange=self._exchange(), **self.producer_options)
+        return connection.ensure(self._producer, self._producer.publish, max_retries=self.max_retries)
+
+    def _publish(self, data) -> None:
+        try:
+            self.check_health()
+            self._producer_publish(self.publisher_connection)(self.json.dumps(data))
+        except Exception:
+            self.reset()
+            raise
+
+
+class BroadcastCoalescer:
+    """
+    Collects broadcasts for SOCKET_COALESCE_WINDOW seconds and emits each room's
+    payloads as one list, or sooner once SOCKET_COALESCE_MAX_SIZE are waiting
+
+    The emit runs after the sink has reported success, so a room whose emit
+    fails keeps its payloads and is retried with the next flush, up to
+    max_attempts times before they are dropped
+    """
+
+    def __init__(self, window: float, max_size: int, max_attempts: int = 3) -> None:
+        self.window = window
+        self.max_size = max_size
+        self.max_attempts = max_attempts
+        self._pending = defaultdict(list)
+        self._attempts = {}
+        self._timer = None
+        self._lock = threading.Lock()
+
+    def _schedule(self) -> None:
+        if self._timer is None:
+            self._timer = threading.Timer(self.window, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def add(self, event: str, room: str, data: dict) -> None:
+        with self._lock:
+            pending = self._pending[(event, room)]
+            pending.append(data)
+            full = len(pending) >= self.max_size
+            if not full:
+                self._schedule()
+
+        if full:
+            self.flush()
+
+    def emit(self, event: str, room: str, payloads: list) -> None:
+        get_socket_emitter().emit(event, payloads, room=room)
+
+    def flush(self) -> None:
+        with self._lock:
+            pending, self._pending = self._pending, defaultdict(list)
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+        failed = {}
+        for (event, room), payloads in pending.items():
+            try:
+                self.emit(event, room, payloads)
+                logger.debug(f"[+] BROADCASTING {len(payloads)} TO {room}")
+            except Exception as error:
+                logger.warning(f"[!] Unable to broadcast {len(payloads)} {event} messages - {error}")
+                if settings.SEND_TELEMETRY:
+                    capture_exception(error)
+                failed[(event, room)] = payloads
+            else:
+                self._attempts.pop((event, room), None)
+
+        if failed:
+            self._requeue(failed)
+
+    def _requeue(self, failed: dict) -> None:
+        with self._lock:
+            for (event, room), payloads in failed.items():
+                attempts = self._attempts.get((event, room), 0) + 1
+                if attempts >= self.max_attempts:
+                    logger.error(f"[!] Dropping {len(payloads)} {event} messages to {room} after {attempts} attempts")
+                    self._attempts.pop((event, room), None)
+                    continue
+                self._attempts[(event, room)] = attempts
+                # Keep the order the payloads were broadcast in
+                self._pending[(event, room)][:0] = payloads
+            if self._pending:
+                self._schedule()
+
+
+_emitter = None
+_coalescer = None
+_emitter_pid = None
+_emitter_lock = threading.Lock()
+
+
+def _check_pid() -> None:
+    """
+    Forked workers (celery prefork) must not share the parent's broker socket
+    """
+    global _emitter, _coalescer, _emitter_pid
+    if _emitter_pid != os.getpid():
+        _emitter = None
+        _coalescer = None
+        _emitter_pid = os.getpid()
+
+
+def get_socket_emitter() -> SocketEmitter:
+    """
+    Returns this process's socket emitter, creating it on first use
+    """
+    global _emitter
+    with _emitter_lock:
+        _check_pid()
+        if _emitter is None:
+            _emitter = SocketEmitter(
+                settings.SOCKETS_BROKER_URL,
+                max_retries=settings.SOCKET_EMIT_MAX_RETRIES,
+                health_check=settings.SOCKET_EMIT_HEALTH_CHECK,
+            )
+        return _emitter
+
+
+def get_broadcast_coalescer() -> BroadcastCoalescer:
+    global _coalescer
+    with _emitter_lock:
+        _check_pid()
+        if _coalescer is None:
+            _coalescer = BroadcastCoalescer(
+                settings.SOCKET_COALESCE_WINDOW,
+                settings.SOCKET_COALESCE_MAX_SIZE,
+                max_attempts=settings.SOCKET_COALESCE_MAX_ATTEMPTS,
+            )
+        return _coalescer
+
+
+def broadcast(event: str, room: str, data, coalesce: bool = False) -> None:
+    """
+    Emits a socket.io event to a room through the process's emitter
+
+    With coalesce (and SOCKET_COALESCE_WINDOW set) the payload is batched with
+    the other payloads for the room and delivered as a list
+    """
+    data = json.loads(json.dumps(data, cls=UUIDEncoder))
+    if coalesce and settings.SOCKET_COALESCE_WINDOW > 0:
+        get_broadcast_coalescer().add(event, room, data)
+        return
+
+    get_socket_emitter().emit(event, data, room=room)
+
+
+@atexit.register
+def _flush_on_exit() -> None:
+    if _coalescer is not None and _emitter_pid == os.getpid():
+        _coalescer.flush()
@@ -0,0 +1,304 @@
+import json
+import logging
+
+from collections import defaultdict
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from radio.helpers.utils import UUIDEncoder
+from radio.models import (
+    ScanList,
+    Scanner,
+    SystemForwarder,
+    Transmission,
+)
+from radio.serializers import TransmissionUploadSerializer
+
+if settings.SEND_TELEMETRY:
+    from sentry_sdk import capture_exception
+
+logger = logging.getLogger(__name__)
+
+
+class TransmissionContext:
+    """
+    Everything the fan-out sinks need about one new transmission, loaded once
+
+    transmission - Transmission with system, recorder, talkgroup and agencies/cities
+    item         - the fan-out item ({"UUID", "forward"}) used for retries, a
+                   forwarder retry also lists the forwarders left to send to
+    data         - JSON safe TransmissionUploadSerializer data
+    parents      - talkgroup/scanlist/scanner UUIDs for socket routing
+    """
+    __slots__ = ("transmission", "item", "data", "parents")
+
+    def __init__(self, transmission: Transmission, item: dict, data: dict, parents: list) -> None:
+        self.transmission = transmission
+        self.item = item
+        self.data = data
+        self.parents = parents
+
+
+def get_transmission_parents(talkgroup_uuids) -> dict:
+    """
+    Returns {talkgroup UUID: parents} for socket routing in two queries
+    """
+    talkgroup_uuids = set(talkgroup_uuids)
+
+    scanlists = defaultdict(list)
+    for talkgroup_uuid, scanlist_uuid in ScanList.talkgroups.through.objects.filter(
+        talkgroup_id__in=talkgroup_uuids
+    ).values_list("talkgroup_id", "scanlist_id"):
+        scanlists[talkgroup_uuid].append(str(scanlist_uuid))
+
+    scanners = defaultdict(list)
+    for scanlist_uuid, scanner_uuid in Scanner.scanlists.through.objects.filter(
+        scanlist_id__in=[scanlist for values in scanlists.values() for scanlist in values]
+    ).values_list("scanlist_id", "scanner_id"):
+        scanners[str(scanlist_uuid)].append(str(scanner_uuid))
+
+    parents = {}
+    for talkgroup_uuid in talkgroup_uuids:
+        talkgroup_scanlists = list(dict.fromkeys(scanlists[talkgroup_uuid]))
+        talkgroup_scanners = list(dict.fromkeys(
+            scanner for scanlist in talkgroup_scanlists for scanner in scanners[scanlist]
+        ))
+        parents[talkgroup_uuid] = [
+            {"uuid": [str(talkgroup_uuid)], "type": "talkgroup"},
+            {"uuid": talkgroup_scanlists, "type": "scanlist"},
+            {"uuid": talkgroup_scanners, "type": "scanner"},
+        ]
+    return parents
+
+
+def load_transmission_contexts(items: list[dict]) -> list[TransmissionContext]:
+    """
+    Loads the fan-out context for a list of transmissions in a fixed number of queries
+    """
+    items_by_uuid = {str(item["UUID"]): item for item in items}
+    transmissions = list(
+        Transmission.objects.filter(UUID__in=list(items_by_uuid))
+        .select_related("system", "recorder", "talkgroup")
+    )
+    order = {transmission_uuid: index for index, transmission_uuid in enumerate(items_by_uuid)}
+    transmissions.sort(key=lambda transmission: order[str(transmission.UUID)])
+
+    serialized = json.loads(json.dumps(
+        TransmissionUploadSerializer(transmissions, many=True).data, cls=UUIDEncoder
+    ))
+    parents = get_transmission_parents(transmission.talkgroup_id for transmission in transmissions)
+
+    return [
+        TransmissionContext(
+            transmission,
+            items_by_uuid[str(transmission.UUID)],
+            data,
+            parents[transmission.talkgroup_id],
+        )
+        for transmission, data in zip(transmissions, serialized)
+    ]
+
+
+class TransmissionSink:
+    """
+    A fan-out destination for new transmissions
+
+    Sinks are isolated from each other, a transmission that fails in one sink is
+    retried for that sink only, up to max_retries times with exponential backoff
+    """
+    name = None
+    max_retries = 3
+    retry_delay = 5
+
+    def send(self, context: TransmissionContext) -> None:
+        raise NotImplementedError
+
+    def send_many(self, contexts: list[TransmissionContext]) -> list[TransmissionContext]:
+        """
+        Sends every context, returning the ones that failed
+        """
+        failed = []
+        for context in contexts:
+            try:
+                self.send(context)
+            except Exception as error:
+                logger.warning(f"[!] {self.name} sink failed for TX {context.transmission.UUID} - {error}")
+                if settings.SEND_TELEMETRY:
+                    capture_exception(error)
+                failed.append(context)
+        return failed
+
+
+class WebSocketSink(TransmissionSink):
+    """
+    Pushes new transmissions to the talkgroup rooms web clients subscribed to
+    """
+    name = "web"
+
+    def send(self, context: TransmissionContext) -> None:
+        from radio.helpers.emitter import talkgroup_room
+        from radio.helpers.transmission import _broadcast_transmission
+
+        # Only sockets authorized for the talkgroup are in its room, so the
+        # transmission always goes out inline
+        _broadcast_transmission(
+            "transmission",
+            talkgroup_room(context.transmission.talkgroup_id),
+            {"uuid": str(context.transmission.UUID), "parents": context.parents, "transmission": context.data},
+        )
+
+        if settings.SOCKET_TRANSMISSION_PARTY_BUS:
+            payload = {"uuid": str(context.transmission.UUID), "parents": context.parents}
+            if not context.transmission.system.enable_talkgroup_acls:
+                payload["transmission"] = context.data
+
+            _broadcast_transmission("transmission_party_bus", "transmission_party_bus", payload)
+
+
+class AlertSink(TransmissionSink):
+    """
+    Matches new transmissions against user alerts
+    """
+    name = "alerts"
+
+    def send(self, context: TransmissionContext) -> None:
+        from radio.helpers.notifications import _send_transmission_notifications
+
+        _send_transmission_notifications(dict(context.data), context.transmission.talkgroup.alpha_tag)
+
+
+class MqttSink(TransmissionSink):
+    """
+    Publishes the denormalized transmission to the MQTT bridge queue
+    """
+    name = "mqtt"
+
+    def send_many(self, contexts: list[TransmissionContext]) -> list[TransmissionContext]:
+        from mqtt.utils.publisher import get_rabbitmq_publishers
+        from radio.helpers.mqtt import build_transmission_mqtt_payload
+
+        failed = []
+        # Contexts not yet handed to the broker, only these are retried when the
+        # publisher itself fails
+        pending = list(contexts)
+        try:
+            with get_rabbitmq_publishers(settings.MQTT_AMQP_QUQUE).publisher() as publisher:
+                while pending:
+                    context = pending[0]
+                    try:
+                        publisher.publish_message(
+                            build_transmission_mqtt_payload(context.transmission, context.data)
+                        )
+                    except Exception as error:
+                        logger.warning(f"[!] {self.name} sink failed for TX {context.transmission.UUID} - {error}")
+                        failed.append(context)
+                    pending.pop(0)
+        except Exception as error:
+            logger.warning(f"[!] {self.name} sink unable to connect - {error}")
+            if settings.SEND_TELEMETRY:
+                capture_exception(error)
+            return failed + pending
+        return failed
+
+
+class ForwarderSink(TransmissionSink):
+    """
+    Hands new transmissions to the SystemForwarders covering their system and talkgroup
+
+    Failures are tracked per forwarder, a retry only goes to the forwarders that failed
+    """
+    name = "forwarders"
+
+    def send_many(self, contexts: list[TransmissionContext]) -> list[TransmissionContext]:
+        from radio.tasks import forward_transmission_to_remote_instance
+
+        forwarders = list(
+            SystemForwarder.objects.filter(enabled=True)
+            .prefetch_related("forwarded_systems", "talkgroup_filter")
+        )
+        if not forwarders:
+            return []
+
+        failed = []
+        for context in contexts:
+            transmission = context.transmission
+            targets = context.item.get("forwarders")
+            failed_forwarders = []
+            for forwarder in forwarders:
+                if targets is not None and forwarder.name not in targets:
+                    continue
+                forwarded_systems = set(system.UUID for system in forwarder.forwarded_systems.all())
+                filtered_talkgroups = set(talkgroup.UUID for talkgroup in forwarder.talkgroup_filter.all())
+                if transmission.system_id not in forwarded_systems:
+                    continue
+                if transmission.talkgroup_id in filtered_talkgroups:
+                    continue
+
+                try:
+                    forward_transmission_to_remote_instance.delay(
+                        dict(context.item["forward"]),
+                        forwarder.name,
+                        forwarder.recorder_key,
+                        forwarder.remote_url,
+                    )
+                except Exception as error:
+                    logger.warning(
+                        f"[!] {self.name} sink failed for TX {transmission.UUID} to {forwarder.name} - {error}"
+                    )
+                    failed_forwarders.append(forwarder.name)
+
+            if failed_forwarders:
+                failed.append(TransmissionContext(
+                    transmission,
+                    dict(context.item, forwarders=failed_forwarders),
+                    context.data,
+                    context.parents,
+                ))
+        return failed
+
+
+def get_transmission_sinks(names: list[str] = None) -> list[TransmissionSink]:
+    """
+    Returns the configured sinks (TRANSMISSION_FANOUT_SINKS), optionally only the named ones
+    """
+    sinks = [import_string(path)() for path in settings.TRANSMISSION_FANOUT_SINKS]
+    if names is None:
+        return sinks
+    return [sink for sink in sinks if sink.name in names]
+
+
+def fan_out_item(transmission: Transmission, data: dict) -> dict:
+    """
+    Builds the fan-out item for a saved transmission from its upload payload
+
+    The audio is referenced by storage path so the message stays small
+    """
+    forward = {key: value for key, value in data.items() if key != "audio_file"}
+    forward["audio_path"] = transmission.audio_file.name
+    return {"UUID": str(transmission.UUID), "forward": json.loads(json.dumps(forward, cls=UUIDEncoder))}
+
+
+def _fan_out_transmissions(items: list[dict], sinks: list[str] = None, attempt: int = 0) -> None:
+    """
+    Loads the transmissions once and feeds them to every sink
+    """
+    from radio.tasks import fan_out_transmissions
+
+    contexts = load_transmission_contexts(items)
+    if not contexts:
+        return
+
+    for sink in get_transmission_sinks(sinks):
+        failed = sink.send_many(contexts)
+        if not failed:
+            continue
+
+        if attempt >= sink.max_retries:
+            logger.error(f"[!] {sink.name} sink gave up on {len(failed)} TXs after {attempt} retries")
+            continue
+
+        fan_out_transmissions.apply_async(
+            ([context.item for context in failed], [sink.name], attempt + 1),
+            countdown=sink.retry_delay * 2 ** attempt,
+        )
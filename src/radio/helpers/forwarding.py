@@ -0,0 +1,168 @@
+import os
+import gzip
+import json
+import time
+import logging
+import threading
+
+import requests
+
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+
+from radio.helpers.utils import UUIDEncoder
+
+logger = logging.getLogger(__name__)
+
+
+class ForwarderUnavailable(Exception):
+    """
+    Raised instead of calling a remote instance while its circuit is open
+    """
+
+
+class ForwardingClient:
+    """
+    Keep-alive HTTP client for one SystemForwarder
+
+    Requests share a pooled requests.Session, so calls to the remote instance
+    reuse their TCP/TLS connections instead of handshaking every time. Bodies
+    are serialized once and gzipped when FORWARDING_GZIP is set.
+
+    After FORWARDING_BREAKER_THRESHOLD failures in a row the circuit opens and
+    calls fail fast with ForwarderUnavailable for FORWARDING_BREAKER_COOLDOWN
+    seconds, after which a single trial call is let through to close it again
+    """
+
+    def __init__(
+        self,
+        name: str,
+        base_url: str,
+        pool_size: int = 10,
+        timeout: tuple[float, float] = (5, 30),
+        compress: bool = False,
+        breaker_threshold: int = 5,
+        breaker_cooldown: float = 30,
+    ) -> None:
+        self.name = name
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.compress = compress
+        self.breaker_threshold = breaker_threshold
+        self.breaker_cooldown = breaker_cooldown
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({"Content-Type": "application/json"})
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None
+
+    def _before_request(self) -> None:
+        with self._lock:
+            if self.opened_at is None:
+                return
+            if time.monotonic() - self.opened_at < self.breaker_cooldown or self._trial:
+                raise ForwarderUnavailable(f"{self.name} circuit is open")
+            # Half open, this call decides whether the circuit closes
+            self._trial = True
+
+    def _record(self, ok: bool) -> None:
+        with self._lock:
+            self._trial = False
+            if ok:
+                if self.opened_at is not None:
+                    logger.info(f"[+] Forwarder {self.name} is reachable again, closing circuit")
+                self.failures = 0
+                self.opened_at = None
+                return
+
+            self.failures += 1
+            if self.opened_at is not None or self.failures >= self.breaker_threshold:
+                if self.opened_at is None:
+                    logger.warning(
+                        f"[!] Forwarder {self.name} failed {self.failures} times, "
+                        f"pausing it for {self.breaker_cooldown}s"
+                    )
+                self.opened_at = time.monotonic()
+
+    def encode(self, data: dict) -> tuple[bytes, dict]:
+        body = json.dumps(data, cls=UUIDEncoder, separators=(",", ":")).encode()
+        if not self.compress:
+            return body, {}
+        return gzip.compress(body, compresslevel=5), {"Content-Encoding": "gzip"}
+
+    def request(self, method: str, path: str, data: dict) -> requests.Response:
+        """
+        Sends data as JSON, raising for transport errors and non 2xx responses
+        """
+        body, headers = self.encode(data)
+        self._before_request()
+        try:
+            response = self.session.request(
+                method, f"{self.base_url}{path}", data=body, headers=headers, timeout=self.timeout
+            )
+            response.raise_for_status()
+        except requests.HTTPError as error:
+            # Rejected payloads are not the remote being down
+            self._record(error.response is not None and error.response.status_code < 500)
+            raise
+        except Exception:
+            self._record(False)
+            raise
+        else:
+            self._record(True)
+        finally:
+            # A gevent Timeout or kill skips _record, let the next call be the trial
+            with self._lock:
+                self._trial = False
+        return response
+
+    def post(self, path: str, data: dict) -> requests.Response:
+        return self.request("POST", path, data)
+
+    def put(self, path: str, data: dict) -> requests.Response:
+        return self.request("PUT", path, data)
+
+    def close(self) -> None:
+        self.session.close()
+
+
+_clients: dict[str, ForwardingClient] = {}
+_clients_pid = None
+_clients_lock = threading.Lock()
+
+
+def get_forwarding_client(forwarder_name: str, forwarder_url: str) -> ForwardingClient:
+    """
+    Returns this process's client for a SystemForwarder, creating it on first use
+    """
+    global _clients, _clients_pid
+    with _clients_lock:
+        if _clients_pid != os.getpid():
+            # Forked workers must not share the parent's sockets
+            _clients = {}
+            _clients_pid = os.getpid()
+
+        client = _clients.get(forwarder_name)
+        if client is None or client.base_url != forwarder_url.rstrip("/"):
+            if client is not None:
+                client.close()
+            client = ForwardingClient(
+                forwarder_name,
+                forwarder_url,
+                pool_size=settings.FORWARDING_POOL_SIZE,
+                timeout=(settings.FORWARDING_CONNECT_TIMEOUT, settings.FORWARDING_READ_TIMEOUT),
+                compress=settings.FORWARDING_GZIP,
+                breaker_threshold=settings.FORWARDING_BREAKER_THRESHOLD,
+                breaker_cooldown=settings.FORWARDING_BREAKER_COOLDOWN,
+            )
+            _clients[forwarder_name] = client
+        return client
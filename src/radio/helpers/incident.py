@@ -1,7 +1,8 @@
 import logging
-import requests
 
 from django.conf import settings
+
+from radio.helpers.forwarding import get_forwarding_client
 from radio.models import System, SystemForwarder
 
 if settings.SEND_TELEMETRY:
@@ -41,15 +42,11 @@ def _send_incident(
         data["recorder"] = str(recorder_key)
         del data["system"]
 
+        client = get_forwarding_client(forwarder_name, forwarder_url)
         if created:
-            response = requests.post(
-                f"{forwarder_url}/api/radio/incident/forward", json=data
-            )
+            response = client.post("/api/radio/incident/forward", data)
         else:
-            response = requests.put(
-                f"{forwarder_url}/api/radio/incident/forward", json=data
-            )
-        assert response.ok
+            response = client.put("/api/radio/incident/forward", data)
         logger.info(
             f"[+] SUCCESSFULLY FORWARDED INCIDENT {data['name']} to {forwarder_name} - {response.text}"
         )
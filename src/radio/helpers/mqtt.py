@@ -2,56 +2,118 @@ import json
 import logging
 
 from django.conf import settings
+from radio.helpers.cache import VersionedCache
 from radio.helpers.utils import UUIDEncoder
 
 from radio.models import TalkGroup, Transmission
-from radio.serializers import TalkGroupSerializer
-from radio.signals import new_transmission
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 if settings.SEND_TELEMETRY:
     from sentry_sdk import capture_exception
 
 logger = logging.getLogger(__name__)
 
-def _send_transmission_mqtt(_transmission: dict) -> None:
+# Talkgroup UUID -> agency/city list for the MQTT payload
+talkgroup_agency_cache = VersionedCache("mqtt_talkgroup_agency")
+
+
+def _load_talkgroup_agencies(talkgroup_uuid) -> list[dict]:
+    agencies = {}
+    rows = (
+        TalkGroup.agency.through.objects.filter(talkgroup_id=talkgroup_uuid)
+        .order_by("id", "agency__city__name")
+        .values_list(
+            "agency__UUID",
+            "agency__name",
+            "agency__description",
+            "agency__city__UUID",
+            "agency__city__name",
+            "agency__city__description",
+        )
+    )
+    for agency_uuid, name, description, city_uuid, city_name, city_description in rows:
+        agency = agencies.get(agency_uuid)
+        if agency is None:
+            agency = agencies[agency_uuid] = {
+                "UUID": str(agency_uuid),
+                "name": name if name else "",
+                "description": description if description else "",
+                "city": [],
+            }
+        if city_uuid is not None:
+            agency["city"].append({
+                "name": city_name if city_name else "",
+                "UUID": str(city_uuid),
+                "description": city_description if city_description else "",
+            })
+    return list(agencies.values())
+
+
+def get_talkgroup_agencies(talkgroup_uuid) -> list[dict]:
     """
-    Handles Dispatching Transmission Signals
+    Returns a talkgroup's agencies with their cities, loaded in one query on a miss
     """
-    from mqtt.tasks import dispatch_transmission
-
-    transmission:Transmission = Transmission.objects.get(
-        UUID=_transmission["UUID"]
+    return talkgroup_agency_cache.get_or_load(
+        str(talkgroup_uuid),
+        lambda: _load_talkgroup_agencies(talkgroup_uuid)
     )
-    
-    logging.debug(f'[+] Handling Signal for TX:{transmission.UUID}')
+
+
+def dump_mqtt_payload(payload: dict) -> bytes:
+    """
+    Compact JSON encoding for MQTT messages
+    """
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, cls=UUIDEncoder, separators=(",", ":")).encode()
+
+
+def build_transmission_mqtt_payload(transmission: Transmission, data: dict) -> bytes:
+    """
+    Builds the denormalized MQTT message for a transmission
+
+    Expects the system, recorder and talkgroup to be loaded, agencies and cities
+    come from talkgroup_agency_cache
+    """
+    talkgroup: TalkGroup = transmission.talkgroup
+
+    _transmission = dict(data)
+    _transmission["system_name"] = transmission.system.name
     _transmission["recorder"] = {
         "site_id": transmission.recorder.site_id,
         "name": transmission.recorder.name,
-        "recorder": transmission.recorder.UUID
+        "recorder": str(transmission.recorder.UUID)
     }
+    _transmission["talkgroup"] = {
+        "UUID": str(talkgroup.UUID),
+        "system": str(talkgroup.system_id),
+        "decimal_id": talkgroup.decimal_id,
+        "alpha_tag": talkgroup.alpha_tag,
+        "description": talkgroup.description,
+        "mode": talkgroup.mode,
+        "encrypted": talkgroup.encrypted,
+        "agency": get_talkgroup_agencies(talkgroup.UUID),
+        "notes": talkgroup.notes,
+    }
+
+    return dump_mqtt_payload(_transmission)
 
-    _agency = []
-    for agency in transmission.talkgroup.agency.all():
-        _agency.append({
-            "UUID": agency.UUID,
-            "name": agency.name if agency.name else "",
-            "description": agency.description  if agency.description else "",
-            "city": [ 
-                {
-                    "name": city.name if city.name else "",
-                    "UUID": city.UUID,
-                    "description": city.description if city.description else "",
-                }
-                for city in agency.city.all()
-            ]
-        })
-
-    talkgroup = TalkGroup.objects.get(UUID=_transmission["talkgroup"])
-    _talkgroup = TalkGroupSerializer(talkgroup)
-    _transmission["talkgroup"] = _talkgroup.data
-    _transmission["talkgroup"]["agency"] =  _agency
-
-    _transmission = json.dumps(_transmission, cls=UUIDEncoder)
-    dispatch_transmission.delay(
-        _transmission
-    )
\ No newline at end of file
+def _send_transmission_mqtt(_transmission: dict) -> None:
+    """
+    Handles Dispatching Transmission Signals
+    """
+    from mqtt.utils.publisher import get_rabbitmq_publishers
+
+    transmission:Transmission = (
+        Transmission.objects.select_related("system", "recorder", "talkgroup")
+        .get(UUID=_transmission["UUID"])
+    )
+
+    logging.debug(f'[+] Handling Signal for TX:{transmission.UUID}')
+    get_rabbitmq_publishers(settings.MQTT_AMQP_QUQUE).publish(
+        build_transmission_mqtt_payload(transmission, _transmission)
+    )
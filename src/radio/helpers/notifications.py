@@ -5,10 +5,7 @@ from datetime import timedelta
 from django.conf import settings
 from django.utils import timezone
 
-import apprise
-import socketio
-
-from radio.models import TalkGroup, Unit, UserAlert, Transmission
+from radio.models import TalkGroup, Transmission
 
 if settings.SEND_TELEMETRY:
     from sentry_sdk import capture_exception
@@ -33,122 +30,111 @@ def format_message(
 
     return title, body
 
-def _send_transmission_notifications(transmission: dict) -> None:
+def _unit_label(unit: dict) -> str:
+    if unit.get("description") != "" and unit.get("description") is not None:
+        return unit["description"]
+    return str(unit.get("decimal_id"))
+
+
+def count_window_transmissions(namespace: str, key: str, trigger_time: int) -> int:
     """
-    Handles Dispatching Transmission Notifications
+    Transmissions of a talkgroup or unit that ended in the last trigger_time seconds
     """
-    from radio.tasks import broadcast_user_notification
-
+    transmissions = Transmission.objects.filter(
+        end_time__gte=timezone.now() - timedelta(seconds=trigger_time)
+    )
+    if namespace == "unit":
+        return transmissions.filter(units__contains=[{"unit": {"UUID": key}}]).count()
+    return transmissions.filter(talkgroup__UUID=key).count()
 
-    talkgroup = transmission["talkgroup"]
-    units = transmission["units"]
-    logging.debug(f'[+] Handling Notifications for TX:{transmission["UUID"]}')
 
-    for alert in UserAlert.objects.all():
-        alert: UserAlert
-        if not alert.enabled:
-            continue
+def _send_transmission_notifications(transmission: dict, talkgroup_alpha_tag: str = None) -> None:
+    """
+    Handles Dispatching Transmission Notifications
 
-        if alert.count != 1:
-            transmission_count = Transmission.objects.filter(talkgroup__UUID=talkgroup, end_time__gte=timezone.now()-timedelta(seconds=alert.trigger_time)) 
-            if len(transmission_count) < alert.count:
-                continue
+    Alerts are matched through the in-process alert index, so only the alerts
+    watching the talkgroup or one of the units are looked at
+    """
+    from radio.helpers.alerts import alert_index
+    from radio.helpers.rates import rates_shared, talkgroup_rates, unit_rates
+    from radio.tasks import broadcast_user_notification
 
+    talkgroup = str(transmission["talkgroup"])
+    logging.debug(f'[+] Handling Notifications for TX:{transmission["UUID"]}')
 
+    units = {}
+    for src in transmission.get("units") or []:
+        unit = src.get("unit") if isinstance(src, dict) else None
+        if unit:
+            units.setdefault(str(unit["UUID"]), unit)
+
+    talkgroup_alerts, unit_alerts = alert_index.match(talkgroup, units)
+    if not talkgroup_alerts and not unit_alerts:
+        return
+
+    window_counts = {}
+
+    def _window_count(counter, keys: list, trigger_time: int) -> int:
+        """
+        Busiest of the keys over the trigger time, from the rate counters
+        when they are shared and the window is short enough for them
+        """
+        cache_key = (counter.namespace, tuple(keys), trigger_time)
+        if cache_key not in window_counts:
+            if trigger_time <= counter.max_window and rates_shared():
+                window_counts[cache_key] = max(counter.counts(keys, trigger_time).values())
+            else:
+                window_counts[cache_key] = max(
+                    count_window_transmissions(counter.namespace, key, trigger_time) for key in keys
+                )
+        return window_counts[cache_key]
+
+    def _triggered(alert, counter=None, keys: list = None) -> bool:
+        if alert.emergency_only and not transmission["emergency"]:
+            return False
+        if alert.count == 1:
+            return True
+        if counter is None:
+            counter, keys = talkgroup_rates(), [talkgroup]
+        return _window_count(counter, keys, alert.trigger_time) >= alert.count
+
+    def _notify(alert, alert_type: str, value: str) -> None:
         try:
-            if alert.talkgroups.filter(UUID=talkgroup).exists():
-                talkgroup_object = TalkGroup.objects.get(UUID=talkgroup)
-                talkgroup: TalkGroup
-                if alert.emergency_only:
-                    if transmission["emergency"]:
-                        broadcast_user_notification.delay(
-                            "Talkgroup",
-                            transmission["UUID"],
-                            talkgroup_object.alpha_tag,
-                            alert.user.UUID,
-                            alert.app_rise_urls,
-                            alert.app_rise_notification,
-                            alert.web_notification,
-                            transmission["emergency"],
-                            alert.body,
-                            alert.title,
-                        )
-                        logging.debug(
-                            f'[+] Handling Sent notification for TX:{transmission["UUID"]} - {alert.name} - {alert.user}'
-                        )
-                else:
-                    broadcast_user_notification.delay(
-                        "Talkgroup",
-                        transmission["UUID"],
-                        talkgroup_object.alpha_tag,
-                        alert.user.UUID,
-                        alert.app_rise_urls,
-                        alert.app_rise_notification,
-                        alert.web_notification,
-                        transmission["emergency"],
-                        alert.body,
-                        alert.title,
-                    )
-                    logging.debug(
-                        f'[+] Handling Sent notification for TX:{transmission["UUID"]} - {alert.name} - {alert.user}'
-                    )
-
-            alert_units = alert.units.all()
-            alert_unit_uuids = [str(unit.UUID) for unit in alert_units]
-
-            active_units = []
-            for unit in units:
-                if str(unit) in alert_unit_uuids:
-                    active_units.append(unit)
-
-            if len(active_units) > 0:
-                active_unit_list = ""
-
-                for active_unit in active_units:
-                    active_unit: Unit = Unit.objects.get(UUID=active_unit)
-                    if active_unit.description != "" and active_unit.description is not None:
-                        unit_id = active_unit.description
-                    else:
-                        unit_id = str(active_unit.decimal_id)
-                    active_unit_list = active_unit_list + f"; {unit_id}"
-
-                if alert.emergency_only:
-                    if transmission["emergency"]:
-                        broadcast_user_notification.delay(
-                            "Unit",
-                            transmission["UUID"],
-                            active_unit_list,
-                            alert.user.UUID,
-                            alert.app_rise_urls,
-                            alert.app_rise_notification,
-                            alert.web_notification,
-                            transmission["emergency"],
-                            alert.body,
-                            alert.title,
-                        )
-                        logging.debug(
-                            f'[+] Handling Sent notification for TX:{transmission["UUID"]} - {alert.name} - {alert.user}'
-                        )
-                else:
-                    broadcast_user_notification.delay(
-                        "Unit",
-                        transmission["UUID"],
-                        active_unit_list,
-                        alert.user.UUID,
-                        alert.app_rise_urls,
-                        alert.app_rise_notification,
-                        alert.web_notification,
-                        transmission["emergency"],
-                        alert.body,
-                        alert.title,
-                    )
-                    logging.debug(
-                        f'[+] Handling Sent notification for TX:{transmission["UUID"]} - {alert.name} - {alert.user}'
-                    )
+            broadcast_user_notification.delay(
+                alert_type,
+                transmission["UUID"],
+                value,
+                alert.user_id,
+                alert.app_rise_urls,
+                alert.app_rise_notification,
+                alert.web_notification,
+                transmission["emergency"],
+                alert.body,
+                alert.title,
+            )
+            logging.debug(
+                f'[+] Handling Sent notification for TX:{transmission["UUID"]} - {alert.name} - {alert.user_id}'
+            )
         except Exception as error:
             if settings.SEND_TELEMETRY:
                 capture_exception(error)
 
+    talkgroup_alerts = [alert for alert in talkgroup_alerts if _triggered(alert)]
+    if talkgroup_alerts and talkgroup_alpha_tag is None:
+        talkgroup_alpha_tag = TalkGroup.objects.values_list("alpha_tag", flat=True).get(UUID=talkgroup)
+
+    for alert in talkgroup_alerts:
+        _notify(alert, "Talkgroup", talkgroup_alpha_tag)
+
+    for alert, active_units in unit_alerts.values():
+        if not _triggered(alert, unit_rates(), active_units):
+            continue
+
+        active_unit_list = ""
+        for unit_uuid in active_units:
+            active_unit_list = active_unit_list + f"; {_unit_label(units[unit_uuid])}"
+        _notify(alert, "Unit", active_unit_list)
+
 
 def _broadcast_user_notification(
     msg_type: str,
@@ -175,32 +161,21 @@ def _broadcast_user_notification(
         )
 
     if app_rise_notification:
-        urls = app_rise_urls.split(",")
-        apobj = apprise.Apprise()
-
-        for url in urls:
-            apobj.add(url)
+        from radio.helpers.delivery import get_apprise_delivery
 
         logging.debug(f"[+] BROADCASTING TO APPRISE {trannsmission_uuid}")
-        apobj.notify(
-            body=body,
-            title=title,
-        )
+        get_apprise_delivery().submit(app_rise_urls, title, body)
 
 
 def _broadcast_web_notification(
     alertuser_uuid: str, trannsmission_uuid: str, emergency: bool, title: str, body: str
 ) -> None:
-    mgr = socketio.KombuManager(
-        settings.CELERY_BROKER_URL
-    )
-    sio = socketio.Server(
-        async_mode="gevent", client_manager=mgr, logger=True, engineio_logger=True, cors_allowed_origins=settings.CORS_ALLOWED_ORIGINS
-    )
+    from radio.helpers.emitter import broadcast
+
     data = {
         "trannsmission_uuid": trannsmission_uuid,
         "emergency": emergency,
         "title": title,
         "body": body,
     }
-    sio.emit("alert", data, room=f"alert_{alertuser_uuid}")
+    broadcast("alert", f"alert_{alertuser_uuid}", data)
@@ -1,12 +1,9 @@
 import logging
 
-from django.db.models import Q
-
+from radio.helpers.access import get_user_access
 from radio.models import (
     System,
-    SystemACL,
     TalkGroup,
-    TalkGroupACL,
     Transmission
 )
 
@@ -16,9 +13,8 @@ def get_user_allowed_systems(user_uuid: str) -> tuple[list, list]:
     """
     Gets the systems that the user is allowed to access
     """
-    user_acls = SystemACL.objects.filter(Q(users__UUID=user_uuid) | Q(public=True))
-    systems = System.objects.filter(systemACL__in=user_acls)
-    system_uuids = list(systems.values_list("UUID", flat=True))
+    system_uuids = list(get_user_access(user_uuid).systems)
+    systems = System.objects.filter(UUID__in=system_uuids)
     return system_uuids, systems
 
 
@@ -26,14 +22,8 @@ def get_user_allowed_talkgroups(system: System, user_uuid: str) -> list:
     """
     Gets the talkgroups that the user is allowed to access
     """
-    if not system.enable_talkgroup_acls:
-        return TalkGroup.objects.filter(system=system)
-
-    acls = TalkGroupACL.objects.filter(users__UUID=user_uuid)
-    allowed = list(acls.values_list("allowed_talkgroups__UUID", flat=True))
-    allowed_talkgropups = TalkGroup.objects.filter(UUID__in=allowed)
-
-    return allowed_talkgropups
+    allowed = get_user_access(user_uuid).readable
+    return TalkGroup.objects.filter(system=system, UUID__in=list(allowed))
 
 
 def user_allowed_to_access_transmission(
@@ -42,26 +32,15 @@ def user_allowed_to_access_transmission(
     """
     Returs bool if user can access Transmission
     """
-    allowed_tgs = get_user_allowed_talkgroups(transmission.system, user_uuid=user_uuid)
-
-    if transmission.talkgroup in allowed_tgs:
-        return True
-
-    return False
+    return get_user_access(user_uuid).can_read(transmission.talkgroup_id)
 
 
 def get_user_allowed_download_talkgroups(system: System, user_uuid: str) -> list:
     """
     Returns talkgroups user can download
     """
-    if not system.enable_talkgroup_acls:
-        return TalkGroup.objects.filter(system=system)
-
-    acls = TalkGroupACL.objects.filter(users__UUID=user_uuid, download_allowed=True)
-    allowed = list(acls.values_list("allowed_talkgroups__UUID", flat=True))
-    allowed_talkgropups = TalkGroup.objects.filter(UUID__in=allowed)
-
-    return allowed_talkgropups
+    allowed = get_user_access(user_uuid).downloadable
+    return TalkGroup.objects.filter(system=system, UUID__in=list(allowed))
 
 
 def user_allowed_to_download_transmission(
@@ -70,11 +49,4 @@ def user_allowed_to_download_transmission(
     """
     Returns whether a user can download a transmission
     """
-    allowed_tgs = get_user_allowed_download_talkgroups(
-        transmission.system, user_uuid=user_uuid
-    )
-
-    if transmission.talkgroup in allowed_tgs:
-        return True
-
-    return False
+    return get_user_access(user_uuid).can_download(transmission.talkgroup_id)
@@ -0,0 +1,49 @@
+from radio.helpers.cache import VersionedCache
+from radio.models import SystemRecorder
+
+
+class UploadPolicy:
+    """
+    Compiled recorder allow/deny talkgroup policy
+
+    allowed only  - the talkgroup must be allowed
+    denied only   - the talkgroup must not be denied
+    both          - the talkgroup must be allowed and not denied
+    neither       - everything is allowed
+    """
+    __slots__ = ("allowed", "denied")
+
+    def __init__(self, allowed: frozenset = frozenset(), denied: frozenset = frozenset()) -> None:
+        self.allowed = frozenset(allowed)
+        self.denied = frozenset(denied)
+
+    def allows(self, talkgroup_decimalid) -> bool:
+        talkgroup_decimalid = int(talkgroup_decimalid)
+
+        if talkgroup_decimalid in self.denied:
+            return False
+        if self.allowed:
+            return talkgroup_decimalid in self.allowed
+        return True
+
+    @classmethod
+    def compile(cls, recorder: SystemRecorder) -> "UploadPolicy":
+        """
+        Builds the policy from the recorder's talkgroup M2Ms
+        """
+        return cls(
+            recorder.talkgroups_allowed.values_list("decimal_id", flat=True),
+            recorder.talkgroups_denyed.values_list("decimal_id", flat=True),
+        )
+
+
+policy_cache = VersionedCache("upload_policy", authorization=True)
+
+
+def get_upload_policy(recorder: SystemRecorder) -> UploadPolicy:
+    """
+    Returns the compiled upload policy for a recorder
+    """
+    return policy_cache.get_or_load(
+        str(recorder.UUID), lambda: UploadPolicy.compile(recorder)
+    )
@@ -0,0 +1,119 @@
+import time
+import logging
+
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache as shared_cache
+
+from radio.helpers.cache import is_shared_cache
+
+logger = logging.getLogger(__name__)
+
+
+class SlidingWindowCounter:
+    """
+    Per-second event counters kept in the Django cache
+
+    Every event increments the bucket of the second it happened in, and a window
+    is counted by reading its buckets in one get_many. With a shared cache backend
+    every process counts the same events, the per-process LocMem default only sees
+    the events recorded in that process, so callers only use the counters when
+    rates_shared() is true
+    """
+
+    def __init__(self, namespace: str, max_window: int, clock=time.time) -> None:
+        self.namespace = namespace
+        self.max_window = max_window
+        self.clock = clock
+
+    def _key(self, key: str, second: int) -> str:
+        return f"tpng:rate:{self.namespace}:{key}:{second}"
+
+    def add(self, events) -> None:
+        """
+        Records (key, unix timestamp) events, future timestamps count as now
+        """
+        now = int(self.clock())
+        buckets = Counter(
+            self._key(key, min(int(timestamp), now)) for key, timestamp in events
+        )
+
+        # Buckets outlive the longest window so late readers still see them
+        timeout = self.max_window + 60
+        for bucket, amount in buckets.items():
+            try:
+                if not shared_cache.add(bucket, amount, timeout):
+                    shared_cache.incr(bucket, amount)
+            except ValueError:
+                # Expired between the add and the incr
+                shared_cache.add(bucket, amount, timeout)
+            except Exception as error:
+                logger.warning(f"[!] Unable to count {bucket} - {error}")
+
+    def counts(self, keys, window: int) -> dict[str, int]:
+        """
+        Returns {key: events in the last window seconds}, the current second included
+        """
+        now = int(self.clock())
+        window = max(1, min(int(window), self.max_window))
+        bucket_keys = {
+            self._key(key, second): key
+            for key in set(keys)
+            for second in range(now - window + 1, now + 1)
+        }
+
+        totals = {key: 0 for key in keys}
+        try:
+            found = shared_cache.get_many(list(bucket_keys))
+        except Exception as error:
+            logger.warning(f"[!] Unable to read {self.namespace} counters - {error}")
+            found = {}
+        for bucket, amount in found.items():
+            totals[bucket_keys[bucket]] += amount
+        return totals
+
+    def count(self, key: str, window: int) -> int:
+        return self.counts([key], window)[key]
+
+
+def rates_shared() -> bool:
+    """
+    True when every process records into the same counters
+    """
+    return is_shared_cache()
+
+
+def _get_counter(namespace: str) -> SlidingWindowCounter:
+    return SlidingWindowCounter(namespace, settings.ALERT_RATE_MAX_WINDOW)
+
+
+def talkgroup_rates() -> SlidingWindowCounter:
+    return _get_counter("talkgroup")
+
+
+def unit_rates() -> SlidingWindowCounter:
+    return _get_counter("unit")
+
+
+def record_transmission_rates(transmissions) -> None:
+    """
+    Counts new transmissions against their talkgroup and units, at their end time
+    """
+    if not rates_shared():
+        # Windows are counted in the DB, see _send_transmission_notifications
+        return
+
+    talkgroups = []
+    units = []
+    for transmission in transmissions:
+        timestamp = transmission.end_time.timestamp()
+        talkgroups.append((str(transmission.talkgroup_id), timestamp))
+        transmission_units = set(
+            str(src["unit"]["UUID"]) for src in transmission.units or [] if isinstance(src, dict) and src.get("unit")
+        )
+        units.extend((unit_uuid, timestamp) for unit_uuid in transmission_units)
+
+    talkgroup_rates().add(talkgroups)
+    if units:
+        unit_rates().add(units)
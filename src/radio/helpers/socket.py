@@ -1,5 +1,6 @@
+import time
+import uuid
 import logging
-import json
 
 
 
@@ -34,31 +35,70 @@ def ping(sid, message):
         "debug", {"pong": True}, room=sid
     )
 
+def _session_readable(sid: str, session: dict):
+    """
+    Returns the talkgroups the socket's user can read, None for site admins
+
+    Kept in the session for SOCKET_SESSION_ACCESS_TTL seconds
+    """
+    from radio.helpers.access import get_user_access
+    from radio.models import UserProfile
+
+    expires, readable = session.get("readable", (0, None))
+    if expires > time.monotonic():
+        return readable
+
+    user: UserProfile = UserProfile.objects.only("site_admin").get(UUID=session["user"].userProfile.UUID)
+    readable = None if user.site_admin else get_user_access(user.UUID).readable
+    session["readable"] = (time.monotonic() + settings.SOCKET_SESSION_ACCESS_TTL, readable)
+    sio.save_session(sid, session)
+    return readable
+
+
+def _get_allowed_transmissions(sid: str, transmission_uuids: list) -> tuple[dict, dict]:
+    """
+    Returns ({UUID: data}, {UUID: error}) for the transmissions a socket asked for
+    """
+    from radio.helpers.cache import get_transmission_payloads
+
+    errors = {}
+    requested = []
+    for transmission_uuid in transmission_uuids:
+        try:
+            requested.append(str(uuid.UUID(str(transmission_uuid))))
+        except ValueError:
+            errors[str(transmission_uuid)] = "ERROR: INVALID UUID"
+
+    readable = _session_readable(sid, sio.get_session(sid))
+    payloads = get_transmission_payloads(requested)
+
+    transmissions = {}
+    for transmission_uuid in requested:
+        payload = payloads.get(transmission_uuid)
+        if payload is None:
+            errors[transmission_uuid] = "ERROR: Transmission matching query does not exist."
+        elif readable is not None and payload["talkgroup"] not in readable:
+            errors[transmission_uuid] = "PERMISSION TO OBJECT DENIED"
+        else:
+            transmissions[transmission_uuid] = payload["data"]
+    return transmissions, errors
+
+
 @sio.event
 def tx_request(sid, message):
     """
     Answers a Socket request for a Transmisssion based on ACLs
     """
-    from radio.helpers.utils import user_allowed_to_access_transmission, UUIDEncoder
-    from radio.models import Transmission
-    from radio.serializers import TransmissionListSerializer
-
     try:
-        session = sio.get_session(sid)
-        user = session["user"]
-        transmission = Transmission.objects.get(UUID=message["UUID"])
-
-        if user_allowed_to_access_transmission(transmission, user.userProfile.UUID):
-            resp = TransmissionListSerializer(transmission)
-            # Clean me up
-            data = json.loads(json.dumps(resp.data, cls=UUIDEncoder))
+        transmissions, errors = _get_allowed_transmissions(sid, [message["UUID"]])
+        if transmissions:
             sio.emit(
-                "tx_response", {"UUID": str(message["UUID"]), "data": data}, room=sid
+                "tx_response", {"UUID": str(message["UUID"]), "data": transmissions.popitem()[1]}, room=sid
             )
         else:
             sio.emit(
                 "tx_response",
-                {"UUID": message["UUID"], "error": "PERMISSION TO OBJECT DENIED"},
+                {"UUID": message["UUID"], "error": errors.popitem()[1]},
                 room=sid,
             )
     except Exception as error:
@@ -71,24 +111,75 @@ def tx_request(sid, message):
         )
 
 
-# @sio.event
-# def deregister_tx_source(sid, message):
-#     """
-#     Deregisters a user to a Transmision source room
-#     """
-#     for uuid in message["UUIDs"]:
-#         sio.leave_room(sid, f"tx_{uuid}")
-#         sio.emit("debug", {"data": f"disconnected to room tx_{uuid}"}, room=sid)
+@sio.event
+def tx_request_batch(sid, message):
+    """
+    Answers a Socket request for many Transmisssions based on ACLs
+    """
+    try:
+        transmissions, errors = _get_allowed_transmissions(
+            sid, message.get("UUIDs", [])[:settings.SOCKET_TX_BATCH_MAX_SIZE]
+        )
+        sio.emit("tx_response_batch", {"data": transmissions, "errors": errors}, room=sid)
+    except Exception as error:
+        if settings.SEND_TELEMETRY:
+            capture_exception(error)
+        sio.emit("tx_response_batch", {"data": {}, "error": f"ERROR: {str(error)}"}, room=sid)
+
+
+@sio.event
+def register_tx_source(sid, message):
+    """
+    Subscribes a socket to talkgroups, scanlists or scanners
+
+    Each source is resolved to the talkgroups the user can read and the socket
+    joins those talkgroup rooms, so new transmissions are pushed to it inline
+    """
+    from radio.helpers.access import authorize_tx_sources
+    from radio.helpers.emitter import talkgroup_room
+
+    session = sio.get_session(sid)
+    sources = authorize_tx_sources(session["user"].userProfile, message.get("UUIDs", []))
+
+    subscriptions = session.setdefault("tx_sources", {})
+    for source, talkgroups in sources.items():
+        subscriptions[source] = talkgroups
+        for talkgroup in talkgroups:
+            sio.enter_room(sid, talkgroup_room(talkgroup))
+    sio.save_session(sid, session)
+
+    sio.emit(
+        "tx_sources",
+        {
+            "subscribed": sources,
+            "denied": [str(source) for source in message.get("UUIDs", []) if str(source) not in sources],
+        },
+        room=sid,
+    )
+
+
+@sio.event
+def deregister_tx_source(sid, message):
+    """
+    Unsubscribes a socket from talkgroups, scanlists or scanners
+    """
+    from radio.helpers.emitter import talkgroup_room
+
+    session = sio.get_session(sid)
+    subscriptions = session.setdefault("tx_sources", {})
+
+    dropped = set()
+    for source in message.get("UUIDs", []):
+        dropped.update(subscriptions.pop(str(source), []))
 
+    # Talkgroups still covered by another subscribed source stay joined
+    for talkgroups in subscriptions.values():
+        dropped.difference_update(talkgroups)
 
-# @sio.event
-# def register_tx_source(sid, message):
-#     """
-#     Registers a user to a Transmision source room
-#     """
-#     for uuid in message["UUIDs"]:
-#         sio.enter_room(sid, f"tx_{uuid}")
-#         sio.emit("debug", {"data": f"connected to room tx_{uuid}"}, room=sid)
+    for talkgroup in dropped:
+        sio.leave_room(sid, talkgroup_room(talkgroup))
+    sio.save_session(sid, session)
+    sio.emit("tx_sources", {"subscribed": subscriptions, "denied": []}, room=sid)
 
 # pylint: disable=unused-argument
 @sio.event
@@ -113,7 +204,8 @@ def connect(sid, environ, auth):
     sio.save_session(sid, {"user": user})
     logging.debug(f"[+] User {user.email} has connected to the socket")
     sio.enter_room(sid, "unicast")
-    sio.enter_room(sid, "transmission_party_bus")
+    if settings.SOCKET_TRANSMISSION_PARTY_BUS:
+        sio.enter_room(sid, "transmission_party_bus")
     sio.enter_room(sid, "parents_rapid_genetic_mutations")
     sio.enter_room(sid, f"alert_{user.userProfile.UUID}")
     sio.emit("debug", {"data": "Connected"}, room=sid)
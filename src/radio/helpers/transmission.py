@@ -3,20 +3,36 @@ import uuid
 import base64
 import logging
 
-import requests
-import socketio
-
 from django.conf import settings
+from django.db import transaction as db_transaction
+from django.core.files import File
 from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+from django.utils import timezone
 
-from radio.helpers.utils import TransmissionDetails
+from radio.helpers.cache import (
+    get_recorder,
+    get_talkgroup,
+)
+from radio.helpers.fanout import fan_out_item
+from radio.helpers.forwarding import get_forwarding_client
+from radio.helpers.rates import record_transmission_rates
+from radio.helpers.utils import (
+    TransmissionDetails,
+    resolve_talkgroups,
+    resolve_units,
+    validate_upload,
+)
 from radio.models import (
+    build_audio_path,
     ScanList,
     Scanner,
     System,
     SystemRecorder,
     SystemForwarder,
     TalkGroup,
+    Transmission,
 )
 from radio.serializers import TransmissionUploadSerializer
 
@@ -40,65 +56,218 @@ def _new_transmission_handler(data: dict) -> dict:
     """
     Converts API call to DB format and stores file
     """
-    from radio.tasks import (
-        forward_transmission,
-        send_transmission_to_web,
-        send_transmission_notifications,
-        send_transmission_mqtt
+    audio: str = data["audio_file"]
+    audio_bytes: bytes = base64.b64decode(audio)
+
+    name = data["name"].split(".")
+    audio_file = ContentFile(
+        audio_bytes, name=f'{name[0]}_{str(uuid.uuid4()).rsplit("-", maxsplit=1)[-1]}.{name}.m4a'
     )
 
-    logger.info(f"Got new transmission - {data['name'].split('.')[0]}", extra=data["json"])
-    recorder_uuid: str = data["recorder"]
-    jsonx: dict = data["json"]
-    audio: str = data["audio_file"]
-    tx_uuid: str = data["UUID"]
-    tones: dict = data.get("tones", None)
+    return _ingest_transmission(data, audio_file=audio_file)
 
 
+def _new_stored_transmission_handler(data: dict) -> dict:
+    """
+    Converts API call to DB format for audio already streamed to storage
+    """
+    audio_path: str = data["audio_path"]
 
-    recorder: SystemRecorder = SystemRecorder.objects.get(
-        api_key=recorder_uuid
+    try:
+        transmission = _ingest_transmission(data, audio_path=audio_path)
+    except Exception:
+        # The row is already saved when only the fan-out dispatch failed
+        if not Transmission.objects.filter(audio_file=audio_path).exists():
+            default_storage.delete(audio_path)
+        raise
+    if not transmission:
+        default_storage.delete(audio_path)
+
+    return transmission
+
+
+def _store_transmission_audio(audio: File, name: str, recorder: SystemRecorder, talkgroup_decimalid: int, talkgroup_tag: str) -> str:
+    """
+    Streams an uploaded audio file to the configured storage and returns its path
+    """
+    system: System = recorder.system
+
+    talkgroup: TalkGroup = get_talkgroup(system, talkgroup_decimalid)
+    if talkgroup:
+        alpha_tag = talkgroup.alpha_tag
+    elif talkgroup_tag and talkgroup_tag != "-":
+        alpha_tag = talkgroup_tag
+    else:
+        alpha_tag = str(talkgroup_decimalid)
+
+    stem, _, extension = name.rpartition(".")
+    if not stem:
+        stem, extension = extension, "m4a"
+
+    filename = f'{stem}_{str(uuid.uuid4()).rsplit("-", maxsplit=1)[-1]}.{extension}'
+    path = build_audio_path(system.name, talkgroup_decimalid, alpha_tag, filename)
+
+    return default_storage.save(path, audio)
+
+
+def _build_transmission(
+    item: dict,
+    details: TransmissionDetails,
+    recorder: SystemRecorder,
+    talkgroup: TalkGroup,
+    audio_file: ContentFile = None,
+    audio_path: str = None,
+) -> Transmission:
+    """
+    Builds an unsaved Transmission from a parsed upload and stores its audio
+    """
+    if talkgroup is None:
+        talkgroup = details.resolve_talkgroup()
+
+    payload = details.to_json(talkgroup=talkgroup)
+    tones: dict = item.get("tones") or {}
+    if not isinstance(tones, dict):
+        tones = {}
+
+    transmission = Transmission(
+        UUID=item["UUID"],
+        system=recorder.system,
+        recorder=recorder,
+        talkgroup=talkgroup,
+        audio_type=payload["audio_type"],
+        start_time=timezone.make_aware(timezone.datetime.fromisoformat(payload["start_time"])),
+        end_time=timezone.make_aware(timezone.datetime.fromisoformat(payload["end_time"])),
+        encrypted=payload["encrypted"],
+        emergency=payload["emergency"],
+        units=payload["units"],
+        frequencys=payload["frequencys"],
+        frequency=payload["frequency"],
+        length=payload["length"],
+        has_tones=bool(tones.get("has_tones", False)),
+        is_dispatch=bool(tones.get("is_dispatch", False)),
+        tones_detected=tones.get("tones_detected"),
+        tones_meta=tones.get("tones_meta") or {},
     )
+
+    if audio_path is not None:
+        transmission.audio_file.name = audio_path
+    else:
+        transmission.audio_file.save(audio_file.name, audio_file, save=False)
+
+    return transmission
+
+
+def _ingest_transmission(data: dict, audio_file: ContentFile = None, audio_path: str = None) -> dict:
+    """
+    Validates a new transmission, saves it and dispatches the fan-out tasks
+    """
+    from radio.tasks import fan_out_transmissions
+
+    logger.info(f"Got new transmission - {data['name'].split('.')[0]}", extra=data["json"])
+    recorder_uuid: str = data["recorder"]
+    jsonx: dict = data["json"]
+
+    recorder: SystemRecorder = get_recorder(recorder_uuid)
     system: System = recorder.system
     jsonx["system"] = str(system.UUID)
 
-    payload: TransmissionDetails = TransmissionDetails(jsonx)
-    audio_bytes: bytes = base64.b64decode(audio)
+    details: TransmissionDetails = TransmissionDetails(jsonx)
 
-    if payload.validate_upload(recorder_uuid):
-        payload = payload.to_json()
-    else:
+    if not details.validate_upload(recorder_uuid):
         return False
 
-    payload["UUID"] = str(tx_uuid)
-    payload["recorder"] = str(recorder_uuid)
-    payload["system"] = str(system.UUID)
+    transmission = _build_transmission(
+        data, details, recorder, None, audio_file=audio_file, audio_path=audio_path
+    )
+    transmission.save(force_insert=True)
+    record_transmission_rates([transmission])
+    transmission_data = TransmissionUploadSerializer(transmission).data
+
+    fan_out_transmissions.delay([fan_out_item(transmission, data)])
+    return transmission_data
 
-    if tones and isinstance(tones, dict):
-        payload["tones"] = tones
 
-    name = data["name"].split(".")
-    payload["audio_file"] = ContentFile(
-        audio_bytes, name=f'{name[0]}_{str(uuid.uuid4()).rsplit("-", maxsplit=1)[-1]}.{name}.m4a'
+def _new_transmission_batch_handler(data: dict) -> list[dict]:
+    """
+    Converts a batch of API calls to DB format, stores the files
+    and bulk inserts the transmissions
+    """
+    from radio.tasks import fan_out_transmissions
+
+    recorder_uuid: str = data["recorder"]
+    items: list[dict] = data["transmissions"]
+
+    recorder: SystemRecorder = get_recorder(recorder_uuid)
+    system: System = recorder.system
+    logger.info(f"Got new transmission batch - {len(items)} calls from {recorder.name}")
+
+    talkgroup_tags = {}
+    unit_ids = []
+    for item in items:
+        jsonx: dict = item["json"]
+        jsonx["system"] = str(system.UUID)
+        talkgroup_tag = jsonx.get("talkgroup_tag", str(jsonx["talkgroup"]))
+        talkgroup_tags.setdefault(
+            int(jsonx["talkgroup"]),
+            str(jsonx["talkgroup"]) if talkgroup_tag == "-" else talkgroup_tag
+        )
+        unit_ids.extend(src["src"] for src in jsonx["srcList"])
+
+    allowed = {
+        decimal_id: validate_upload(decimal_id, recorder)
+        for decimal_id in talkgroup_tags
+    }
+    talkgroups = resolve_talkgroups(
+        system,
+        {decimal_id: tag for decimal_id, tag in talkgroup_tags.items() if allowed[decimal_id]}
     )
+    units = resolve_units(system, unit_ids)
+
+    transmissions: list[Transmission] = []
+    accepted: list[dict] = []
+    for item in items:
+        details = TransmissionDetails(item["json"], units=units)
+        if not allowed[int(details.talkgroup)]:
+            continue
+
+        name = item["name"].split(".")
+        transmission = _build_transmission(
+            item,
+            details,
+            recorder,
+            talkgroups[int(details.talkgroup)],
+            audio_file=ContentFile(
+                base64.b64decode(item["audio_file"]),
+                name=f'{name[0]}_{str(uuid.uuid4()).rsplit("-", maxsplit=1)[-1]}.{name}.m4a',
+            ),
+        )
 
-    transmission = TransmissionUploadSerializer(data=payload, partial=True)
+        transmissions.append(transmission)
+        accepted.append(item)
 
-    if transmission.is_valid(raise_exception=True):
-        transmission.save()
-        socket_data = {
-            "UUID": str(transmission.data["UUID"]),
-            "talkgroup": transmission.data["talkgroup"],
-            "transmission": None
-        }
-        if not system.enable_talkgroup_acls:
-            socket_data["transmission"] = transmission.data
+    if not transmissions:
+        return []
+
+    try:
+        with db_transaction.atomic():
+            Transmission.objects.bulk_create(transmissions)
+    except Exception:
+        for transmission in transmissions:
+            default_storage.delete(transmission.audio_file.name)
+        raise
 
-        send_transmission_to_web.delay(socket_data, payload["talkgroup"])
-        send_transmission_notifications.delay(transmission.data)
-        send_transmission_mqtt.delay(transmission.data)
-        forward_transmission.delay(data, payload["talkgroup"])
-        return transmission.data
+    record_transmission_rates(transmissions)
+
+    serialized = json.loads(json.dumps(
+        TransmissionUploadSerializer(transmissions, many=True).data, cls=UUIDEncoder
+    ))
+
+    fan_out_transmissions.delay([
+        fan_out_item(transmission, dict(item, recorder=recorder_uuid))
+        for transmission, item in zip(transmissions, accepted)
+    ])
+
+    return serialized
 
 
 def _get_transmission_parents(talkgroup_uuid: str) -> dict[list[dict[str, str]]]:
@@ -189,10 +358,13 @@ def _forward_transmission_to_remote_instance(
     """
     try:
         data["recorder"] = str(recorder_key)
-        response = requests.post(
-            f"{forwarder_url}/api/radio/transmission/create", json=json.loads(json.dumps(data, cls=UUIDEncoder))
+        if "audio_path" in data:
+            with default_storage.open(data.pop("audio_path"), "rb") as audio:
+                data["audio_file"] = base64.b64encode(audio.read()).decode()
+
+        response = get_forwarding_client(forwarder_name, forwarder_url).post(
+            "/api/radio/transmission/create", data
         )
-        assert response.ok
         logger.info(
             f"[+] SUCCESSFULLY FORWARDED TRANSMISSION {data['name']} to {forwarder_name} - {response.text}"
         )
@@ -207,16 +379,10 @@ def _forward_transmission_to_remote_instance(
 
 
 def _broadcast_transmission(event: str, room: str, data: dict):
-    try:
-        mgr = socketio.KombuManager(
-            settings.SOCKETS_BROKER_URL
-        )
-        sio = socketio.Server(
-            async_mode="gevent", client_manager=mgr, logger=False, engineio_logger=False, cors_allowed_origins=settings.CORS_ALLOWED_ORIGINS
-        )
-        # from trunkplayer_ng.wsgi import sio
+    from radio.helpers.emitter import broadcast
 
-        sio.emit(event, json.loads(json.dumps(data, cls=UUIDEncoder)), room=room)
+    try:
+        broadcast(event, room, data, coalesce=room == "transmission_party_bus")
         logger.debug(f"[+] BROADCASTING TO {room}")
     except Exception as error:
         if settings.SEND_TELEMETRY:
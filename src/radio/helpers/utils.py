@@ -3,13 +3,19 @@ import uuid
 import logging
 import json
 
+from django.db.models import Count
 from django.utils import timezone
-from django.db.models import Q
 
 
+from radio.helpers.access import get_user_access, transmission_access_predicate
+from radio.helpers.cache import (
+    get_recorder,
+    get_system,
+    get_talkgroups,
+)
+from radio.helpers.policy import get_upload_policy
 from radio.models import (
     System,
-    SystemACL,
     SystemRecorder,
     TalkGroup,
     TalkGroupACL,
@@ -17,7 +23,6 @@ from radio.models import (
     Unit,
     UserProfile,
 )
-from radio.serializers import UnitSerializer
 
 logger = logging.getLogger(__name__)
 
@@ -28,11 +33,11 @@ class UUIDEncoder(json.JSONEncoder):
         return json.JSONEncoder.default(self, o)
 
 class TransmissionDetails:
-    def __init__(self, payload) -> None:
+    def __init__(self, payload, units: dict = None) -> None:
         """
         Transmission Details object
         """
-        self.system:System = System.objects.get(UUID=payload.get("system"))
+        self.system:System = get_system(payload.get("system"))
         self.freq = payload.get("freq")
         self.audio_type = payload.get("audio_type")
         self.call_length = payload.get("call_length")
@@ -54,48 +59,43 @@ class TransmissionDetails:
         
         self.src_list = payload["srcList"]
 
+        if units is None:
+            units = resolve_units(self.system, [src["src"] for src in self.src_list])
+
         for src in self.src_list:
-            unit, created = Unit.objects.get_or_create(
-                system=self.system, decimal_id=int(src["src"])
-            )
-            unit.save()
-
-            src["decimal_id"] = src["src"]
-            src["UUID"] = str(uuid.uuid5(
-                uuid.NAMESPACE_DNS,
-                hashlib.blake2b(json.dumps(src).encode()).hexdigest()
-            ))
-            unit_serializer = UnitSerializer(unit)
-            src["unit"] = json.loads(json.dumps(unit_serializer.data, cls=UUIDEncoder))
-
-            print(src)
-       
-
-    def to_json(self) -> dict:
+            self._attach_unit(src, units[int(src["src"])])
+
+    @staticmethod
+    def _attach_unit(src: dict, unit: Unit) -> None:
         """
-        Convert Transmission Details object to dict
+        Decorates a trunk-recorder source entry with its resolved unit
+        """
+        src["decimal_id"] = src["src"]
+        src["UUID"] = str(uuid.uuid5(
+            uuid.NAMESPACE_DNS,
+            hashlib.blake2b(json.dumps(src).encode()).hexdigest()
+        ))
+        src["unit"] = serialize_unit(unit)
+
+    def resolve_talkgroup(self) -> TalkGroup:
+        """
+        Resolves (and creates if missing) the talkgroup for this transmission
         """
-        system: System = self.system
-
         if self.talkgroup_tag == "-":
             alphatag = self.talkgroup
         else:
             alphatag = self.talkgroup_tag
 
-        if TalkGroup.objects.filter(decimal_id=self.talkgroup, system=system):
-            talkgroup = TalkGroup.objects.get(decimal_id=self.talkgroup, system=system)
-            created = False
-        else:
-            talkgroup, created = TalkGroup.objects.get_or_create(
-                decimal_id=self.talkgroup, system=system, alpha_tag=alphatag
-            )
-            talkgroup.save()
+        return resolve_talkgroups(
+            self.system, {int(self.talkgroup): str(alphatag)}
+        )[int(self.talkgroup)]
 
-        if created:
-            for acl in TalkGroupACL.objects.filter(default_new_users=True):
-                acl: TalkGroupACL
-                acl.allowed_talkgroups.add(talkgroup)
-                acl.save()
+    def to_json(self, talkgroup: TalkGroup = None) -> dict:
+        """
+        Convert Transmission Details object to dict
+        """
+        if talkgroup is None:
+            talkgroup = self.resolve_talkgroup()
 
         payload = {
             "audio_type": self.audio_type,
@@ -119,55 +119,76 @@ class TransmissionDetails:
         """
         Validate that user is allowed to post TG
         """
-        recorder: SystemRecorder = SystemRecorder.objects.get(
-            api_key=recorder_uuid
+        recorder: SystemRecorder = get_recorder(recorder_uuid)
+        return get_upload_policy(recorder).allows(self.talkgroup)
+
+
+def serialize_unit(unit: Unit) -> dict:
+    """
+    Converts a unit to the dict stored on a transmission's source list
+    (same shape as UnitSerializer)
+    """
+    return {
+        "UUID": str(unit.UUID),
+        "system": str(unit.system_id),
+        "decimal_id": unit.decimal_id,
+        "description": unit.description,
+    }
+
+
+def resolve_units(system: System, decimal_ids: list[int]) -> dict[int, Unit]:
+    """
+    Resolves (and creates missing) units for a system in set based queries
+    """
+    decimal_ids = set(int(decimal_id) for decimal_id in decimal_ids)
+    if not decimal_ids:
+        return {}
+
+    units = {
+        unit.decimal_id: unit
+        for unit in Unit.objects.filter(system=system, decimal_id__in=decimal_ids)
+    }
+
+    missing = decimal_ids - set(units)
+    if missing:
+        Unit.objects.bulk_create(
+            [Unit(system=system, decimal_id=decimal_id) for decimal_id in missing],
+            ignore_conflicts=True,
+        )
+        for unit in Unit.objects.filter(system=system, decimal_id__in=missing):
+            units[unit.decimal_id] = unit
+
+    return units
+
+
+def resolve_talkgroups(system: System, talkgroup_tags: dict[int, str]) -> dict[int, TalkGroup]:
+    """
+    Resolves (and creates missing) talkgroups for a system keyed on decimal ID
+    """
+    talkgroups = get_talkgroups(system, talkgroup_tags)
+
+    for decimal_id, alpha_tag in talkgroup_tags.items():
+        if decimal_id in talkgroups:
+            continue
+
+        talkgroup, created = TalkGroup.objects.get_or_create(
+            decimal_id=decimal_id, system=system, alpha_tag=alpha_tag
         )
+        if created:
+            for acl in TalkGroupACL.objects.filter(default_new_users=True):
+                acl: TalkGroupACL
+                acl.allowed_talkgroups.add(talkgroup)
+        talkgroups[decimal_id] = talkgroup
 
-        talkgroups_allowed = recorder.talkgroups_allowed.all()
-        talkgroups_denyed = recorder.talkgroups_denyed.all()
-        talkgroup = TalkGroup.objects.filter(UUID=self.talkgroup)
-
-        if (
-            len(talkgroups_allowed) > 0
-            and len(talkgroups_denyed) == 0
-        ):
-            if talkgroup in talkgroups_allowed:
-                return True
-            else:
-                return False
-        elif (
-            len(talkgroups_allowed) == 0
-            and len(talkgroups_denyed) > 0
-        ):
-            if talkgroup in talkgroups_denyed:
-                return False
-            else:
-                return True
-        elif (
-            len(talkgroups_allowed) > 0
-            and len(talkgroups_denyed) > 0
-        ):
-            if talkgroup in talkgroups_denyed:
-                return False
-            else:
-                if talkgroup in talkgroups_allowed:
-                    return True
-                else:
-                    return False
-        elif (
-            len(talkgroups_allowed) == 0
-            and len(talkgroups_denyed) == 0
-        ):
-            return True
+    return talkgroups
 
 
 def get_user_allowed_systems(user_uuid: str) -> tuple[list, list]:
     """
     Gets the systems that the user is allowed to access
     """
-    user_acls = SystemACL.objects.filter(Q(users__UUID=user_uuid) | Q(public=True))
-    systems = System.objects.filter(systemACL__in=user_acls)
-    system_uuids = list(systems.values_list("UUID", flat=True))
+    system_uuids = list(get_user_access(user_uuid).systems)
+    systems = System.objects.filter(UUID__in=system_uuids)
     return system_uuids, systems
 
 
@@ -175,25 +196,15 @@ def get_user_allowed_talkgroups(system: System, user_uuid: str) -> list:
     """
     Gets the talkgroups that the user is allowed to access
     """
-    if not system.enable_talkgroup_acls:
-        return TalkGroup.objects.filter(system=system)
-
-    acls = TalkGroupACL.objects.filter(users__UUID=user_uuid)
-    allowed = list(acls.values_list("allowed_talkgroups__UUID", flat=True))
-    allowed_talkgropups = TalkGroup.objects.filter(UUID__in=allowed)
-
-    return allowed_talkgropups
+    allowed = get_user_access(user_uuid).readable
+    return TalkGroup.objects.filter(system=system, UUID__in=list(allowed))
 
 def get_user_allowed_talkgroups_for_systems(systems: list[System], user_uuid: str) -> list:
     """
     Gets the talkgroups that the user is allowed to access
     """
-    non_acl_talkgroups = TalkGroup.objects.filter(system__in=systems, system__enable_talkgroup_acls=False)
-    acls = TalkGroupACL.objects.filter(users__UUID=user_uuid)
-    allowed = list(acls.values_list("allowed_talkgroups__UUID", flat=True))
-    acl_talkgroups = TalkGroup.objects.filter(UUID__in=allowed)
-
-    return non_acl_talkgroups | acl_talkgroups
+    allowed = get_user_access(user_uuid).readable
+    return TalkGroup.objects.filter(system__in=systems, UUID__in=list(allowed))
 
 
 def user_allowed_to_access_transmission(
@@ -207,26 +218,15 @@ def user_allowed_to_access_transmission(
     if user.site_admin:
         return True
 
-    allowed_tgs = get_user_allowed_talkgroups(transmission.system, user_uuid=user_uuid)
-
-    if transmission.talkgroup in allowed_tgs:
-        return True
-
-    return False
+    return get_user_access(user_uuid).can_read(transmission.talkgroup_id)
 
 
 def get_user_allowed_download_talkgroups(system: System, user_uuid: str) -> list:
     """
     Returns talkgroups user can download
     """
-    if not system.enable_talkgroup_acls:
-        return TalkGroup.objects.filter(system=system)
-
-    acls = TalkGroupACL.objects.filter(users__UUID=user_uuid, download_allowed=True)
-    allowed = list(acls.values_list("allowed_talkgroups__UUID", flat=True))
-    allowed_talkgropups = TalkGroup.objects.filter(UUID__in=allowed)
-
-    return allowed_talkgropups
+    allowed = get_user_access(user_uuid).downloadable
+    return TalkGroup.objects.filter(system=system, UUID__in=list(allowed))
 
 
 def user_allowed_to_download_transmission(
@@ -235,72 +235,42 @@ def user_allowed_to_download_transmission(
     """
     Returns whether a user can download a transmission
     """
-    allowed_tgs = get_user_allowed_download_talkgroups(
-        transmission.system, user_uuid=user_uuid
-    )
+    return get_user_access(user_uuid).can_download(transmission.talkgroup_id)
 
-    if transmission.talkgroup in allowed_tgs:
-        return True
+def with_transmission_list_relations(queryset):
+    """
+    Loads what TransmissionListSerializer touches alongside the transmissions
+    """
+    return queryset.select_related("talkgroup", "system").prefetch_related("talkgroup__agency")
 
-    return False
 
-def get_user_allowed_transmissions(user_uuid: str) -> list:
-    system_uuids, systems = get_user_allowed_systems(user_uuid)
-    del system_uuids
-    allowed_transmissions_non_acl = Transmission.objects.none()
-    allowed_transmissions_acl = Transmission.objects.none()
-
-    for system in systems:
-        system: System
-        if system.enable_talkgroup_acls:
-            talkgroups_allowed = get_user_allowed_talkgroups(system, user_uuid)
-            allowed_transmissions_acl = allowed_transmissions_acl | Transmission.objects.filter(
-                    system=system, talkgroup__in=talkgroups_allowed
-                )
-        else:
-            allowed_transmissions_non_acl = allowed_transmissions_non_acl | Transmission.objects.filter(system=system)
-    allowed_transmissions = allowed_transmissions_acl | allowed_transmissions_non_acl 
+def prime_transmission_counts(transmissions) -> None:
+    """
+    Fills talkgroup transmission counts for a page in a single aggregate query
+    """
+    talkgroups = {}
+    for transmission in transmissions or []:
+        talkgroups.setdefault(transmission.talkgroup_id, []).append(transmission.talkgroup)
+    if not talkgroups:
+        return
+
+    counts = dict(
+        Transmission.objects.filter(talkgroup__in=list(talkgroups))
+        .order_by()
+        .values("talkgroup")
+        .annotate(total=Count("UUID"))
+        .values_list("talkgroup", "total")
+    )
+    for talkgroup_uuid, instances in talkgroups.items():
+        for talkgroup in instances:
+            talkgroup._transmission_count = counts.get(talkgroup_uuid, 0)
 
-    return allowed_transmissions
+
+def get_user_allowed_transmissions(user_uuid: str) -> list:
+    return Transmission.objects.filter(transmission_access_predicate(user_uuid))
 
 def validate_upload(talkgroup_decimalid: str, recorder: SystemRecorder) -> bool:
     """
     Validate that user is allowed to post TG
     """
-
-    talkgroups_allowed = recorder.talkgroups_allowed.all().count()
-    talkgroups_denyed = recorder.talkgroups_denyed.all().count()
-    talkgroup = TalkGroup.objects.filter(decimal_id=talkgroup_decimalid, system=recorder.system)
-
-    if (
-        talkgroups_allowed > 0
-        and talkgroups_denyed == 0
-    ):
-        if talkgroup in talkgroups_allowed:
-            return True
-        else:
-            return False
-    elif (
-        talkgroups_allowed == 0
-        and talkgroups_denyed > 0
-    ):
-        if talkgroup in talkgroups_denyed:
-            return False
-        else:
-            return True
-    elif (
-        talkgroups_allowed > 0
-        and talkgroups_denyed > 0
-    ):
-        if talkgroup in talkgroups_denyed:
-            return False
-        else:
-            if talkgroup in talkgroups_allowed:
-                return True
-            else:
-                return False
-    elif (
-        talkgroups_allowed == 0
-        and talkgroups_denyed == 0
-    ):
-        return True
+    return get_upload_policy(recorder).allows(talkgroup_decimalid)
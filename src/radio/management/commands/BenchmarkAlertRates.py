@@ -0,0 +1,65 @@
+import time
+import random
+import statistics
+
+from collections import deque
+
+from django.core.management.base import BaseCommand, CommandError
+
+from radio.helpers.rates import SlidingWindowCounter
+
+
+#############################################################
+# Main Command
+#############################################################
+class Command(BaseCommand):
+    help = "Replays a steady call rate through the alert rate counters and checks them against exact counts"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rate", type=int, default=100, help="Calls per second")
+        parser.add_argument("--seconds", type=int, default=120, help="Simulated seconds")
+        parser.add_argument("--talkgroups", type=int, default=50, help="Talkgroups calls are spread over")
+        parser.add_argument("--units", type=int, default=3, help="Units per call")
+        parser.add_argument("--window", type=int, default=10, help="Alert trigger_time in seconds")
+        parser.add_argument("--seed", type=int, default=1, help="Random seed")
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        clock = [1_000_000.0]
+        counter = SlidingWindowCounter(f"benchmark-{time.time_ns()}", max_window=300, clock=lambda: clock[0])
+
+        talkgroups = [f"tg-{index}" for index in range(options["talkgroups"])]
+        units = [f"unit-{index}" for index in range(options["talkgroups"] * 10)]
+        window = options["window"]
+        exact = {}
+
+        latencies = []
+        mismatches = 0
+        calls = options["rate"] * options["seconds"]
+        for _ in range(calls):
+            clock[0] += 1 / options["rate"]
+            talkgroup = rng.choice(talkgroups)
+            call_units = rng.sample(units, options["units"])
+
+            start = time.perf_counter()
+            # What ingest records and an alert evaluation reads for one call
+            counter.add([(talkgroup, clock[0])] + [(unit, clock[0]) for unit in call_units])
+            counted = counter.counts([talkgroup], window)[talkgroup]
+            counter.counts(call_units, window)
+            latencies.append(time.perf_counter() - start)
+
+            events = exact.setdefault(talkgroup, deque())
+            events.append(int(clock[0]))
+            while events and events[0] <= int(clock[0]) - window:
+                events.popleft()
+            if counted != len(events):
+                mismatches += 1
+
+        latencies.sort()
+        total = sum(latencies)
+        self.stdout.write(f"{calls} calls at {options['rate']}/s over {options['seconds']}s, {window}s window")
+        self.stdout.write(f"mean {statistics.mean(latencies) * 1e6:.1f}us  p99 {latencies[int(len(latencies) * 0.99)] * 1e6:.1f}us")
+        self.stdout.write(f"headroom {calls / total:.0f} calls/s per process")
+        if mismatches:
+            raise CommandError(f"{mismatches} counts differed from the exact window")
+        self.stdout.write("counts matched the exact window for every call")
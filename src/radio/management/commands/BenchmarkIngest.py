@@ -0,0 +1,133 @@
+import base64
+import random
+import time
+import uuid
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from trunkplayer_ng.celery import app
+
+from radio.models import (
+    System,
+    SystemACL,
+    SystemRecorder,
+    Transmission,
+)
+
+
+class Rollback(Exception):
+    """
+    Raised to throw away the benchmark data
+    """
+
+
+#############################################################
+# Main Command
+#############################################################
+class Command(BaseCommand):
+    help = "Benchmarks single vs batched transmission ingest throughput"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--calls", type=int, default=300, help="Calls ingested per run")
+        parser.add_argument("--batch-sizes", default="1,10,100", help="Comma separated calls per request")
+        parser.add_argument("--talkgroups", type=int, default=25, help="Distinct talkgroups in the sample")
+        parser.add_argument("--units", type=int, default=200, help="Distinct units in the sample")
+        parser.add_argument(
+            "--broker",
+            default="memory://",
+            help="Broker the fan-out tasks are published to, memory:// keeps the run off the network"
+        )
+
+    def handle(self, *args, **options):
+        from radio.helpers.transmission import (
+            _new_transmission_handler,
+            _new_transmission_batch_handler,
+        )
+
+        # The app reads CELERY_* settings into lowercase keys, set the one it uses
+        app.conf.broker_url = options["broker"]
+        batch_sizes = [int(size) for size in options["batch_sizes"].split(",")]
+        audio = base64.b64encode(b"\x00" * 4096).decode()
+        results = []
+        audio_files = []
+
+        try:
+            with transaction.atomic():
+                name = f"Benchmark {uuid.uuid4().hex[:8]}"
+                acl: SystemACL = SystemACL.objects.create(name=name)
+                system: System = System.objects.create(name=name, systemACL=acl)
+                recorder: SystemRecorder = SystemRecorder.objects.create(
+                    system=system, name="Benchmark", site_id="bench", enabled=True
+                )
+
+                calls = self._sample_calls(options, audio)
+
+                start = time.perf_counter()
+                for call in calls:
+                    _new_transmission_handler(
+                        dict(call, recorder=str(recorder.api_key), UUID=str(uuid.uuid4()), json=dict(call["json"]))
+                    )
+                results.append(("single", 1, time.perf_counter() - start))
+
+                for size in batch_sizes:
+                    calls = self._sample_calls(options, audio)
+
+                    start = time.perf_counter()
+                    for index in range(0, len(calls), size):
+                        _new_transmission_batch_handler({
+                            "recorder": str(recorder.api_key),
+                            "transmissions": [
+                                dict(call, UUID=str(uuid.uuid4()))
+                                for call in calls[index:index + size]
+                            ],
+                        })
+                    results.append(("batch", size, time.perf_counter() - start))
+
+                audio_files = list(
+                    Transmission.objects.filter(system=system).values_list("audio_file", flat=True)
+                )
+                raise Rollback()
+        except Rollback:
+            pass
+
+        for audio_file in audio_files:
+            default_storage.delete(audio_file)
+
+        baseline = results[0][2]
+        self.stdout.write(f"{'mode':<8}{'calls/req':>10}{'seconds':>10}{'calls/s':>10}{'speedup':>9}")
+        for mode, size, elapsed in results:
+            self.stdout.write(
+                f"{mode:<8}{size:>10}{elapsed:>10.2f}{options['calls'] / elapsed:>10.1f}{baseline / elapsed:>8.1f}x"
+            )
+
+    def _sample_calls(self, options: dict, audio: str) -> list[dict]:
+        """
+        Builds trunk-recorder style calls spread over the sample talkgroups and units
+        """
+        now = int(time.time())
+        calls = []
+        for index in range(options["calls"]):
+            talkgroup = random.randint(1, options["talkgroups"])
+            calls.append({
+                "name": f"{talkgroup}-{now + index}_854187500.m4a",
+                "audio_file": audio,
+                "json": {
+                    "freq": 854187500,
+                    "start_time": now + index,
+                    "stop_time": now + index + 5,
+                    "emergency": 0,
+                    "encrypted": 0,
+                    "call_length": 5,
+                    "talkgroup": talkgroup,
+                    "talkgroup_tag": f"Benchmark {talkgroup}",
+                    "audio_type": "digital",
+                    "freqList": [{"freq": 854187500, "time": now + index, "pos": 0, "len": 5}],
+                    "srcList": [
+                        {"src": random.randint(1, options["units"]), "time": now + index + pos, "pos": pos}
+                        for pos in range(3)
+                    ],
+                },
+            })
+        return calls
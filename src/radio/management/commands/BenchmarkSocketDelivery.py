@@ -0,0 +1,76 @@
+import time
+import random
+
+import socketio
+
+from django.core.management.base import BaseCommand
+
+from radio.helpers.emitter import talkgroup_room
+
+
+#############################################################
+# Main Command
+#############################################################
+class Command(BaseCommand):
+    help = "Simulates socket clients to compare party bus broadcasts with per-talkgroup rooms"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--clients", type=int, default=5000, help="Simulated socket clients")
+        parser.add_argument("--talkgroups", type=int, default=500, help="Talkgroups calls are spread over")
+        parser.add_argument("--subscriptions", type=int, default=25, help="Authorized talkgroups per client")
+        parser.add_argument("--calls", type=int, default=1000, help="Transmissions pushed")
+        parser.add_argument("--seed", type=int, default=1, help="Random seed")
+
+    def _server(self, clients: list[set], party_bus: bool) -> tuple[socketio.Server, list]:
+        sio = socketio.Server(async_mode="threading", logger=False, engineio_logger=False)
+        sent = []
+        # Count the engine.io packets instead of writing them to sockets
+        sio._send_eio_packet = lambda eio_sid, eio_packet: sent.append(eio_sid)
+
+        for index, talkgroups in enumerate(clients):
+            sid = sio.manager.connect(f"client-{index}", "/")
+            if party_bus:
+                sio.manager.enter_room(sid, "/", "transmission_party_bus")
+            else:
+                for talkgroup in talkgroups:
+                    sio.manager.enter_room(sid, "/", talkgroup_room(talkgroup))
+        return sio, sent
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        talkgroups = [f"tg-{index}" for index in range(options["talkgroups"])]
+        clients = [
+            set(rng.sample(talkgroups, min(options["subscriptions"], len(talkgroups))))
+            for _ in range(options["clients"])
+        ]
+        calls = [rng.choice(talkgroups) for _ in range(options["calls"])]
+        payload = {"uuid": "0" * 32, "parents": [], "transmission": {"talkgroup": None}}
+
+        self.stdout.write(
+            f"{options['clients']} clients, {options['talkgroups']} talkgroups, "
+            f"{options['subscriptions']} subscriptions each, {options['calls']} calls"
+        )
+        self.stdout.write(f"{'mode':<12} {'packets':>10} {'tx_request':>11} {'ms/call':>9}")
+
+        # Party bus: every client gets every call, interested clients ask for it back
+        sio, sent = self._server(clients, party_bus=True)
+        round_trips = 0
+        start = time.perf_counter()
+        for talkgroup in calls:
+            sio.emit("transmission_party_bus", payload, room="transmission_party_bus")
+            for eio_sid in [eio_sid for eio_sid in sent[-len(clients):]]:
+                if talkgroup in clients[int(eio_sid.rsplit("-", 1)[-1])]:
+                    round_trips += 1
+                    sio._send_eio_packet(eio_sid, None)
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            f"{'party bus':<12} {len(sent):>10} {round_trips:>11} {elapsed * 1000 / len(calls):>9.3f}"
+        )
+
+        # Rooms: only the authorized subscribers get the call, with the payload inline
+        sio, sent = self._server(clients, party_bus=False)
+        start = time.perf_counter()
+        for talkgroup in calls:
+            sio.emit("transmission", payload, room=talkgroup_room(talkgroup))
+        elapsed = time.perf_counter() - start
+        self.stdout.write(f"{'rooms':<12} {len(sent):>10} {0:>11} {elapsed * 1000 / len(calls):>9.3f}")
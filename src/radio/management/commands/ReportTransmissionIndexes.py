@@ -0,0 +1,129 @@
+import json
+import time
+import statistics
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django_filters import IsoDateTimeFromToRangeFilter
+
+from radio.filters import TransmissionFilter
+from radio.models import Transmission
+
+
+#############################################################
+# Main Command
+#############################################################
+class Command(BaseCommand):
+    help = "Reports which TransmissionFilter filters are served by an index and benchmarks them"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--limit", type=int, default=100, help="Page size of the feed query")
+        parser.add_argument("--runs", type=int, default=5, help="Timed runs per filter")
+        parser.add_argument("--filter", action="append", dest="filters", help="Only report this filter (repeatable)")
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("Index report needs PostgreSQL")
+
+        sample: Transmission = (
+            Transmission.objects.select_related("system", "recorder", "talkgroup")
+            .order_by("-start_time")
+            .first()
+        )
+        if sample is None:
+            raise CommandError("No transmissions to sample filter values from")
+
+        table = Transmission._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT indexname FROM pg_indexes WHERE tablename = %s", [table])
+            table_indexes = set(row[0] for row in cursor.fetchall())
+
+        self.stdout.write(f"{'filter':<26} {'access path':<48} {'sort':<5} {'median ms':>10}")
+
+        indexed = 0
+        cases = self._cases(sample, options["filters"])
+        for name, params in cases:
+            filterset = TransmissionFilter(params, queryset=Transmission.objects.all())
+            if not filterset.is_valid():
+                self.stdout.write(f"{name:<26} skipped - {dict(filterset.errors)}")
+                continue
+
+            queryset = filterset.qs.order_by("-start_time", "-UUID")[:options["limit"]]
+            access, sort = self._access_path(queryset, table, table_indexes)
+            if access not in ("Seq Scan", "-"):
+                indexed += 1
+
+            timings = []
+            for _ in range(options["runs"]):
+                start = time.perf_counter()
+                list(queryset.all())
+                timings.append((time.perf_counter() - start) * 1000)
+
+            self.stdout.write(
+                f"{name:<26} {access:<48} {'yes' if sort else 'no':<5} {statistics.median(timings):>10.2f}"
+            )
+
+        self.stdout.write(f"{indexed} of {len(cases)} filters use an index on {table}")
+
+    def _cases(self, sample: Transmission, only: list = None) -> list:
+        """
+        Builds one query per TransmissionFilter filter, with values taken from the newest transmission
+        """
+        cases = [("(none)", {})]
+        for name, filter_ in TransmissionFilter.base_filters.items():
+            if name == TransmissionFilter.order_by_field or (only and name not in only):
+                continue
+
+            if name == "unit":
+                if not sample.units or "unit" not in sample.units[0]:
+                    continue
+                cases.append((name, {name: sample.units[0]["unit"]["UUID"]}))
+                continue
+
+            value = sample
+            for part in filter_.field_name.split("__"):
+                value = getattr(value, part, None)
+                if hasattr(value, "all"):
+                    value = value.first()
+                if value is None:
+                    break
+            if value is None:
+                continue
+
+            if isinstance(filter_, IsoDateTimeFromToRangeFilter):
+                cases.append((name, {f"{name}_after": (value - timedelta(hours=1)).isoformat()}))
+            elif isinstance(value, bool):
+                # Always ask for the rare side, that is what partial indexes cover
+                cases.append((name, {name: "true"}))
+            else:
+                cases.append((name, {name: str(getattr(value, "pk", value))}))
+
+        return cases
+
+    def _access_path(self, queryset, table: str, table_indexes: set) -> tuple[str, bool]:
+        """
+        Returns how the plan reaches the transmission table and whether it sorts
+        """
+        plan = json.loads(queryset.explain(format="json"))[0]["Plan"]
+
+        indexes = []
+        seq_scan = False
+        sort = False
+        nodes = [plan]
+        while nodes:
+            node = nodes.pop()
+            nodes.extend(node.get("Plans", []))
+
+            if node["Node Type"] in ("Sort", "Incremental Sort"):
+                sort = True
+            elif node["Node Type"] == "Seq Scan" and node.get("Relation Name") == table:
+                seq_scan = True
+            elif node.get("Index Name") in table_indexes and node["Index Name"] not in indexes:
+                indexes.append(node["Index Name"])
+
+        if indexes:
+            return ", ".join(indexes), sort
+        if seq_scan:
+            return "Seq Scan", sort
+        return "-", sort
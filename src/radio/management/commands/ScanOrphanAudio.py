@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from radio.helpers.audio import _collect_audio_garbage, _scan_orphan_audio
+
+
+#############################################################
+# Main Command
+#############################################################
+class Command(BaseCommand):
+    help = "Reconciles stored audio against the DB and reports (or removes) orphaned files"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--min-age-hours",
+            type=int,
+            default=24,
+            help="Ignore files younger than this so in-flight uploads are not flagged"
+        )
+        parser.add_argument("--batch-size", type=int, default=1000, help="Files checked against the DB per query")
+        parser.add_argument("--delete", action="store_true", help="Tombstone the orphans and run the audio GC")
+
+    def handle(self, *args, **options):
+        stats = _scan_orphan_audio(
+            options["min_age_hours"],
+            tombstone=options["delete"],
+            batch_size=options["batch_size"],
+        )
+
+        self.stdout.write(f"Scanned {stats['files']} files ({stats['bytes']} bytes)")
+        self.stdout.write(f"Found {stats['orphans']} orphaned files ({stats['orphan_bytes']} bytes)")
+
+        if options["delete"] and stats["orphans"]:
+            removed, reclaimed = _collect_audio_garbage()
+            self.stdout.write(f"Removed {removed} files ({reclaimed} bytes)")
@@ -0,0 +1,43 @@
+from django.db import migrations, models
+
+
+def dedup_units(apps, schema_editor):
+    """
+    Collapses duplicate units, keeping the one with a description
+    """
+    Unit = apps.get_model("radio", "Unit")
+    UserAlert = apps.get_model("radio", "UserAlert")
+
+    duplicates = (
+        Unit.objects.values("system_id", "decimal_id")
+        .annotate(total=models.Count("UUID"))
+        .filter(total__gt=1)
+    )
+
+    for duplicate in duplicates:
+        units = list(
+            Unit.objects.filter(
+                system_id=duplicate["system_id"], decimal_id=duplicate["decimal_id"]
+            )
+        )
+        units.sort(key=lambda unit: not unit.description)
+        keeper, extras = units[0], units[1:]
+
+        for alert in UserAlert.objects.filter(units__in=extras).distinct():
+            alert.units.remove(*extras)
+            alert.units.add(keeper)
+
+        Unit.objects.filter(UUID__in=[unit.UUID for unit in extras]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('radio', '0002_transmission_has_tones_transmission_is_dispatch_and_more'),
+    ]
+
+    # The constraint is added in 0004, Postgres will not alter a table with
+    # the deferred triggers these deletes leave pending in one transaction
+    operations = [
+        migrations.RunPython(dedup_units, migrations.RunPython.noop),
+    ]
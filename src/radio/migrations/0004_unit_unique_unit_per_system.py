@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('radio', '0003_dedup_units'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='unit',
+            constraint=models.UniqueConstraint(fields=('system', 'decimal_id'), name='unique_unit_per_system'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('radio', '0004_unit_unique_unit_per_system'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transmission',
+            index=models.Index(fields=['-start_time', '-UUID'], name='radio_tx_feed_idx'),
+        ),
+    ]
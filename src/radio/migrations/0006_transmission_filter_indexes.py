@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:20
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Built concurrently so ingest keeps writing while large archives are indexed
+    atomic = False
+
+    dependencies = [
+        ('radio', '0005_transmission_feed_index'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='transmission',
+            index=models.Index(fields=['talkgroup', '-start_time', '-UUID'], name='radio_tx_tg_feed_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='transmission',
+            index=models.Index(fields=['system', '-start_time', '-UUID'], name='radio_tx_system_feed_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='transmission',
+            index=models.Index(condition=models.Q(('emergency', True)), fields=['-start_time', '-UUID'], name='radio_tx_emergency_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='transmission',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['units'], name='radio_tx_units_gin', opclasses=['jsonb_path_ops']),
+        ),
+        # Superseded by radio_tx_emergency_idx
+        migrations.AlterField(
+            model_name='transmission',
+            name='emergency',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:34
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('radio', '0006_transmission_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PruneCheckpoint',
+            fields=[
+                ('UUID', models.UUIDField(db_index=True, default=uuid.uuid4, primary_key=True, serialize=False, unique=True)),
+                ('cutoff', models.DateTimeField()),
+                ('last_start_time', models.DateTimeField(blank=True, null=True)),
+                ('last_UUID', models.UUIDField(blank=True, null=True)),
+                ('finished', models.DateTimeField(blank=True, null=True)),
+                ('rows_deleted', models.BigIntegerField(default=0)),
+                ('bytes_reclaimed', models.BigIntegerField(default=0)),
+                ('updated', models.DateTimeField(auto_now=True)),
+                ('system', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, to='radio.system')),
+            ],
+        ),
+    ]
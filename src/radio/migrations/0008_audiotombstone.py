@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:37
+
+import django.utils.timezone
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('radio', '0007_prunecheckpoint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AudioTombstone',
+            fields=[
+                ('UUID', models.UUIDField(db_index=True, default=uuid.uuid4, primary_key=True, serialize=False, unique=True)),
+                ('name', models.CharField(max_length=250, unique=True)),
+                ('system_UUID', models.UUIDField(blank=True, null=True)),
+                ('created', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True, null=True)),
+            ],
+        ),
+    ]
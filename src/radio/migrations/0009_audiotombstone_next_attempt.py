@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:02
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('radio', '0008_audiotombstone'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='audiotombstone',
+            name='next_attempt',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+    ]
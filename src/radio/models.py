@@ -2,6 +2,7 @@ import uuid
 
 from datetime import datetime
 
+from django.contrib.postgres.indexes import GinIndex
 from django.db import models
 from django.dispatch import receiver
 from django.utils import timezone
@@ -148,7 +149,9 @@ class TalkGroup(models.Model):
 
     @property
     def transmission_count(self):
-       return Transmission.objects.filter(talkgroup=self).count() 
+        if hasattr(self, "_transmission_count"):
+            return self._transmission_count
+        return Transmission.objects.filter(talkgroup=self).count()
 
     def __str__(self):
         return f"[{self.system.name}] {self.alpha_tag}"
@@ -217,6 +220,63 @@ class SystemRecorder(models.Model):
     def __str__(self):
         return f"[{self.system.name}] {self.name}"
 
+# pylint: disable=unused-argument
+@receiver(models.signals.post_save, sender=System)
+@receiver(models.signals.post_delete, sender=System)
+@receiver(models.signals.post_save, sender=TalkGroup)
+@receiver(models.signals.post_delete, sender=TalkGroup)
+@receiver(models.signals.post_save, sender=SystemRecorder)
+@receiver(models.signals.post_delete, sender=SystemRecorder)
+def invalidate_resolution_cache(sender, instance, *args, **kwargs):
+    """
+    Drops the cached ingest lookups for the changed model
+    """
+    from radio.helpers.cache import recorder_cache, system_cache, talkgroup_cache
+    from radio.helpers.policy import policy_cache
+
+    from radio.helpers.access import invalidate_user_access
+
+    if sender is System:
+        system_cache.invalidate()
+        recorder_cache.invalidate()
+        talkgroup_cache.invalidate()
+        invalidate_user_access()
+    elif sender is TalkGroup:
+        talkgroup_cache.invalidate()
+        policy_cache.invalidate()
+        if kwargs.get("created", True):
+            invalidate_user_access()
+    elif sender is SystemRecorder:
+        recorder_cache.invalidate()
+        policy_cache.invalidate()
+
+@receiver(models.signals.m2m_changed, sender=SystemRecorder.talkgroups_allowed.through)
+@receiver(models.signals.m2m_changed, sender=SystemRecorder.talkgroups_denyed.through)
+def invalidate_upload_policy(sender, instance, action, *args, **kwargs):
+    """
+    Rebuilds recorder upload policies when the allow/deny lists change
+    """
+    from radio.helpers.policy import policy_cache
+
+    if action in ("post_add", "post_remove", "post_clear"):
+        policy_cache.invalidate()
+
+@receiver(models.signals.post_save, sender=Agency)
+@receiver(models.signals.post_delete, sender=Agency)
+@receiver(models.signals.post_save, sender=City)
+@receiver(models.signals.post_delete, sender=City)
+@receiver(models.signals.m2m_changed, sender=TalkGroup.agency.through)
+@receiver(models.signals.m2m_changed, sender=Agency.city.through)
+def invalidate_talkgroup_agencies(sender, instance, *args, **kwargs):
+    """
+    Drops the cached talkgroup agencies used in MQTT messages
+    """
+    from radio.helpers.mqtt import talkgroup_agency_cache
+
+    if kwargs.get("action", "post").startswith("pre"):
+        return
+    talkgroup_agency_cache.invalidate()
+
 class Unit(models.Model):
     UUID = models.UUIDField(
         primary_key=True, default=uuid.uuid4, db_index=True, unique=True
@@ -225,34 +285,31 @@ class Unit(models.Model):
     decimal_id = models.IntegerField(db_index=True)
     description = models.CharField(max_length=100, blank=True, null=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["system", "decimal_id"], name="unique_unit_per_system"
+            )
+        ]
+
     def __str__(self):
         return f"[{self.system.name}] {str(self.decimal_id)}"
 
-# pylint: disable=unused-argument
-@receiver(models.signals.post_save, sender=Unit)
-def execute_unit_dedup_check(sender, instance, created, *args, **kwargs):
+def build_audio_path(system_name: str, decimal_id: int, alpha_tag: str, filename: str) -> str:
     """
-    Makes sure Units are deduped on save hook
+    Builds the storage path for a transmission's audio
     """
-
-    system = instance.system
-
-    if created:
-        if instance.description != "":
-            units = Unit.objects.filter(
-                system=system, decimal_id=instance.decimal_id
-            ).exclude(UUID=instance.UUID)
-            units.delete()
-        else:
-            if Unit.objects.filter(system=system, decimal_id=instance.decimal_id).exclude(
-                description=""
-            ):
-                instance.delete()
+    time_str = datetime.now().strftime('%Y/%m/%d')
+    safe_alpha_tag = "".join([c for c in alpha_tag if c.isalpha() or c.isdigit() or c==' ']).rstrip()
+    return f"audio/{time_str}/{system_name}_{str(decimal_id)}_{safe_alpha_tag.replace(' ', '-')}/{filename}"
 
 def get_audio_path(instance, filename):
-    time_str = datetime.now().strftime('%Y/%m/%d')
-    safe_alpha_tag = "".join([c for c in instance.talkgroup.alpha_tag if c.isalpha() or c.isdigit() or c==' ']).rstrip()
-    return f"audio/{time_str}/{instance.talkgroup.system.name}_{str(instance.talkgroup.decimal_id)}_{safe_alpha_tag.replace(' ', '-')}/{filename}"
+    return build_audio_path(
+        instance.talkgroup.system.name,
+        instance.talkgroup.decimal_id,
+        instance.talkgroup.alpha_tag,
+        filename
+    )
 
 class Transmission(models.Model):
     UUID = models.UUIDField(
@@ -266,7 +323,7 @@ class Transmission(models.Model):
     audio_file = models.FileField(upload_to=get_audio_path, max_length=250)
     talkgroup = models.ForeignKey(TalkGroup, on_delete=models.CASCADE, db_index=True)
     encrypted = models.BooleanField(default=False, db_index=True)
-    emergency = models.BooleanField(default=False, db_index=True)
+    emergency = models.BooleanField(default=False)
     units = models.JSONField(default=list, blank=True)
     frequencys = models.JSONField(default=list, blank=True)
     frequency = models.FloatField(default=0.0)
@@ -284,6 +341,17 @@ class Transmission(models.Model):
 
     class Meta:
         ordering = ["-start_time"]
+        indexes = [
+            models.Index(fields=["-start_time", "-UUID"], name="radio_tx_feed_idx"),
+            models.Index(fields=["talkgroup", "-start_time", "-UUID"], name="radio_tx_tg_feed_idx"),
+            models.Index(fields=["system", "-start_time", "-UUID"], name="radio_tx_system_feed_idx"),
+            models.Index(
+                fields=["-start_time", "-UUID"],
+                condition=models.Q(emergency=True),
+                name="radio_tx_emergency_idx",
+            ),
+            GinIndex(fields=["units"], opclasses=["jsonb_path_ops"], name="radio_tx_units_gin"),
+        ]
 
     def __str__(self):
         return f"[{self.system.name}][{self.talkgroup.alpha_tag}][{self.start_time}] {self.UUID}"
@@ -291,20 +359,26 @@ class Transmission(models.Model):
 @receiver(models.signals.post_delete, sender=Transmission)
 def auto_delete_file_on_delete(sender, instance:Transmission, **kwargs):
     """
-    Deletes file from filesystem
-    when corresponding `MediaFile` object is deleted.
+    Hands the audio of a deleted Transmission to the audio GC
     """
-    import os
-    from pathlib import Path
+    from radio.helpers.audio import tombstone_audio
+
     if instance.audio_file:
-        audio_path = Path(instance.audio_file.path)
-        parent:Path = audio_path.parent
+        tombstone_audio([instance.audio_file.name], instance.system_id)
 
-        if audio_path.exists():
-            os.remove(instance.audio_file.path)
+class AudioTombstone(models.Model):
+    UUID = models.UUIDField(
+        primary_key=True, default=uuid.uuid4, db_index=True, unique=True
+    )
+    name = models.CharField(max_length=250, unique=True)
+    system_UUID = models.UUIDField(null=True, blank=True)
+    created = models.DateTimeField(default=timezone.now, db_index=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt = models.DateTimeField(default=timezone.now, db_index=True)
+    last_error = models.TextField(blank=True, null=True)
 
-        if not any(Path(parent).iterdir()):
-            os.rmdir(parent)
+    def __str__(self):
+        return self.name
 
 class Incident(models.Model):
     UUID = models.UUIDField(
@@ -338,6 +412,22 @@ def execute_after_save(sender, instance, created, *args, **kwargs):
     incident_data = IncidentSerializer(instance)
     forward_incidents.delay(incident_data.data, created)
 
+class PruneCheckpoint(models.Model):
+    UUID = models.UUIDField(
+        primary_key=True, default=uuid.uuid4, db_index=True, unique=True
+    )
+    system = models.OneToOneField(System, on_delete=models.CASCADE)
+    cutoff = models.DateTimeField()
+    last_start_time = models.DateTimeField(null=True, blank=True)
+    last_UUID = models.UUIDField(null=True, blank=True)
+    finished = models.DateTimeField(null=True, blank=True)
+    rows_deleted = models.BigIntegerField(default=0)
+    bytes_reclaimed = models.BigIntegerField(default=0)
+    updated = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"[{self.system.name}] {self.cutoff}"
+
 class TalkGroupACL(models.Model):
     UUID = models.UUIDField(
         primary_key=True, default=uuid.uuid4, db_index=True, unique=True
@@ -353,6 +443,68 @@ class TalkGroupACL(models.Model):
     def __str__(self):
         return self.name
 
+# pylint: disable=unused-argument
+@receiver(models.signals.m2m_changed, sender=SystemACL.users.through)
+@receiver(models.signals.m2m_changed, sender=TalkGroupACL.users.through)
+def update_user_access_membership(sender, instance, action, reverse, pk_set, *args, **kwargs):
+    """
+    Updates the access index of users added to or removed from an ACL
+    """
+    from radio.helpers.access import invalidate_user_access
+
+    if action not in ("post_add", "post_remove", "pre_clear"):
+        return
+
+    if reverse:
+        invalidate_user_access([instance.UUID])
+    elif action == "pre_clear":
+        invalidate_user_access(instance.users.values_list("UUID", flat=True))
+    else:
+        invalidate_user_access(pk_set)
+
+@receiver(models.signals.m2m_changed, sender=TalkGroupACL.allowed_talkgroups.through)
+def update_user_access_talkgroups(sender, instance, action, reverse, pk_set, *args, **kwargs):
+    """
+    Updates the access index of an ACL's users when its talkgroups change
+    """
+    from radio.helpers.access import invalidate_user_access, talkgroup_acl_users
+
+    if action not in ("post_add", "post_remove", "pre_clear"):
+        return
+
+    if not reverse:
+        acls = [instance.UUID]
+    elif action == "pre_clear":
+        acls = instance.talkgroupacl_set.values_list("UUID", flat=True)
+    else:
+        acls = pk_set
+
+    invalidate_user_access(talkgroup_acl_users(acls))
+
+@receiver(models.signals.post_save, sender=TalkGroupACL)
+@receiver(models.signals.pre_delete, sender=TalkGroupACL)
+def update_user_access_talkgroup_acl(sender, instance, *args, **kwargs):
+    """
+    Updates the access index of an ACL's users when it changes (download_allowed) or goes away
+    """
+    from radio.helpers.access import invalidate_user_access, talkgroup_acl_users
+
+    if kwargs.get("created", False):
+        return
+    invalidate_user_access(talkgroup_acl_users([instance.UUID]))
+
+@receiver(models.signals.post_save, sender=SystemACL)
+@receiver(models.signals.post_delete, sender=SystemACL)
+def update_user_access_system_acl(sender, instance, *args, **kwargs):
+    """
+    Rebuilds every access index when a SystemACL changes (public affects everyone)
+    """
+    from radio.helpers.access import invalidate_user_access
+
+    if kwargs.get("created", False):
+        return
+    invalidate_user_access()
+
 class ScanList(models.Model):
     UUID = models.UUIDField(
         primary_key=True, default=uuid.uuid4, db_index=True, unique=True
@@ -510,3 +662,33 @@ class UserAlert(models.Model):
 
     def __str__(self):
         return f"{self.name}"
+
+# pylint: disable=unused-argument
+@receiver(models.signals.post_save, sender=UserAlert)
+@receiver(models.signals.post_delete, sender=UserAlert)
+def update_alert_index(sender, instance, *args, **kwargs):
+    """
+    Reloads a changed alert in the alert index
+    """
+    from radio.helpers.alerts import record_alert_change
+
+    record_alert_change([instance.UUID])
+
+@receiver(models.signals.m2m_changed, sender=UserAlert.talkgroups.through)
+@receiver(models.signals.m2m_changed, sender=UserAlert.units.through)
+def update_alert_index_watching(sender, instance, action, reverse, pk_set, *args, **kwargs):
+    """
+    Reloads alerts whose talkgroups or units change
+    """
+    from radio.helpers.alerts import record_alert_change
+
+    if action not in ("post_add", "post_remove", "post_clear", "pre_clear"):
+        return
+
+    if not reverse:
+        if action != "pre_clear":
+            record_alert_change([instance.UUID])
+    elif action == "pre_clear":
+        record_alert_change(instance.useralert_set.values_list("UUID", flat=True))
+    elif action != "post_clear":
+        record_alert_change(pk_set)
@@ -0,0 +1,165 @@
+import json
+import base64
+import binascii
+from collections import OrderedDict
+from uuid import UUID
+
+from django.db import connections
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def estimate_count(queryset) -> int:
+    """
+    Returns the planner's row estimate for a queryset (exact count off PostgreSQL)
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != "postgresql":
+        return queryset.count()
+
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+class TransmissionPagination(LimitOffsetPagination):
+    """
+    Transmission feed pagination
+
+    Offset mode (default) behaves like LimitOffsetPagination. Passing `cursor`
+    (empty for the first page) switches to keyset pagination on (start_time, UUID),
+    which costs the same at any depth of the archive. `count` picks how the total
+    is reported: `exact` (offset default), `estimate` (planner estimate) or `none`
+    (keyset default)
+    """
+    cursor_query_param = "cursor"
+    count_query_param = "count"
+    ordering_query_param = "ordering"
+    count_modes = ("exact", "estimate", "none")
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.limit = self.get_limit(request)
+        if self.limit is None:
+            return None
+
+        self.keyset = self.cursor_query_param in request.query_params
+        self.count_mode = self.get_count_mode(request)
+
+        if self.keyset:
+            return self.paginate_keyset(queryset, request)
+
+        if self.count_mode == "exact":
+            self.has_next = None
+            return super().paginate_queryset(queryset, request, view=view)
+
+        self.offset = self.get_offset(request)
+        self.count = estimate_count(queryset) if self.count_mode == "estimate" else None
+
+        results = list(queryset[self.offset:self.offset + self.limit + 1])
+        self.has_next = len(results) > self.limit
+        return results[:self.limit]
+
+    def get_count_mode(self, request) -> str:
+        mode = request.query_params.get(self.count_query_param)
+        if not mode:
+            return "none" if self.keyset else "exact"
+        if mode not in self.count_modes:
+            raise ValidationError({self.count_query_param: f"Must be one of {', '.join(self.count_modes)}"})
+        return mode
+
+    def paginate_keyset(self, queryset, request):
+        ordering = request.query_params.get(self.ordering_query_param) or "-start_time"
+        if ordering not in ("start_time", "-start_time"):
+            raise ValidationError({self.ordering_query_param: "Cursor pagination only supports start_time ordering"})
+        self.descending = ordering.startswith("-")
+
+        if self.count_mode == "exact":
+            self.count = queryset.count()
+        elif self.count_mode == "estimate":
+            self.count = estimate_count(queryset)
+        else:
+            self.count = None
+
+        cursor = self.decode_cursor(request.query_params.get(self.cursor_query_param))
+        if cursor is not None:
+            start_time, uuid = cursor
+            if self.descending:
+                queryset = queryset.filter(
+                    Q(start_time__lt=start_time) | Q(start_time=start_time, UUID__lt=uuid),
+                    start_time__lte=start_time,
+                )
+            else:
+                queryset = queryset.filter(
+                    Q(start_time__gt=start_time) | Q(start_time=start_time, UUID__gt=uuid),
+                    start_time__gte=start_time,
+                )
+
+        if self.descending:
+            queryset = queryset.order_by("-start_time", "-UUID")
+        else:
+            queryset = queryset.order_by("start_time", "UUID")
+
+        results = list(queryset[:self.limit + 1])
+        self.has_next = len(results) > self.limit
+        results = results[:self.limit]
+        self.last = results[-1] if results else None
+        return results
+
+    def decode_cursor(self, cursor: str):
+        if not cursor:
+            return None
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+            start_time = parse_datetime(payload["t"])
+            if start_time is None:
+                raise ValueError(payload["t"])
+            return start_time, UUID(payload["u"])
+        except (binascii.Error, ValueError, KeyError, TypeError, AttributeError) as error:
+            raise NotFound("Invalid cursor") from error
+
+    def encode_cursor(self, transmission) -> str:
+        payload = json.dumps({"t": transmission.start_time.isoformat(), "u": str(transmission.UUID)})
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+
+    def get_next_link(self):
+        if self.keyset:
+            if not self.has_next:
+                return None
+            url = self.request.build_absolute_uri()
+            url = replace_query_param(url, self.limit_query_param, self.limit)
+            url = remove_query_param(url, self.offset_query_param)
+            return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.last))
+
+        if self.has_next is None:
+            return super().get_next_link()
+        if not self.has_next:
+            return None
+
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.limit_query_param, self.limit)
+        return replace_query_param(url, self.offset_query_param, self.offset + self.limit)
+
+    def get_previous_link(self):
+        if self.keyset:
+            return None
+        return super().get_previous_link()
+
+    def get_paginated_response(self, data):
+        response = OrderedDict()
+        if self.count is not None:
+            response["count"] = self.count
+        response["next"] = self.get_next_link()
+        response["previous"] = self.get_previous_link()
+        response["results"] = data
+        return Response(response)
@@ -0,0 +1,39 @@
+import json
+
+from django.core.files import File
+
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser, DataAndFiles
+
+
+class RawAudioParser(BaseParser):
+    """
+    Parses a raw audio request body
+
+    The trunk-recorder metadata rides along in the `X-TPNG-*` headers and the
+    body is handed back un-read so it can be streamed straight to storage
+    """
+    media_type = "*/*"
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        request = parser_context["request"]
+        meta = request.META
+
+        try:
+            data = {
+                "recorder": meta.get("HTTP_X_TPNG_RECORDER"),
+                "name": meta.get("HTTP_X_TPNG_NAME", "audio.m4a"),
+                "json": json.loads(meta.get("HTTP_X_TPNG_JSON", "{}")),
+            }
+            if meta.get("HTTP_X_TPNG_TONES"):
+                data["tones"] = json.loads(meta["HTTP_X_TPNG_TONES"])
+        except ValueError as error:
+            raise ParseError(f"Invalid trunk-recorder JSON header - {error}") from error
+
+        files = {}
+        if stream is not None:
+            audio = File(stream, name=data["name"])
+            audio.content_type = (media_type or "").split(";")[0].strip()
+            files["audio_file"] = audio
+
+        return DataAndFiles(data, files)
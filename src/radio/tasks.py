@@ -2,7 +2,9 @@ import logging
 
 from celery import shared_task
 
+from radio.helpers.audio import _collect_audio_garbage, _scan_orphan_audio
 from radio.helpers.cleanup import _prune_transmissions
+from radio.helpers.fanout import _fan_out_transmissions
 from radio.helpers.mutations import _send_new_parental_mutation
 from radio.helpers.incident import _send_incident, _forward_incident
 
@@ -20,6 +22,8 @@ from radio.helpers.transmission import (
     _forward_transmission,
     _broadcast_transmission,
     _new_transmission_handler,
+    _new_stored_transmission_handler,
+    _new_transmission_batch_handler,
     _send_transmission_to_web,
     _forward_transmission_to_remote_instance,
 )
@@ -104,6 +108,22 @@ def prune_tranmissions(*args, **kwargs) -> None:
     _prune_transmissions()
 
 
+@shared_task()
+def collect_audio_garbage(*args, **kwargs) -> None:
+    """
+    Removes the audio of deleted Transmissions from storage
+    """
+    _collect_audio_garbage()
+
+
+@shared_task()
+def scan_orphan_audio(min_age_hours: int = 24, *args, **kwargs) -> None:
+    """
+    Hands audio no Transmission points at to the audio GC
+    """
+    _scan_orphan_audio(min_age_hours, tombstone=True)
+
+
 @shared_task
 def send_transmission_notifications(transmission: dict, *args, **kwargs) -> None:
     """
@@ -190,3 +210,25 @@ def new_transmission_handler(data: dict):
     Process new transmission
     """
     _new_transmission_handler(data)
+
+@shared_task
+def new_stored_transmission_handler(data: dict):
+    """
+    Process new transmission whose audio is already in storage
+    """
+    _new_stored_transmission_handler(data)
+
+@shared_task
+def new_transmission_batch_handler(data: dict):
+    """
+    Process a batch of new transmissions
+    """
+    _new_transmission_batch_handler(data)
+
+
+@shared_task
+def fan_out_transmissions(items: list, sinks: list = None, attempt: int = 0, *args, **kwargs) -> None:
+    """
+    Hands new transmissions to the web, alert, MQTT and forwarder sinks
+    """
+    _fan_out_transmissions(items, sinks, attempt)
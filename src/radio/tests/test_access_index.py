@@ -0,0 +1,150 @@
+import uuid
+
+from rest_framework.test import APITestCase
+
+from users.models import CustomUser
+from radio.models import (
+    ScanList,
+    Scanner,
+    SystemACL,
+    TalkGroupACL,
+    TalkGroup,
+    System
+)
+
+from radio.helpers.access import authorize_tx_sources, get_user_access
+
+
+class UserAccessIndexTests(APITestCase):
+    """
+    Tests the materialized user talkgroup access index
+    """
+    def setUp(self):
+        self.user: CustomUser = CustomUser.objects.create_user(email='test@trunkplayer.io', password=str(uuid.uuid4()))
+        self.profile = self.user.userProfile
+        self.profile.site_admin = False
+        self.profile.save()
+
+        self.public_acl: SystemACL = SystemACL.objects.create(
+            name="Default",
+            public=True
+        )
+        self.restricted_acl: SystemACL = SystemACL.objects.create(
+            name="Restricted",
+            public=False
+        )
+
+        self.open_system: System = System.objects.create(
+            name="System1",
+            systemACL=self.public_acl,
+            enable_talkgroup_acls=False,
+        )
+        self.acl_system: System = System.objects.create(
+            name="System2",
+            systemACL=self.restricted_acl,
+            enable_talkgroup_acls=True,
+        )
+
+        self.tg1: TalkGroup = TalkGroup.objects.create(
+            system=self.open_system,
+            decimal_id=1,
+            alpha_tag="tg1",
+        )
+        self.tg2: TalkGroup = TalkGroup.objects.create(
+            system=self.acl_system,
+            decimal_id=2,
+            alpha_tag="tg2",
+        )
+
+        self.talkgroup_acl: TalkGroupACL = TalkGroupACL.objects.create(
+            name="TG ACL",
+            download_allowed=False,
+            default_new_talkgroups=False,
+            default_new_users=False,
+        )
+
+    def test_system_acl_membership(self):
+        '''Test that SystemACL membership updates the index'''
+        access = get_user_access(self.profile.UUID)
+        self.assertEqual(access.systems, frozenset([str(self.open_system.UUID)]))
+        self.assertTrue(access.can_read(self.tg1.UUID))
+        self.assertTrue(access.can_download(self.tg1.UUID))
+        self.assertFalse(access.can_read(self.tg2.UUID))
+
+        self.restricted_acl.users.add(self.profile)
+        access = get_user_access(self.profile.UUID)
+        self.assertIn(str(self.acl_system.UUID), access.systems)
+        self.assertFalse(access.can_read(self.tg2.UUID))
+
+        self.restricted_acl.users.remove(self.profile)
+        self.assertNotIn(str(self.acl_system.UUID), get_user_access(self.profile.UUID).systems)
+
+    def test_talkgroup_acl_changes(self):
+        '''Test that TalkGroupACL users/talkgroups/download changes update the index'''
+        self.restricted_acl.users.add(self.profile)
+        self.talkgroup_acl.allowed_talkgroups.add(self.tg2)
+        self.assertFalse(get_user_access(self.profile.UUID).can_read(self.tg2.UUID))
+
+        self.talkgroup_acl.users.add(self.profile)
+        access = get_user_access(self.profile.UUID)
+        self.assertTrue(access.can_read(self.tg2.UUID))
+        self.assertFalse(access.can_download(self.tg2.UUID))
+
+        self.talkgroup_acl.download_allowed = True
+        self.talkgroup_acl.save()
+        self.assertTrue(get_user_access(self.profile.UUID).can_download(self.tg2.UUID))
+
+        self.talkgroup_acl.allowed_talkgroups.clear()
+        self.assertFalse(get_user_access(self.profile.UUID).can_read(self.tg2.UUID))
+
+    def test_system_talkgroup_acl_toggle(self):
+        '''Test that toggling enable_talkgroup_acls updates the index'''
+        self.assertTrue(get_user_access(self.profile.UUID).can_read(self.tg1.UUID))
+
+        self.open_system.enable_talkgroup_acls = True
+        self.open_system.save()
+        self.assertFalse(get_user_access(self.profile.UUID).can_read(self.tg1.UUID))
+
+        self.open_system.enable_talkgroup_acls = False
+        self.open_system.save()
+        tg3 = TalkGroup.objects.create(
+            system=self.open_system,
+            decimal_id=3,
+            alpha_tag="tg3",
+        )
+        self.assertTrue(get_user_access(self.profile.UUID).can_read(tg3.UUID))
+
+    def test_index_is_cached(self):
+        '''Test that access checks are query free once built'''
+        get_user_access(self.profile.UUID)
+        with self.assertNumQueries(0):
+            get_user_access(self.profile.UUID).can_read(self.tg1.UUID)
+
+    def test_authorize_tx_sources(self):
+        '''Test that socket sources resolve only to the talkgroups the user can read'''
+        owner: CustomUser = CustomUser.objects.create_user(email='owner@trunkplayer.io', password=str(uuid.uuid4()))
+        scanlist: ScanList = ScanList.objects.create(owner=owner.userProfile, name="Shared", public=True)
+        scanlist.talkgroups.add(self.tg1, self.tg2)
+        private: ScanList = ScanList.objects.create(
+            owner=owner.userProfile, name="Private", public=False, community_shared=False
+        )
+        private.talkgroups.add(self.tg1)
+        scanner: Scanner = Scanner.objects.create(owner=owner.userProfile, name="Scanner", public=True)
+        scanner.scanlists.add(scanlist)
+
+        sources = authorize_tx_sources(
+            self.profile,
+            [self.tg1.UUID, self.tg2.UUID, scanlist.UUID, private.UUID, scanner.UUID, "not-a-uuid"]
+        )
+        self.assertEqual(sources, {
+            str(self.tg1.UUID): [str(self.tg1.UUID)],
+            str(self.tg2.UUID): [],
+            str(scanlist.UUID): [str(self.tg1.UUID)],
+            str(scanner.UUID): [str(self.tg1.UUID)],
+        })
+
+        self.restricted_acl.users.add(self.profile)
+        self.talkgroup_acl.users.add(self.profile)
+        self.talkgroup_acl.allowed_talkgroups.add(self.tg2)
+        sources = authorize_tx_sources(self.profile, [scanner.UUID])
+        self.assertEqual(sorted(sources[str(scanner.UUID)]), sorted([str(self.tg1.UUID), str(self.tg2.UUID)]))
@@ -0,0 +1,90 @@
+import uuid
+
+from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
+from django.test import override_settings
+
+from rest_framework.test import APITestCase
+
+from users.models import CustomUser
+from radio.models import (
+    SystemACL,
+    TalkGroup,
+    Unit,
+    UserAlert,
+    System
+)
+
+from radio.helpers.alerts import AlertIndex, alert_index
+
+
+class AlertIndexTests(APITestCase):
+    """
+    Tests the inverted user alert index
+    """
+    def setUp(self):
+        cache.clear()
+        user: CustomUser = CustomUser.objects.create_user(email='alerts@trunkplayer.io', password=str(uuid.uuid4()))
+        acl: SystemACL = SystemACL.objects.create(name="Default", public=True)
+        system: System = System.objects.create(name="AlertSystem", systemACL=acl)
+        self.tg1: TalkGroup = TalkGroup.objects.create(system=system, decimal_id=1, alpha_tag="tg1")
+        self.tg2: TalkGroup = TalkGroup.objects.create(system=system, decimal_id=2, alpha_tag="tg2")
+        self.unit1: Unit = Unit.objects.create(system=system, decimal_id=1, description="")
+        self.unit2: Unit = Unit.objects.create(system=system, decimal_id=2, description="")
+
+        self.talkgroup_alert: UserAlert = UserAlert.objects.create(user=user.userProfile, name="Talkgroup")
+        self.talkgroup_alert.talkgroups.add(self.tg1)
+        self.unit_alert: UserAlert = UserAlert.objects.create(user=user.userProfile, name="Unit")
+        self.unit_alert.units.add(self.unit1, self.unit2)
+        alert_index.rebuild()
+
+    def tearDown(self):
+        cache.clear()
+        alert_index.rebuild()
+
+    def _match(self, talkgroup: TalkGroup, units: list[Unit]) -> tuple[list, dict]:
+        talkgroup_alerts, unit_alerts = alert_index.match(talkgroup.UUID, [str(unit.UUID) for unit in units])
+        return (
+            [alert.name for alert in talkgroup_alerts],
+            {alert.name: sorted(active) for alert, active in unit_alerts.values()},
+        )
+
+    def test_match(self):
+        '''Test that transmissions match the alerts watching their talkgroup or units without queries'''
+        with self.assertNumQueries(0):
+            matched = self._match(self.tg1, [self.unit2])
+        self.assertEqual(matched, (["Talkgroup"], {"Unit": [str(self.unit2.UUID)]}))
+
+        self.assertEqual(self._match(self.tg2, []), ([], {}))
+
+    def test_incremental_updates(self):
+        '''Test that alert and talkgroup/unit changes are applied to the index'''
+        self.talkgroup_alert.talkgroups.add(self.tg2)
+        self.assertEqual(self._match(self.tg2, [])[0], ["Talkgroup"])
+
+        self.talkgroup_alert.talkgroups.remove(self.tg1)
+        self.assertEqual(self._match(self.tg1, [])[0], [])
+
+        self.unit2.useralert_set.remove(self.unit_alert)
+        self.assertEqual(self._match(self.tg2, [self.unit2])[1], {})
+
+        self.talkgroup_alert.enabled = False
+        self.talkgroup_alert.save()
+        self.assertEqual(self._match(self.tg2, [])[0], [])
+
+        self.unit_alert.delete()
+        self.assertEqual(self._match(self.tg2, [self.unit1])[1], {})
+
+    @override_settings(RESOLUTION_CACHE_VERSION_CHECK=0)
+    def test_unshared_cache_reload(self):
+        '''Test that a process that does not share the cache picks up alert edits on the next check'''
+        worker_index = AlertIndex(cache=LocMemCache("alerts-worker", {}), shared=False)
+        self.assertEqual(len(worker_index.match(self.tg1.UUID, [])[0]), 1)
+
+        self.talkgroup_alert.enabled = False
+        self.talkgroup_alert.save()
+        self.assertEqual(worker_index.match(self.tg1.UUID, [])[0], [])
+
+        self.talkgroup_alert.enabled = True
+        self.talkgroup_alert.save()
+        self.assertEqual(len(worker_index.match(self.tg1.UUID, [])[0]), 1)
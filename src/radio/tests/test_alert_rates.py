@@ -0,0 +1,113 @@
+import uuid
+
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.test import SimpleTestCase, override_settings
+from django.utils import timezone
+
+from rest_framework.test import APITestCase
+
+from radio.models import (
+    SystemACL,
+    SystemRecorder,
+    Transmission,
+    TalkGroup,
+    System
+)
+
+from radio.helpers.notifications import count_window_transmissions
+from radio.helpers.rates import SlidingWindowCounter, rates_shared
+
+
+class FakeClock:
+    def __init__(self, now: float) -> None:
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class SlidingWindowCounterTests(SimpleTestCase):
+    """
+    Tests the per-second alert rate counters
+    """
+    def setUp(self):
+        cache.clear()
+        self.clock = FakeClock(1_000_000.5)
+        self.counter = SlidingWindowCounter("test", max_window=60, clock=self.clock)
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_window_edges(self):
+        '''Test that a window covers the current second and the window - 1 before it'''
+        self.counter.add([("tg", 1_000_000 - 10), ("tg", 1_000_000 - 9), ("tg", 1_000_000), ("tg", 1_000_000.9)])
+
+        self.assertEqual(self.counter.count("tg", 10), 3)
+        self.assertEqual(self.counter.count("tg", 11), 4)
+        self.assertEqual(self.counter.count("tg", 1), 2)
+
+        self.clock.now += 1
+        self.assertEqual(self.counter.count("tg", 10), 2)
+        self.assertEqual(self.counter.count("tg", 1), 0)
+
+    def test_future_and_expired_events(self):
+        '''Test that future events count as now and old events fall out of the window'''
+        self.counter.add([("tg", self.clock.now + 30), ("tg", self.clock.now - 3600)])
+        self.assertEqual(self.counter.count("tg", 1), 1)
+        self.assertEqual(self.counter.count("tg", 60), 1)
+
+    def test_window_cap_and_keys(self):
+        '''Test that windows are capped at max_window and many keys are read together'''
+        self.counter.add([("tg1", self.clock.now - 59), ("tg1", self.clock.now - 60), ("tg2", self.clock.now)])
+        self.counter.add([("tg1", self.clock.now)])
+
+        self.assertEqual(self.counter.counts(["tg1", "tg2", "tg3"], 600), {"tg1": 2, "tg2": 1, "tg3": 0})
+        self.assertEqual(self.counter.count("tg1", 0), 1)
+
+
+class WindowTransmissionCountTests(APITestCase):
+    """
+    Tests the DB counts used for long windows and unshared cache backends
+    """
+    def setUp(self):
+        acl: SystemACL = SystemACL.objects.create(name="Default", public=True)
+        system: System = System.objects.create(name="RateSystem", systemACL=acl)
+        recorder: SystemRecorder = SystemRecorder.objects.create(
+            system=system, name="Recorder", site_id="1", enabled=True
+        )
+        self.tg1: TalkGroup = TalkGroup.objects.create(system=system, decimal_id=1, alpha_tag="tg1")
+        self.unit1 = str(uuid.uuid4())
+        self.unit2 = str(uuid.uuid4())
+
+        now = timezone.now()
+        for index, (end_time, units) in enumerate((
+            (now, [self.unit1, self.unit2]),
+            (now - timedelta(seconds=30), [self.unit1]),
+            (now - timedelta(seconds=30), []),
+            (now - timedelta(hours=1), [self.unit1]),
+        )):
+            Transmission.objects.create(
+                system=system,
+                recorder=recorder,
+                talkgroup=self.tg1,
+                start_time=end_time,
+                end_time=end_time,
+                units=[{"unit": {"UUID": unit_uuid}} for unit_uuid in units],
+                audio_file=ContentFile(b"Junk data", name=f"rate{index}.m4a"),
+            )
+
+    def test_window_counts(self):
+        '''Test that unit windows count the unit's transmissions, not the talkgroup's'''
+        self.assertEqual(count_window_transmissions("talkgroup", str(self.tg1.UUID), 60), 3)
+        self.assertEqual(count_window_transmissions("unit", self.unit1, 60), 2)
+        self.assertEqual(count_window_transmissions("unit", self.unit2, 60), 1)
+        self.assertEqual(count_window_transmissions("unit", self.unit1, 7200), 3)
+
+    def test_rates_shared(self):
+        '''Test that the rate counters are only used with a shared cache backend'''
+        self.assertFalse(rates_shared())
+        with override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.db.DatabaseCache"}}):
+            self.assertTrue(rates_shared())
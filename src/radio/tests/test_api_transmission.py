@@ -1,10 +1,15 @@
+import base64
+import copy
 import json
 from time import sleep
 import uuid
 
+from django.test import override_settings
 from django.urls import reverse
 from django.utils import timezone
 from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
 
 from rest_framework.test import APIRequestFactory, APITestCase
 from rest_framework.test import force_authenticate
@@ -29,12 +34,25 @@ from radio.serializers import (
 )
 
 from radio.views.api.transmission import (
+    BatchCreate,
     Create,
     List,
+    StreamCreate,
     View
 )
 
+from radio.helpers.cache import (
+    get_recorder,
+    get_talkgroup
+)
+
+from radio.helpers.transmission import (
+    _new_stored_transmission_handler,
+    _new_transmission_batch_handler
+)
+
 from radio.helpers.utils import (
+    TransmissionDetails,
     UUIDEncoder,
     get_user_allowed_transmissions
 )
@@ -51,6 +69,9 @@ class APITransmissionTests(APITestCase):
 
         self.user: CustomUser = CustomUser.objects.create_user(email='test@trunkplayer.io', password=str(uuid.uuid4()))
         self.user2: CustomUser = CustomUser.objects.create_user(email='test2@trunkplayer.io', password=str(uuid.uuid4()))
+        for user in (self.user, self.user2):
+            user.userProfile.site_admin = False
+            user.userProfile.save()
         self.privilaged_user:CustomUser = CustomUser.objects.create_user(email='test-priv@trunkplayer.io', password=str(uuid.uuid4()))
         self.privilaged_user.is_superuser = True
         self.privilaged_user.userProfile.site_admin = True
@@ -334,7 +355,7 @@ class APITransmissionTests(APITestCase):
             audio_type="m4a",
             start_time=timezone.now(),
             end_time=timezone.now(),
-            audio_file=ContentFile("Junk data"),
+            audio_file=ContentFile("Junk data", name="junk.m4a"),
             talkgroup=self.tg1,
             encrypted=False,
             emergency=False,
@@ -353,7 +374,7 @@ class APITransmissionTests(APITestCase):
             audio_type="m4a",
             start_time=timezone.now(),
             end_time=timezone.now(),
-            audio_file=ContentFile("Junk data"),
+            audio_file=ContentFile("Junk data", name="junk.m4a"),
             talkgroup=self.tg4,
             encrypted=False,
             emergency=False,
@@ -370,7 +391,7 @@ class APITransmissionTests(APITestCase):
             audio_type="m4a",
             start_time=timezone.now(),
             end_time=timezone.now(),
-            audio_file=ContentFile("Junk data"),
+            audio_file=ContentFile("Junk data", name="junk.m4a"),
             talkgroup=self.tg5,
             encrypted=False,
             emergency=False,
@@ -388,7 +409,7 @@ class APITransmissionTests(APITestCase):
             audio_type="m4a",
             start_time=timezone.now(),
             end_time=timezone.now(),
-            audio_file=ContentFile("Junk data"),
+            audio_file=ContentFile("Junk data", name="junk.m4a"),
             talkgroup=self.tg6,
             encrypted=False,
             emergency=False,
@@ -406,7 +427,7 @@ class APITransmissionTests(APITestCase):
             audio_type="m4a",
             start_time=timezone.now(),
             end_time=timezone.now(),
-            audio_file=ContentFile("Junk data"),
+            audio_file=ContentFile("Junk data", name="junk.m4a"),
             talkgroup=self.tg7,
             encrypted=False,
             emergency=False,
@@ -425,7 +446,7 @@ class APITransmissionTests(APITestCase):
             audio_type="m4a",
             start_time=timezone.now(),
             end_time=timezone.now(),
-            audio_file=ContentFile("Junk data"),
+            audio_file=ContentFile("Junk data", name="junk.m4a"),
             talkgroup=self.tg8,
             encrypted=False,
             emergency=False,
@@ -566,6 +587,100 @@ class APITransmissionTests(APITestCase):
         self.assertEqual(json.dumps(user1_data["results"]), json.dumps(user1_serializer.data,cls=UUIDEncoder))
         self.assertEqual(json.dumps(user2_data["results"]), json.dumps(user2_serializer.data,cls=UUIDEncoder))
 
+    def test_api_transmission_list_cursor(self):
+        '''Test for the Transmission List EP cursor pagination'''
+        view = List.as_view()
+        endpoint = reverse('transmission_list')
+
+        expected = [
+            str(transmission_uuid)
+            for transmission_uuid in Transmission.objects.order_by("-start_time", "-UUID").values_list("UUID", flat=True)
+        ]
+
+        seen = []
+        request = self.factory.get(endpoint, {"limit": 4, "cursor": ""})
+        while request is not None:
+            force_authenticate(request, user=self.privilaged_user)
+            response = view(request).render()
+            data = json.loads(response.content)
+
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn("count", data)
+            self.assertIsNone(data["previous"])
+            seen += [transmission["UUID"] for transmission in data["results"]]
+            request = self.factory.get(data["next"]) if data["next"] else None
+
+        self.assertEqual(seen, expected)
+
+        request = self.factory.get(endpoint, {"limit": 2, "cursor": "", "ordering": "start_time", "count": "exact"})
+        force_authenticate(request, user=self.user)
+        data = json.loads(view(request).render().content)
+        self.assertEqual(data["count"], 4)
+        self.assertEqual(len(data["results"]), 2)
+        self.assertIsNotNone(data["next"])
+
+        request = self.factory.get(endpoint, {"cursor": "not-a-cursor"})
+        force_authenticate(request, user=self.privilaged_user)
+        self.assertEqual(view(request).status_code, status.HTTP_404_NOT_FOUND)
+
+        cursor = base64.urlsafe_b64encode(
+            json.dumps({"t": timezone.now().isoformat(), "u": "not-a-uuid"}).encode()
+        ).decode()
+        request = self.factory.get(endpoint, {"cursor": cursor})
+        force_authenticate(request, user=self.privilaged_user)
+        self.assertEqual(view(request).status_code, status.HTTP_404_NOT_FOUND)
+
+        request = self.factory.get(endpoint, {"cursor": "", "ordering": "talkgroup"})
+        force_authenticate(request, user=self.privilaged_user)
+        self.assertEqual(view(request).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_api_transmission_list_count_modes(self):
+        '''Test for the Transmission List EP offset count modes'''
+        view = List.as_view()
+        endpoint = reverse('transmission_list')
+
+        request = self.factory.get(endpoint, {"limit": 4, "offset": 4, "count": "none"})
+        force_authenticate(request, user=self.privilaged_user)
+        data = json.loads(view(request).render().content)
+        self.assertNotIn("count", data)
+        self.assertEqual(len(data["results"]), 2)
+        self.assertIsNone(data["next"])
+        self.assertIsNotNone(data["previous"])
+
+        request = self.factory.get(endpoint, {"limit": 4, "count": "none"})
+        force_authenticate(request, user=self.privilaged_user)
+        data = json.loads(view(request).render().content)
+        self.assertIn("offset=4", data["next"])
+
+        request = self.factory.get(endpoint, {"limit": 4, "count": "estimate"})
+        force_authenticate(request, user=self.privilaged_user)
+        data = json.loads(view(request).render().content)
+        self.assertIsInstance(data["count"], int)
+
+        request = self.factory.get(endpoint, {"count": "sometimes"})
+        force_authenticate(request, user=self.privilaged_user)
+        self.assertEqual(view(request).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_api_transmission_list_unit_emergency_filters(self):
+        '''Test for the Transmission List EP unit and emergency filters'''
+        view = List.as_view()
+        endpoint = reverse('transmission_list')
+
+        unit_uuid = str(uuid.uuid4())
+        self.transmission2.units = [{"src": 1, "decimal_id": 1, "unit": {"UUID": unit_uuid}}]
+        self.transmission2.emergency = True
+        self.transmission2.save()
+
+        request = self.factory.get(endpoint, {"unit": unit_uuid})
+        force_authenticate(request, user=self.privilaged_user)
+        data = json.loads(view(request).render().content)
+        self.assertEqual([transmission["UUID"] for transmission in data["results"]], [str(self.transmission2.UUID)])
+
+        request = self.factory.get(endpoint, {"emergency": "true"})
+        force_authenticate(request, user=self.privilaged_user)
+        data = json.loads(view(request).render().content)
+        self.assertEqual([transmission["UUID"] for transmission in data["results"]], [str(self.transmission2.UUID)])
+
     def test_api_transmission_create(self):
         '''Test for the Transmission Create EP'''
         view = Create.as_view()
@@ -603,6 +718,187 @@ class APITransmissionTests(APITestCase):
         # self.assertEqual(total, 7)
         # self.assertEqual(json.dumps(data), json.dumps(to_create, cls=UUIDEncoder))
 
+    def test_api_transmission_create_stream(self):
+        '''Test for the Transmission Streaming Create EP'''
+        view = StreamCreate.as_view()
+
+        endpoint = reverse('transmission_create_stream')
+
+        multipart_request = self.factory.post(endpoint, {
+            "recorder": str(self.api_key1),
+            "json": json.dumps(self.sample_json),
+            "name": "audio.m4a",
+            "audio_file": SimpleUploadedFile("audio.m4a", b"LITERLAY ANSY ARBATRARY BYTES", content_type="audio/mp4"),
+        }, format='multipart')
+        multipart_response = view(multipart_request)
+        multipart_response = multipart_response.render()
+
+        raw_request = self.factory.post(
+            endpoint,
+            b"LITERLAY ANSY ARBATRARY BYTES",
+            content_type="audio/mp4",
+            HTTP_X_TPNG_RECORDER=str(self.api_key1),
+            HTTP_X_TPNG_NAME="audio.m4a",
+            HTTP_X_TPNG_JSON=json.dumps(self.sample_json),
+        )
+        raw_response = view(raw_request)
+        raw_response = raw_response.render()
+
+        unauthorized_request = self.factory.post(endpoint, {
+            "recorder": str(uuid.uuid4()),
+            "json": json.dumps(self.sample_json),
+            "name": "audio.m4a",
+            "audio_file": SimpleUploadedFile("audio.m4a", b"ANY ARBATRARY BYTES", content_type="audio/mp4"),
+        }, format='multipart')
+        unauthorized_response = view(unauthorized_request)
+        unauthorized_response = unauthorized_response.render()
+
+        self.assertEqual(multipart_response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(raw_response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(unauthorized_response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_stored_transmission_failure_removes_audio(self):
+        '''Test that streamed audio is removed when its transmission fails to ingest'''
+        audio_path = default_storage.save("audio/streamed.m4a", ContentFile(b"ANY ARBATRARY BYTES"))
+        jsonx = copy.deepcopy(self.sample_json)
+        jsonx["talkgroup"] = "not-a-talkgroup"
+
+        with self.assertRaises(ValueError):
+            _new_stored_transmission_handler({
+                "recorder": str(self.api_key1),
+                "name": "audio.m4a",
+                "json": jsonx,
+                "audio_path": audio_path,
+            })
+
+        self.assertFalse(default_storage.exists(audio_path))
+
+    def test_api_transmission_create_batch(self):
+        '''Test for the Transmission Batch Create EP'''
+        view = BatchCreate.as_view()
+
+        endpoint = reverse('transmission_create_batch')
+
+        to_create = {
+            "recorder": str(self.api_key1),
+            "transmissions": [
+                {
+                    "json": self.sample_json,
+                    "audio_file": "LITERLAY ANSY ARBATRARY STRING",
+                    "name": "audio.wav"
+                } for _ in range(3)
+            ]
+        }
+        authorized_request = self.factory.post(endpoint, to_create, format='json')
+        authorized_response = view(authorized_request)
+        authorized_response = authorized_response.render()
+
+        to_create2 = dict(to_create, recorder=str(uuid.uuid4()))
+        unauthorized_request = self.factory.post(endpoint, to_create2, format='json')
+        unauthorized_response = view(unauthorized_request)
+        unauthorized_response = unauthorized_response.render()
+
+        empty_request = self.factory.post(endpoint, dict(to_create, transmissions=[]), format='json')
+        empty_response = view(empty_request)
+        empty_response = empty_response.render()
+
+        data = json.loads(authorized_response.content)
+
+        self.assertEqual(authorized_response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(data["UUIDs"]), 3)
+        self.assertEqual(data["rejected"], [])
+        self.assertEqual(unauthorized_response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(empty_response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_transmission_batch_handler(self):
+        '''Test for the Transmission Batch ingest'''
+        audio = base64.b64encode(b"LITERLAY ANSY ARBATRARY BYTES").decode()
+        batch = {
+            "recorder": str(self.api_key1),
+            "transmissions": [
+                {
+                    "UUID": str(uuid.uuid4()),
+                    "json": copy.deepcopy(self.sample_json),
+                    "audio_file": audio,
+                    "name": "audio.m4a",
+                    "tones": {"has_tones": True, "tones_detected": "A/B"} if index == 0 else None,
+                } for index in range(3)
+            ]
+        }
+
+        created = _new_transmission_batch_handler(batch)
+
+        transmissions = Transmission.objects.filter(
+            UUID__in=[item["UUID"] for item in batch["transmissions"]]
+        )
+        units = Unit.objects.filter(system=self.system1, decimal_id=32526)
+
+        self.assertEqual(len(created), 3)
+        self.assertEqual(transmissions.count(), 3)
+        self.assertEqual(units.count(), 1)
+        self.assertEqual(TalkGroup.objects.filter(system=self.system1, decimal_id=3071).count(), 1)
+        self.assertEqual(transmissions.filter(has_tones=True, tones_detected="A/B").count(), 1)
+        for transmission in transmissions:
+            self.assertTrue(transmission.audio_file.name)
+            self.assertEqual(transmission.units[0]["unit"]["UUID"], str(units.first().UUID))
+
+    def test_transmission_details_units(self):
+        '''Test that unit resolution is set based'''
+        def payload(unit_count):
+            jsonx = copy.deepcopy(self.sample_json)
+            jsonx["system"] = str(self.system1.UUID)
+            jsonx["srcList"] = [
+                {"src": 50000 + src, "time": 1652817155, "pos": src} for src in range(unit_count)
+            ]
+            return jsonx
+
+        TransmissionDetails(payload(0))
+        with self.assertNumQueries(3):
+            TransmissionDetails(payload(2))
+        with self.assertNumQueries(3):
+            TransmissionDetails(payload(20))
+        with self.assertNumQueries(1):
+            details = TransmissionDetails(payload(20))
+
+        self.assertEqual(Unit.objects.filter(system=self.system1, decimal_id__gte=50000).count(), 20)
+        self.assertEqual(
+            details.src_list[3]["unit"]["UUID"],
+            str(Unit.objects.get(system=self.system1, decimal_id=50003).UUID)
+        )
+
+    def test_resolution_cache(self):
+        '''Test that ingest lookups are cached until the model changes'''
+        get_recorder(self.api_key1)
+        get_talkgroup(self.system1, self.tg1.decimal_id)
+        with self.assertNumQueries(0):
+            recorder = get_recorder(self.api_key1)
+            talkgroup = get_talkgroup(self.system1, self.tg1.decimal_id)
+
+        self.recorder1.name = "Site 1 Renamed"
+        self.recorder1.save()
+        self.tg1.alpha_tag = "Renamed"
+        self.tg1.save()
+
+        with self.assertNumQueries(1):
+            renamed_recorder = get_recorder(self.api_key1)
+        with self.assertNumQueries(1):
+            renamed_talkgroup = get_talkgroup(self.system1, self.tg1.decimal_id)
+
+        self.assertEqual(recorder.name, "Site 1")
+        self.assertEqual(talkgroup, self.tg1)
+        self.assertEqual(renamed_recorder.name, "Site 1 Renamed")
+        self.assertEqual(renamed_talkgroup.alpha_tag, "Renamed")
+
+    def test_resolution_cache_revoked_key(self):
+        '''Test that a rotated recorder key stops working without a shared cache invalidation'''
+        with override_settings(RESOLUTION_CACHE_VERSION_CHECK=0):
+            get_recorder(self.api_key1)
+            # Another process rotating the key, the version bump stays in its own LocMem
+            SystemRecorder.objects.filter(pk=self.recorder1.pk).update(api_key=uuid.uuid4())
+
+            with self.assertRaises(SystemRecorder.DoesNotExist):
+                get_recorder(self.api_key1)
+
     def test_api_transmission_get(self):
         '''Test for the Transmsion Get EP'''
         view = View.as_view()
@@ -0,0 +1,97 @@
+import time
+
+from django.test import SimpleTestCase, override_settings
+
+from radio.helpers.delivery import AppriseDelivery, build_digest, parse_apprise_urls
+
+
+@override_settings(
+    APPRISE_CONCURRENCY=2,
+    APPRISE_DIGEST_WINDOW=5,
+    APPRISE_MIN_INTERVAL=1,
+    APPRISE_BACKOFF_MAX=300,
+    APPRISE_MAX_ATTEMPTS=3,
+)
+class AppriseDeliveryTests(SimpleTestCase):
+    def test_parse_apprise_urls(self):
+        '''Test Apprise URLs are split, stripped and deduplicated'''
+        self.assertEqual(
+            parse_apprise_urls(" json://a.local/ ,json://b.local/,,json://a.local/"),
+            ("json://a.local/", "json://b.local/"),
+        )
+        self.assertEqual(parse_apprise_urls(""), ())
+
+    def test_build_digest(self):
+        '''Test queued messages fold into one digest'''
+        self.assertEqual(build_digest([("Title", "Body")]), ("Title", "Body"))
+
+        title, body = build_digest([("First", "One"), ("Second", "Two"), ("Third", "Three")])
+        self.assertEqual(title, "First (+2 more)")
+        self.assertEqual(body, "First\nOne\n\nSecond\nTwo\n\nThird\nThree")
+
+    def test_destination_parsed_once(self):
+        '''Test a destination is parsed once and reused'''
+        delivery = AppriseDelivery()
+        destination = delivery.get_destination("json://a.local/")
+
+        self.assertTrue(destination.valid)
+        self.assertIs(delivery.get_destination("json://a.local/"), destination)
+
+    def test_destinations_bounded(self):
+        '''Test idle destinations are forgotten least recently used first'''
+        delivery = AppriseDelivery(max_destinations=2)
+        delivery.get_destination("json://a.local/")
+        delivery.get_destination("json://b.local/")
+        delivery.get_destination("json://a.local/")
+        delivery.get_destination("json://c.local/")
+
+        self.assertEqual(list(delivery.destinations), ["json://a.local/", "json://c.local/"])
+
+    def test_invalid_url_skipped(self):
+        '''Test invalid Apprise URLs are not queued'''
+        delivery = AppriseDelivery()
+        delivery.submit("notaservice://nowhere", "Title", "Body")
+
+        destination = delivery.get_destination("notaservice://nowhere")
+        self.assertFalse(destination.valid)
+        self.assertEqual(destination.pending, [])
+        self.assertFalse(destination.scheduled)
+
+    def test_submit_coalesces(self):
+        '''Test messages for a destination inside the window are queued together'''
+        delivery = AppriseDelivery()
+        delivery.submit("json://a.local/", "First", "One")
+        delivery.submit("json://a.local/,json://b.local/", "Second", "Two")
+
+        self.assertEqual(
+            delivery.get_destination("json://a.local/").pending,
+            [("First", "One"), ("Second", "Two")],
+        )
+        self.assertEqual(delivery.get_destination("json://b.local/").pending, [("Second", "Two")])
+
+    def test_failed_delivery_backs_off(self):
+        '''Test a failed send requeues its messages and backs off'''
+        delivery = AppriseDelivery()
+        destination = delivery.get_destination("json://127.0.0.1:1/")
+        messages = [("First", "One"), ("Second", "Two")]
+
+        delivery._deliver(destination, messages)
+
+        self.assertEqual(destination.failures, 1)
+        self.assertEqual(destination.attempts, 1)
+        self.assertEqual(destination.pending, messages)
+        self.assertTrue(destination.scheduled)
+        self.assertEqual(destination.backoff(), 2)
+        self.assertGreater(destination.next_send, time.monotonic() + 1)
+
+    def test_failed_delivery_dropped(self):
+        '''Test messages are dropped after APPRISE_MAX_ATTEMPTS failed sends'''
+        delivery = AppriseDelivery()
+        destination = delivery.get_destination("json://127.0.0.1:1/")
+        destination.attempts = 2
+
+        delivery._deliver(destination, [("First", "One")])
+
+        self.assertEqual(destination.pending, [])
+        self.assertEqual(destination.attempts, 0)
+        self.assertFalse(destination.scheduled)
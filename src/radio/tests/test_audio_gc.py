@@ -0,0 +1,134 @@
+import os
+import shutil
+import tempfile
+import time
+
+from datetime import timedelta
+
+from django.core.files.base import ContentFile
+from django.test import override_settings
+from django.utils import timezone
+
+from rest_framework.test import APITestCase
+
+from radio.models import (
+    AudioTombstone,
+    SystemACL,
+    SystemRecorder,
+    Transmission,
+    TalkGroup,
+    System
+)
+
+from radio.helpers.audio import (
+    _collect_audio_garbage,
+    _scan_orphan_audio,
+    get_audio_storage
+)
+
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class AudioGarbageCollectorTests(APITestCase):
+    """
+    Tests the tombstone based audio GC
+    """
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        acl: SystemACL = SystemACL.objects.create(name="Default", public=True)
+        self.system: System = System.objects.create(name="AudioGCSystem", systemACL=acl)
+        self.recorder: SystemRecorder = SystemRecorder.objects.create(
+            system=self.system, name="Recorder", site_id="1", enabled=True
+        )
+        self.talkgroup: TalkGroup = TalkGroup.objects.create(
+            system=self.system, decimal_id=1, alpha_tag="tg1"
+        )
+
+    def _transmission(self) -> Transmission:
+        return Transmission.objects.create(
+            system=self.system,
+            recorder=self.recorder,
+            talkgroup=self.talkgroup,
+            start_time=timezone.now(),
+            end_time=timezone.now(),
+            audio_file=ContentFile(b"Junk data", name="junk.m4a"),
+        )
+
+    def test_delete_tombstones_audio(self):
+        '''Test that deleting a transmission defers its audio to the GC'''
+        transmission = self._transmission()
+        path = transmission.audio_file.path
+
+        transmission.delete()
+
+        self.assertTrue(os.path.exists(path))
+        tombstone: AudioTombstone = AudioTombstone.objects.get(name=transmission.audio_file.name)
+        self.assertEqual(tombstone.system_UUID, self.system.UUID)
+
+        self.assertEqual(_collect_audio_garbage(), (1, 9))
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(os.path.exists(os.path.dirname(path)))
+        self.assertFalse(AudioTombstone.objects.exists())
+
+    def test_missing_files_are_cleared(self):
+        '''Test that tombstones of files already gone are cleared'''
+        AudioTombstone.objects.create(name="audio/1999/01/01/missing/missing.m4a")
+
+        self.assertEqual(_collect_audio_garbage(), (1, 0))
+        self.assertFalse(AudioTombstone.objects.exists())
+
+    def test_failed_removals_back_off(self):
+        '''Test that a failed removal is not retried until its backoff has passed'''
+        storage = get_audio_storage()
+        name = "audio/1999/01/02/stuck"
+        # Removing a directory as a file fails
+        os.makedirs(storage.path(name))
+        AudioTombstone.objects.create(name=name)
+
+        self.assertEqual(_collect_audio_garbage(), (0, 0))
+        self.assertEqual(_collect_audio_garbage(), (0, 0))
+        tombstone: AudioTombstone = AudioTombstone.objects.get(name=name)
+        self.assertEqual(tombstone.attempts, 1)
+        self.assertGreater(tombstone.next_attempt, timezone.now())
+
+        AudioTombstone.objects.filter(name=name).update(next_attempt=timezone.now())
+        _collect_audio_garbage()
+        self.assertEqual(AudioTombstone.objects.get(name=name).attempts, 2)
+
+        os.rmdir(storage.path(name))
+        _collect_audio_garbage()
+        self.assertEqual(AudioTombstone.objects.get(name=name).attempts, 2)
+        AudioTombstone.objects.filter(name=name).update(next_attempt=timezone.now())
+        self.assertEqual(_collect_audio_garbage(), (1, 0))
+        self.assertFalse(AudioTombstone.objects.exists())
+
+    def test_orphan_scan(self):
+        '''Test that only old files without a transmission are orphans'''
+        storage = get_audio_storage()
+        kept = self._transmission()
+        orphan = storage.save("audio/1999/01/01/AudioGCSystem_1_tg1/orphan.m4a", ContentFile(b"orphan"))
+        young = storage.save("audio/1999/01/01/AudioGCSystem_1_tg1/young.m4a", ContentFile(b"young"))
+
+        old = time.time() - timedelta(days=2).total_seconds()
+        os.utime(storage.path(orphan), (old, old))
+        os.utime(kept.audio_file.path, (old, old))
+
+        stats = _scan_orphan_audio(min_age_hours=24)
+        self.assertEqual(stats["orphans"], 1)
+        self.assertEqual(stats["orphan_bytes"], 6)
+        self.assertFalse(AudioTombstone.objects.exists())
+
+        _scan_orphan_audio(min_age_hours=24, tombstone=True)
+        self.assertEqual(list(AudioTombstone.objects.values_list("name", flat=True)), [orphan])
+
+        _collect_audio_garbage()
+        self.assertFalse(storage.exists(orphan))
+        self.assertTrue(storage.exists(young))
+        self.assertTrue(os.path.exists(kept.audio_file.path))
+        storage.delete(young)
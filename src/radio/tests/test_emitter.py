@@ -0,0 +1,110 @@
+import json
+
+import kombu
+
+from django.test import SimpleTestCase, override_settings
+
+from radio.helpers import emitter
+from radio.helpers.emitter import BroadcastCoalescer, SocketEmitter, broadcast, get_socket_emitter
+
+
+class FlakyCoalescer(BroadcastCoalescer):
+    def __init__(self, failures: int, **kwargs) -> None:
+        super().__init__(60, 100, **kwargs)
+        self.failures = failures
+        self.sent = []
+
+    def emit(self, event, room, payloads):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("broker is away")
+        self.sent.append((room, payloads))
+
+
+@override_settings(SOCKETS_BROKER_URL="memory://", SOCKET_COALESCE_WINDOW=0)
+class SocketEmitterTests(SimpleTestCase):
+    """
+    Tests the per-process socket.io emitter
+    """
+    def setUp(self):
+        emitter._emitter = None
+        emitter._coalescer = None
+        self.connection = kombu.Connection("memory://")
+        self.queue = self.connection.SimpleQueue(
+            kombu.Queue("emitter-test", kombu.Exchange("socketio", type="fanout", durable=False), durable=False)
+        )
+
+    def tearDown(self):
+        self.queue.close()
+        self.connection.release()
+        emitter._emitter = None
+        emitter._coalescer = None
+
+    def _received(self) -> list[dict]:
+        messages = []
+        while True:
+            try:
+                message = self.queue.get(block=False)
+            except self.queue.Empty:
+                return messages
+            message.ack()
+            payload = message.payload
+            messages.append(json.loads(payload) if isinstance(payload, (str, bytes)) else payload)
+
+    def test_emitter_is_reused(self):
+        '''Test that a process keeps one emitter and one producer across emits'''
+        broadcast("alert", "alert_1", {"title": "one"})
+        producer = get_socket_emitter()._producer
+        broadcast("alert", "alert_1", {"title": "two"})
+
+        self.assertIs(get_socket_emitter(), emitter._emitter)
+        self.assertIs(get_socket_emitter()._producer, producer)
+        self.assertEqual(
+            [(message["event"], message["room"], message["data"]) for message in self._received()],
+            [("alert", "alert_1", [{"title": "one"}]), ("alert", "alert_1", [{"title": "two"}])]
+        )
+
+    def test_emitter_reconnects(self):
+        '''Test that a dropped connection is replaced on the next emit'''
+        socket_emitter = SocketEmitter("memory://", health_check=0)
+        socket_emitter.emit("alert", {"title": "one"}, room="alert_1")
+        socket_emitter.publisher_connection.release()
+
+        socket_emitter.emit("alert", {"title": "two"}, room="alert_1")
+        self.assertTrue(socket_emitter.publisher_connection.connected)
+        self.assertEqual(len(self._received()), 2)
+
+    @override_settings(SOCKET_COALESCE_WINDOW=60, SOCKET_COALESCE_MAX_SIZE=3)
+    def test_coalesced_broadcasts(self):
+        '''Test that coalesced broadcasts go out as one list per room'''
+        for index in range(2):
+            broadcast("transmission_party_bus", "transmission_party_bus", {"uuid": str(index)}, coalesce=True)
+        self.assertEqual(self._received(), [])
+
+        broadcast("transmission_party_bus", "transmission_party_bus", {"uuid": "2"}, coalesce=True)
+        messages = self._received()
+        self.assertEqual(len(messages), 1)
+        self.assertEqual(messages[0]["data"], [[{"uuid": "0"}, {"uuid": "1"}, {"uuid": "2"}]])
+
+        broadcast("transmission_party_bus", "transmission_party_bus", {"uuid": "3"}, coalesce=True)
+        emitter.get_broadcast_coalescer().flush()
+        self.assertEqual(self._received()[0]["data"], [[{"uuid": "3"}]])
+
+    def test_coalesced_broadcasts_retried(self):
+        '''Test that a failed coalesced emit is retried with the next flush, then dropped'''
+        coalescer = FlakyCoalescer(1, max_attempts=2)
+        coalescer.add("transmission_party_bus", "transmission_party_bus", {"uuid": "0"})
+        coalescer.flush()
+        self.assertEqual(coalescer.sent, [])
+
+        coalescer.add("transmission_party_bus", "transmission_party_bus", {"uuid": "1"})
+        coalescer.flush()
+        self.assertEqual(coalescer.sent, [("transmission_party_bus", [{"uuid": "0"}, {"uuid": "1"}])])
+
+        coalescer = FlakyCoalescer(2, max_attempts=2)
+        coalescer.add("transmission_party_bus", "transmission_party_bus", {"uuid": "0"})
+        coalescer.flush()
+        coalescer.flush()
+        coalescer.flush()
+        self.assertEqual(coalescer.sent, [])
+        self.assertIsNone(coalescer._timer)
@@ -0,0 +1,204 @@
+import uuid
+
+from contextlib import contextmanager
+
+from django.core.files.base import ContentFile
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from rest_framework.test import APITestCase
+
+from radio.models import (
+    ScanList,
+    Scanner,
+    SystemACL,
+    SystemRecorder,
+    Transmission,
+    TalkGroup,
+    System,
+    SystemForwarder
+)
+
+import radio.tasks
+import mqtt.utils.publisher
+
+from users.models import CustomUser
+
+from radio.helpers.fanout import (
+    ForwarderSink,
+    MqttSink,
+    TransmissionSink,
+    fan_out_item,
+    get_transmission_sinks,
+    load_transmission_contexts,
+    _fan_out_transmissions
+)
+
+
+class RecordingSink(TransmissionSink):
+    name = "recording"
+    sent = []
+
+    def send(self, context):
+        RecordingSink.sent.append(str(context.transmission.UUID))
+
+
+class FailingSink(TransmissionSink):
+    name = "failing"
+    max_retries = 0
+
+    def send(self, context):
+        raise ConnectionError("Sink is down")
+
+
+class FlakyForwardTask:
+    """
+    Stands in for forward_transmission_to_remote_instance, failing for the down forwarders
+    """
+    def __init__(self, down: set) -> None:
+        self.down = down
+        self.sent = []
+
+    def delay(self, data, forwarder_name, recorder_key, remote_url):
+        if forwarder_name in self.down:
+            raise ConnectionError("Broker is down")
+        self.sent.append(forwarder_name)
+
+
+class FlakyPublisherPool:
+    """
+    Stands in for the MQTT publisher pool, failing one message and then the connection
+    """
+    def __init__(self) -> None:
+        self.sent = []
+
+    def publish_message(self, message):
+        if len(self.sent) == 1:
+            self.sent.append(None)
+            raise ConnectionError("Message not confirmed")
+        self.sent.append(message)
+
+    @contextmanager
+    def publisher(self):
+        yield self
+        raise ConnectionError("Connection dropped")
+
+
+class FanOutTests(APITestCase):
+    """
+    Tests the transmission fan-out
+    """
+    def setUp(self):
+        RecordingSink.sent = []
+        user: CustomUser = CustomUser.objects.create_user(email="fanout@trunkplayer.io", password="fanout-test")
+        acl: SystemACL = SystemACL.objects.create(name="Default", public=True)
+        self.system: System = System.objects.create(name="FanOutSystem", systemACL=acl)
+        self.recorder: SystemRecorder = SystemRecorder.objects.create(
+            system=self.system, name="Recorder", site_id="1", enabled=True
+        )
+        self.talkgroup: TalkGroup = TalkGroup.objects.create(
+            system=self.system, decimal_id=1, alpha_tag="tg1"
+        )
+        self.scanlist: ScanList = ScanList.objects.create(owner=user.userProfile, name="ScanList", public=True)
+        self.scanlist.talkgroups.add(self.talkgroup)
+        self.scanner: Scanner = Scanner.objects.create(owner=user.userProfile, name="Scanner", public=True)
+        self.scanner.scanlists.add(self.scanlist)
+
+    def _items(self, count: int) -> list[dict]:
+        items = []
+        for index in range(count):
+            transmission: Transmission = Transmission.objects.create(
+                system=self.system,
+                recorder=self.recorder,
+                talkgroup=self.talkgroup,
+                start_time=timezone.now(),
+                end_time=timezone.now(),
+                audio_file=ContentFile(b"Junk data", name=f"fanout{index}.m4a"),
+            )
+            items.append(fan_out_item(transmission, {"name": f"fanout{index}.json", "audio_file": "Junk"}))
+        return items
+
+    def test_fan_out_item(self):
+        '''Test that the fan-out item references the stored audio instead of carrying it'''
+        item = self._items(1)[0]
+        transmission: Transmission = Transmission.objects.get(UUID=item["UUID"])
+
+        self.assertNotIn("audio_file", item["forward"])
+        self.assertEqual(item["forward"]["audio_path"], transmission.audio_file.name)
+
+    def test_load_transmission_contexts(self):
+        '''Test that the fan-out context is loaded in the same number of queries for any batch size'''
+        item = self._items(1)
+        with CaptureQueriesContext(connection) as single:
+            load_transmission_contexts(item)
+
+        items = self._items(5)
+        with CaptureQueriesContext(connection) as batch:
+            contexts = load_transmission_contexts(items)
+
+        self.assertEqual(len(batch), len(single))
+        self.assertEqual(
+            [str(context.transmission.UUID) for context in contexts],
+            [item["UUID"] for item in items]
+        )
+        self.assertEqual(contexts[0].parents, [
+            {"uuid": [str(self.talkgroup.UUID)], "type": "talkgroup"},
+            {"uuid": [str(self.scanlist.UUID)], "type": "scanlist"},
+            {"uuid": [str(self.scanner.UUID)], "type": "scanner"},
+        ])
+
+    @override_settings(TRANSMISSION_FANOUT_SINKS=[
+        "radio.tests.test_fanout.FailingSink",
+        "radio.tests.test_fanout.RecordingSink",
+    ])
+    def test_sink_isolation(self):
+        '''Test that a failing sink does not stop the other sinks'''
+        items = self._items(2)
+        _fan_out_transmissions(items)
+
+        self.assertEqual(RecordingSink.sent, [item["UUID"] for item in items])
+
+        RecordingSink.sent = []
+        _fan_out_transmissions(items, ["failing"])
+        self.assertEqual(RecordingSink.sent, [])
+
+        self.assertEqual([sink.name for sink in get_transmission_sinks(["recording"])], ["recording"])
+
+    def test_forwarder_retries(self):
+        '''Test that a retry only goes to the forwarders that failed'''
+        for name in ("up", "down"):
+            forwarder: SystemForwarder = SystemForwarder.objects.create(
+                name=name, enabled=True, recorder_key=uuid.uuid4(), remote_url="null.trunkplayer.io"
+            )
+            forwarder.forwarded_systems.add(self.system)
+        contexts = load_transmission_contexts(self._items(2))
+
+        task = radio.tasks.forward_transmission_to_remote_instance
+        try:
+            radio.tasks.forward_transmission_to_remote_instance = FlakyForwardTask({"down"})
+            failed = ForwarderSink().send_many(contexts)
+            self.assertEqual(radio.tasks.forward_transmission_to_remote_instance.sent, ["up", "up"])
+            self.assertEqual([context.item["forwarders"] for context in failed], [["down"], ["down"]])
+
+            radio.tasks.forward_transmission_to_remote_instance = FlakyForwardTask(set())
+            self.assertEqual(ForwarderSink().send_many(failed), [])
+            self.assertEqual(radio.tasks.forward_transmission_to_remote_instance.sent, ["down", "down"])
+        finally:
+            radio.tasks.forward_transmission_to_remote_instance = task
+
+    def test_mqtt_retries(self):
+        '''Test that only the messages the broker did not take are retried'''
+        contexts = load_transmission_contexts(self._items(3))
+        pool = FlakyPublisherPool()
+
+        get_publishers = mqtt.utils.publisher.get_rabbitmq_publishers
+        try:
+            mqtt.utils.publisher.get_rabbitmq_publishers = lambda queue_name: pool
+            failed = MqttSink().send_many(contexts)
+        finally:
+            mqtt.utils.publisher.get_rabbitmq_publishers = get_publishers
+
+        self.assertEqual(len(pool.sent), 3)
+        self.assertEqual(failed, [contexts[1]])
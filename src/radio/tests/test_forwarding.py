@@ -0,0 +1,152 @@
+import gzip
+import json
+import threading
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from django.core.exceptions import RequestDataTooBig
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from radio.helpers.forwarding import ForwarderUnavailable, ForwardingClient
+from trunkplayer_ng.middleware import GZipRequestMiddleware
+
+
+class RemoteInstance(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        if self.headers.get("Content-Encoding") == "gzip":
+            body = gzip.decompress(body)
+        self.server.received.append((self.client_address[1], json.loads(body)))
+
+        status = 400 if self.path == "/reject" else 201
+        self.send_response(status)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"{}")
+
+
+class ForwardingClientTests(SimpleTestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), RemoteInstance)
+        self.server.received = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_connection_reused(self):
+        '''Test forwarded calls share one keep-alive connection'''
+        client = ForwardingClient("remote", self.url)
+        for index in range(5):
+            client.post("/api/radio/transmission/create", {"name": f"tx-{index}"})
+        client.close()
+
+        self.assertEqual([data["name"] for _, data in self.server.received], [f"tx-{index}" for index in range(5)])
+        self.assertEqual(len(set(port for port, _ in self.server.received)), 1)
+
+    def test_gzip_body(self):
+        '''Test bodies are gzipped when compression is enabled'''
+        client = ForwardingClient("remote", self.url, compress=True)
+        client.post("/api/radio/incident/forward", {"name": "incident", "recorder": "key"})
+        client.close()
+
+        self.assertEqual(self.server.received[0][1], {"name": "incident", "recorder": "key"})
+
+    def test_rejected_keeps_circuit_closed(self):
+        '''Test 4xx responses raise without opening the circuit'''
+        client = ForwardingClient("remote", self.url, breaker_threshold=1)
+        with self.assertRaises(requests.HTTPError):
+            client.post("/reject", {"name": "tx"})
+        client.close()
+
+        self.assertFalse(client.is_open)
+
+    def test_circuit_breaker(self):
+        '''Test an unreachable remote is paused after repeated failures'''
+        client = ForwardingClient(
+            "remote", "http://127.0.0.1:1", timeout=(1, 1), breaker_threshold=2, breaker_cooldown=60
+        )
+        for _ in range(2):
+            with self.assertRaises(requests.ConnectionError):
+                client.post("/api/radio/transmission/create", {"name": "tx"})
+
+        self.assertTrue(client.is_open)
+        with self.assertRaises(ForwarderUnavailable):
+            client.post("/api/radio/transmission/create", {"name": "tx"})
+
+    def test_circuit_half_open(self):
+        '''Test a trial call after the cooldown closes the circuit'''
+        client = ForwardingClient("remote", self.url, breaker_threshold=1, breaker_cooldown=0)
+        client.failures = 1
+        client.opened_at = 0.0
+
+        client.post("/api/radio/transmission/create", {"name": "tx"})
+        client.close()
+
+        self.assertFalse(client.is_open)
+        self.assertEqual(client.failures, 0)
+
+    def test_circuit_interrupted_trial(self):
+        '''Test a trial call killed mid request does not keep the circuit open'''
+        class Interrupted(BaseException):
+            pass
+
+        def interrupted(*args, **kwargs):
+            raise Interrupted()
+
+        client = ForwardingClient("remote", self.url, breaker_threshold=1, breaker_cooldown=0)
+        client.failures = 1
+        client.opened_at = 0.0
+        request = client.session.request
+        client.session.request = interrupted
+        with self.assertRaises(Interrupted):
+            client.post("/api/radio/transmission/create", {"name": "tx"})
+
+        client.session.request = request
+        client.post("/api/radio/transmission/create", {"name": "tx"})
+        client.close()
+
+        self.assertFalse(client.is_open)
+
+
+class GZipRequestMiddlewareTests(SimpleTestCase):
+    def setUp(self):
+        self.middleware = GZipRequestMiddleware(lambda request: HttpResponse(request.body))
+
+    def test_inflates_body(self):
+        '''Test gzip request bodies are inflated'''
+        body = json.dumps({"name": "tx"}).encode()
+        request = RequestFactory().post(
+            "/api/radio/transmission/create",
+            gzip.compress(body),
+            content_type="application/json",
+            HTTP_CONTENT_ENCODING="gzip",
+        )
+
+        response = self.middleware(request)
+
+        self.assertEqual(response.content, body)
+        self.assertEqual(request.META["CONTENT_LENGTH"], str(len(body)))
+
+    @override_settings(DATA_UPLOAD_MAX_MEMORY_SIZE=1024)
+    def test_inflated_size_limited(self):
+        '''Test inflated bodies are held to DATA_UPLOAD_MAX_MEMORY_SIZE'''
+        request = RequestFactory().post(
+            "/api/radio/transmission/create",
+            gzip.compress(b"0" * 4096),
+            content_type="application/json",
+            HTTP_CONTENT_ENCODING="gzip",
+        )
+
+        with self.assertRaises(RequestDataTooBig):
+            self.middleware(request)
@@ -0,0 +1,51 @@
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TransactionTestCase
+
+
+class DedupUnitsMigrationTests(TransactionTestCase):
+    """
+    Tests upgrading a database with duplicate units to the unique unit constraint
+    """
+    migrate_from = [("radio", "0002_transmission_has_tones_transmission_is_dispatch_and_more")]
+    migrate_to = [("radio", "0004_unit_unique_unit_per_system")]
+
+    def setUp(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.migrate_from)
+        apps = executor.loader.project_state(self.migrate_from).apps
+
+        SystemACL = apps.get_model("radio", "SystemACL")
+        System = apps.get_model("radio", "System")
+        Unit = apps.get_model("radio", "Unit")
+        UserProfile = apps.get_model("radio", "UserProfile")
+        UserAlert = apps.get_model("radio", "UserAlert")
+
+        acl = SystemACL.objects.create(name="Default", public=True)
+        self.system = System.objects.create(name="DedupSystem", systemACL=acl)
+        self.keeper = Unit.objects.create(system=self.system, decimal_id=5, description="Engine 5")
+        self.extra = Unit.objects.create(system=self.system, decimal_id=5)
+        profile = UserProfile.objects.create()
+        self.alert = UserAlert.objects.create(name="Engine", user=profile)
+        self.alert.units.add(self.extra)
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_duplicates_collapsed(self):
+        '''Test duplicate units are merged and the constraint is added in one upgrade'''
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.migrate_to)
+        apps = executor.loader.project_state(self.migrate_to).apps
+
+        Unit = apps.get_model("radio", "Unit")
+        UserAlert = apps.get_model("radio", "UserAlert")
+        self.assertEqual(
+            list(Unit.objects.filter(system_id=self.system.UUID).values_list("UUID", flat=True)),
+            [self.keeper.UUID]
+        )
+        self.assertEqual(
+            list(UserAlert.objects.get(UUID=self.alert.UUID).units.values_list("UUID", flat=True)),
+            [self.keeper.UUID]
+        )
@@ -0,0 +1,105 @@
+import json
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.test import override_settings
+from django.utils import timezone
+
+from rest_framework.test import APITestCase
+
+from radio.models import (
+    Agency,
+    City,
+    SystemACL,
+    SystemRecorder,
+    Transmission,
+    TalkGroup,
+    System
+)
+
+from radio.helpers.mqtt import build_transmission_mqtt_payload, talkgroup_agency_cache
+
+
+@override_settings(RESOLUTION_CACHE_VERSION_CHECK=0)
+class TransmissionMqttPayloadTests(APITestCase):
+    """
+    Tests the denormalized transmission message published to the MQTT bridge
+    """
+    def setUp(self):
+        cache.clear()
+        talkgroup_agency_cache.invalidate()
+        acl: SystemACL = SystemACL.objects.create(name="Default", public=True)
+        system: System = System.objects.create(name="MqttSystem", systemACL=acl)
+        recorder: SystemRecorder = SystemRecorder.objects.create(
+            system=system, name="Recorder", site_id="1", enabled=True
+        )
+        self.talkgroup: TalkGroup = TalkGroup.objects.create(system=system, decimal_id=1, alpha_tag="Fire")
+
+        self.city: City = City.objects.create(name="Springfield")
+        self.fire: Agency = Agency.objects.create(name="Fire Dept")
+        self.fire.city.add(self.city)
+        self.ems: Agency = Agency.objects.create(name="EMS")
+        self.talkgroup.agency.add(self.fire, self.ems)
+
+        self.transmission = Transmission.objects.create(
+            system=system,
+            recorder=recorder,
+            talkgroup=self.talkgroup,
+            start_time=timezone.now(),
+            end_time=timezone.now(),
+            audio_file=ContentFile(b"Junk data", name="mqtt.m4a"),
+        )
+
+    def tearDown(self):
+        cache.clear()
+
+    def _build(self) -> dict:
+        transmission = Transmission.objects.select_related("system", "recorder", "talkgroup").get(
+            UUID=self.transmission.UUID
+        )
+        data = {"UUID": str(transmission.UUID), "system": str(transmission.system_id)}
+        payload = build_transmission_mqtt_payload(transmission, data)
+        self.assertIsInstance(payload, bytes)
+        return json.loads(payload)
+
+    def test_payload(self):
+        '''Test the talkgroup is denormalized with its agencies and cities, without the transmission count'''
+        payload = self._build()
+
+        self.assertEqual(payload["system_name"], "MqttSystem")
+        self.assertEqual(payload["recorder"]["site_id"], "1")
+        self.assertEqual(payload["talkgroup"]["UUID"], str(self.talkgroup.UUID))
+        self.assertEqual(payload["talkgroup"]["alpha_tag"], "Fire")
+        self.assertNotIn("transmission_count", payload["talkgroup"])
+
+        agencies = {agency["name"]: agency for agency in payload["talkgroup"]["agency"]}
+        self.assertEqual(sorted(agencies), ["EMS", "Fire Dept"])
+        self.assertEqual(agencies["Fire Dept"]["UUID"], str(self.fire.UUID))
+        self.assertEqual([city["name"] for city in agencies["Fire Dept"]["city"]], ["Springfield"])
+        self.assertEqual(agencies["EMS"]["city"], [])
+
+    def test_payload_queries(self):
+        '''Test a message takes one query for the transmission and agencies are loaded once'''
+        transmission = Transmission.objects.select_related("system", "recorder", "talkgroup").get(
+            UUID=self.transmission.UUID
+        )
+        with self.assertNumQueries(1):
+            build_transmission_mqtt_payload(transmission, {})
+
+        with self.assertNumQueries(1):
+            transmission = Transmission.objects.select_related("system", "recorder", "talkgroup").get(
+                UUID=self.transmission.UUID
+            )
+            build_transmission_mqtt_payload(transmission, {})
+
+    def test_payload_invalidated(self):
+        '''Test agency and city changes reach the next message'''
+        self._build()
+
+        self.city.name = "Shelbyville"
+        self.city.save()
+        self.talkgroup.agency.remove(self.ems)
+
+        agencies = self._build()["talkgroup"]["agency"]
+        self.assertEqual([agency["name"] for agency in agencies], ["Fire Dept"])
+        self.assertEqual(agencies[0]["city"][0]["name"], "Shelbyville")
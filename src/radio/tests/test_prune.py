@@ -0,0 +1,195 @@
+import os
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.core.files.base import ContentFile
+from django.test import SimpleTestCase, override_settings
+from django.utils import timezone
+
+from rest_framework.test import APITestCase
+
+from radio.models import (
+    AudioTombstone,
+    Incident,
+    PruneCheckpoint,
+    SystemACL,
+    SystemRecorder,
+    Transmission,
+    TalkGroup,
+    System
+)
+
+from radio.helpers.cleanup import (
+    PruneBudget,
+    _get_prune_checkpoint,
+    month_windows,
+    _prune_transmission_chunk,
+    _prune_transmissions
+)
+from radio.helpers.audio import _collect_audio_garbage
+
+
+class MonthWindowTests(SimpleTestCase):
+    """
+    Tests the calendar month prune windows
+    """
+    def test_windows_cover_range(self):
+        '''Test that windows are contiguous and split on month boundaries'''
+        start = datetime(2025, 11, 15, 8, 30, tzinfo=dt_timezone.utc)
+        end = datetime(2026, 2, 3, tzinfo=dt_timezone.utc)
+        windows = month_windows(start, end)
+
+        self.assertEqual(windows[0][0], start)
+        self.assertEqual(windows[-1][1], end)
+        self.assertEqual(
+            [window_start.month for window_start, _ in windows],
+            [11, 12, 1, 2]
+        )
+        for (_, window_end), (next_start, _) in zip(windows, windows[1:]):
+            self.assertEqual(window_end, next_start)
+
+    def test_empty_range(self):
+        '''Test that an empty range has no windows'''
+        now = timezone.now()
+        self.assertEqual(month_windows(now, now), [])
+
+
+class PruneBudgetTests(SimpleTestCase):
+    """
+    Tests the prune rate limit and time budget
+    """
+    def test_rate_limit(self):
+        '''Test that spending rows sleeps to hold the rows per second limit'''
+        budget = PruneBudget(max_rows_per_second=1000)
+        start = time.monotonic()
+        budget.spend(100)
+        budget.spend(100)
+
+        self.assertGreaterEqual(time.monotonic() - start, 0.19)
+        self.assertFalse(budget.exhausted)
+
+    def test_time_budget(self):
+        '''Test that the budget runs out after the run seconds'''
+        self.assertFalse(PruneBudget().exhausted)
+
+        budget = PruneBudget(run_seconds=1)
+        budget.deadline = time.monotonic() - 1
+        self.assertTrue(budget.exhausted)
+
+
+class PruneTransmissionTests(APITestCase):
+    """
+    Tests the chunked transmission pruning
+    """
+    def setUp(self):
+        acl: SystemACL = SystemACL.objects.create(name="Default", public=True)
+        self.system: System = System.objects.create(
+            name="PruneSystem1",
+            systemACL=acl,
+            prune_transmissions=True,
+            prune_transmissions_after_days=30,
+        )
+        self.kept_system: System = System.objects.create(name="PruneSystem2", systemACL=acl)
+        self.recorder: SystemRecorder = SystemRecorder.objects.create(
+            system=self.system, name="Recorder", site_id="1", enabled=True
+        )
+        self.talkgroup: TalkGroup = TalkGroup.objects.create(
+            system=self.system, decimal_id=1, alpha_tag="tg1"
+        )
+
+    def _transmission(self, talkgroup: TalkGroup, age_days: int, locked: bool = False) -> Transmission:
+        start_time = timezone.now() - timedelta(days=age_days)
+        return Transmission.objects.create(
+            system=talkgroup.system,
+            recorder=self.recorder,
+            talkgroup=talkgroup,
+            start_time=start_time,
+            end_time=start_time,
+            locked=locked,
+            audio_file=ContentFile(b"Junk data", name=f"{age_days}.m4a"),
+        )
+
+    def test_prune_transmissions(self):
+        '''Test that only expired transmissions of pruning systems are removed'''
+        fresh_talkgroup: TalkGroup = TalkGroup.objects.create(
+            system=self.system, decimal_id=2, alpha_tag="tg2"
+        )
+        other_talkgroup: TalkGroup = TalkGroup.objects.create(
+            system=self.kept_system, decimal_id=1, alpha_tag="tg1"
+        )
+
+        old = [self._transmission(self.talkgroup, age) for age in (45, 90, 400)]
+        fresh = self._transmission(fresh_talkgroup, 1)
+        other = self._transmission(other_talkgroup, 400)
+        locked = self._transmission(fresh_talkgroup, 400, locked=True)
+
+        incident: Incident = Incident.objects.create(system=self.system, name="Incident")
+        incident.transmission.add(old[0], fresh)
+
+        _prune_transmissions()
+
+        self.assertFalse(Transmission.objects.filter(UUID__in=[tx.UUID for tx in old]).exists())
+        self.assertTrue(Transmission.objects.filter(UUID=fresh.UUID).exists())
+        self.assertTrue(Transmission.objects.filter(UUID=other.UUID).exists())
+        self.assertTrue(Transmission.objects.filter(UUID=locked.UUID).exists())
+        self.assertEqual(list(incident.transmission.all()), [fresh])
+
+        checkpoint: PruneCheckpoint = PruneCheckpoint.objects.get(system=self.system)
+        self.assertIsNotNone(checkpoint.finished)
+        self.assertEqual(checkpoint.rows_deleted, 3)
+
+        self.assertEqual(
+            set(AudioTombstone.objects.values_list("name", flat=True)),
+            set(tx.audio_file.name for tx in old)
+        )
+        self.assertEqual(_collect_audio_garbage(), (3, 27))
+        self.assertFalse(AudioTombstone.objects.exists())
+        checkpoint.refresh_from_db()
+        self.assertEqual(checkpoint.bytes_reclaimed, 27)
+        for transmission in old:
+            self.assertFalse(os.path.exists(transmission.audio_file.path))
+            self.assertFalse(os.path.exists(os.path.dirname(transmission.audio_file.path)))
+        self.assertTrue(os.path.exists(fresh.audio_file.path))
+
+    @override_settings(PRUNE_BATCH_SIZE=2)
+    def test_prune_resumes_from_checkpoint(self):
+        '''Test that a pass interrupted after one chunk resumes oldest first'''
+        # The first two share a month window
+        old = [self._transmission(self.talkgroup, age) for age in (400, 400, 200, 100, 50)]
+
+        checkpoint = _get_prune_checkpoint(self.system)
+        self.assertEqual(_prune_transmission_chunk(checkpoint.UUID, 2)[0], 2)
+        self.assertEqual(
+            set(Transmission.objects.filter(system=self.system).values_list("UUID", flat=True)),
+            set(tx.UUID for tx in old[2:])
+        )
+
+        checkpoint.refresh_from_db()
+        self.assertEqual(checkpoint.last_UUID, old[1].UUID)
+        self.assertIsNone(checkpoint.finished)
+
+        _prune_transmissions()
+
+        checkpoint.refresh_from_db()
+        self.assertFalse(Transmission.objects.filter(system=self.system).exists())
+        self.assertEqual(checkpoint.rows_deleted, 5)
+        self.assertIsNotNone(checkpoint.finished)
+        _collect_audio_garbage()
+
+    def test_chunks_stay_in_month_windows(self):
+        '''Test that a chunk never crosses a month window and empty windows move the checkpoint on'''
+        old = [self._transmission(self.talkgroup, age) for age in (400, 300)]
+        checkpoint = _get_prune_checkpoint(self.system)
+
+        self.assertEqual(_prune_transmission_chunk(checkpoint.UUID, 10), (1, False))
+        self.assertTrue(Transmission.objects.filter(UUID=old[1].UUID).exists())
+
+        self.assertEqual(_prune_transmission_chunk(checkpoint.UUID, 10), (0, False))
+        checkpoint.refresh_from_db()
+        self.assertEqual(checkpoint.last_start_time, old[1].start_time)
+        self.assertIsNone(checkpoint.last_UUID)
+
+        self.assertEqual(_prune_transmission_chunk(checkpoint.UUID, 10), (1, False))
+        self.assertEqual(_prune_transmission_chunk(checkpoint.UUID, 10), (0, True))
+        self.assertFalse(Transmission.objects.filter(system=self.system).exists())
+        _collect_audio_garbage()
@@ -0,0 +1,147 @@
+import os
+import unittest
+import uuid
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework.test import APIRequestFactory, APITestCase
+from rest_framework.test import force_authenticate
+from rest_framework import status
+
+from users.models import CustomUser
+from radio.models import (
+    SystemACL,
+    SystemRecorder,
+    TalkGroupACL,
+    Transmission,
+    TalkGroup,
+    System
+)
+
+from radio.helpers.access import filter_transmissions_for_user
+from radio.views.api.transmission import List
+
+
+TRANSMISSION_COUNT = int(os.getenv("TPNG_SCALE_TRANSMISSIONS", "1000000"))
+
+
+@unittest.skipUnless(
+    os.getenv("TPNG_LARGE_TESTS", "False").lower() in ("t", "1", "true", "yes"),
+    "Set TPNG_LARGE_TESTS=true to run the 1M transmission EXPLAIN tests"
+)
+class TransmissionAccessScaleTests(APITestCase):
+    """
+    EXPLAIN based regression tests for the ACL filtered transmission listing
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.user: CustomUser = CustomUser.objects.create_user(email='scale@trunkplayer.io', password=str(uuid.uuid4()))
+        cls.user.userProfile.site_admin = False
+        cls.user.userProfile.save()
+
+        public_acl = SystemACL.objects.create(name="Public", public=True)
+        member_acl = SystemACL.objects.create(name="Member", public=False)
+        hidden_acl = SystemACL.objects.create(name="Hidden", public=False)
+        member_acl.users.add(cls.user.userProfile)
+
+        systems = [
+            System.objects.create(name="Open", systemACL=public_acl, enable_talkgroup_acls=False),
+            System.objects.create(name="ACL", systemACL=member_acl, enable_talkgroup_acls=True),
+            System.objects.create(name="Hidden", systemACL=hidden_acl, enable_talkgroup_acls=False),
+        ]
+
+        talkgroup_acl = TalkGroupACL.objects.create(
+            name="Scale", default_new_talkgroups=False, default_new_users=False
+        )
+        talkgroup_acl.users.add(cls.user.userProfile)
+
+        talkgroups = []
+        recorders = []
+        for system in systems:
+            recorder = SystemRecorder.objects.create(system=system, name="Scale", site_id="1", enabled=True)
+            for decimal_id in range(1, 51):
+                talkgroup = TalkGroup.objects.create(system=system, decimal_id=decimal_id, alpha_tag=f"TG {decimal_id}")
+                talkgroups.append(talkgroup)
+                recorders.append(recorder)
+                if system.enable_talkgroup_acls and decimal_id <= 5:
+                    talkgroup_acl.allowed_talkgroups.add(talkgroup)
+
+        cls.talkgroup = talkgroups[0]
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                INSERT INTO radio_transmission (
+                    "UUID", system_id, recorder_id, talkgroup_id, audio_type, start_time, end_time,
+                    audio_file, encrypted, emergency, units, frequencys, frequency, length,
+                    has_tones, is_dispatch, tones_meta, locked
+                )
+                SELECT
+                    gen_random_uuid(),
+                    (%(systems)s::uuid[])[1 + g %% %(size)s],
+                    (%(recorders)s::uuid[])[1 + g %% %(size)s],
+                    (%(talkgroups)s::uuid[])[1 + g %% %(size)s],
+                    'digital',
+                    now() - g * interval '1 second',
+                    now() - g * interval '1 second' + interval '5 seconds',
+                    'audio/scale.m4a', false, false, '[]', '[]', 0, 5,
+                    false, false, '{}', false
+                FROM generate_series(1, %(count)s) AS g
+                """,
+                {
+                    "systems": [str(talkgroup.system_id) for talkgroup in talkgroups],
+                    "recorders": [str(recorder.UUID) for recorder in recorders],
+                    "talkgroups": [str(talkgroup.UUID) for talkgroup in talkgroups],
+                    "size": len(talkgroups),
+                    "count": TRANSMISSION_COUNT,
+                }
+            )
+            cursor.execute("ANALYZE radio_transmission")
+
+    def setUp(self):
+        self.factory = APIRequestFactory()
+
+    def test_list_query_count_is_bounded(self):
+        '''Test that the ACL filtered list runs a fixed number of queries'''
+        view = List.as_view()
+        endpoint = reverse('transmission_list')
+
+        for limit in (10, 100):
+            request = self.factory.get(endpoint, {"limit": limit})
+            force_authenticate(request, user=self.user)
+            with CaptureQueriesContext(connection) as queries:
+                response = view(request)
+                response.render()
+
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertLessEqual(len(queries.captured_queries), 6)
+
+    def test_list_uses_feed_index(self):
+        '''Test that the ACL filtered feed walks the start_time index instead of a seq scan'''
+        queryset = filter_transmissions_for_user(Transmission.objects.all(), self.user.userProfile)
+        plan = queryset.order_by("-start_time")[:100].explain()
+
+        self.assertIn("radio_tx_feed_idx", plan)
+        self.assertNotIn("Seq Scan on radio_transmission", plan)
+
+    def test_talkgroup_list_uses_index(self):
+        '''Test that the talkgroup feed uses an index'''
+        queryset = filter_transmissions_for_user(
+            Transmission.objects.filter(talkgroup=self.talkgroup), self.user.userProfile
+        )
+        plan = queryset.order_by("-start_time")[:100].explain()
+
+        self.assertNotIn("Seq Scan on radio_transmission", plan)
+
+    def test_acl_filter_matches_access(self):
+        '''Test that the predicate only returns readable transmissions'''
+        queryset = filter_transmissions_for_user(Transmission.objects.all(), self.user.userProfile)
+        systems = set(queryset.values_list("system__name", flat=True).distinct())
+        acl_talkgroups = set(
+            queryset.filter(system__name="ACL").values_list("talkgroup__decimal_id", flat=True).distinct()
+        )
+
+        self.assertEqual(systems, {"Open", "ACL"})
+        self.assertEqual(acl_talkgroups, {1, 2, 3, 4, 5})
@@ -0,0 +1,66 @@
+import uuid
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from rest_framework.test import APITestCase
+
+from radio.models import (
+    SystemACL,
+    SystemRecorder,
+    Transmission,
+    TalkGroup,
+    System
+)
+
+from radio.helpers.cache import get_transmission_payloads
+
+
+class TransmissionPayloadCacheTests(APITestCase):
+    """
+    Tests the shared serialized transmission cache behind the socket tx requests
+    """
+    def setUp(self):
+        cache.clear()
+        acl: SystemACL = SystemACL.objects.create(name="Default", public=True)
+        system: System = System.objects.create(name="PayloadSystem", systemACL=acl)
+        recorder: SystemRecorder = SystemRecorder.objects.create(
+            system=system, name="Recorder", site_id="1", enabled=True
+        )
+        self.talkgroup: TalkGroup = TalkGroup.objects.create(system=system, decimal_id=1, alpha_tag="tg1")
+        self.transmissions = [
+            Transmission.objects.create(
+                system=system,
+                recorder=recorder,
+                talkgroup=self.talkgroup,
+                start_time=timezone.now(),
+                end_time=timezone.now(),
+                audio_file=ContentFile(b"Junk data", name=f"payload{index}.m4a"),
+            )
+            for index in range(3)
+        ]
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_transmission_payloads(self):
+        '''Test that payloads are loaded once in a batch and then served from the cache'''
+        transmission_uuids = [str(transmission.UUID) for transmission in self.transmissions]
+        missing = str(uuid.uuid4())
+
+        with CaptureQueriesContext(connection) as loading:
+            payloads = get_transmission_payloads(transmission_uuids[:1])
+        self.assertEqual(payloads[transmission_uuids[0]]["talkgroup"], str(self.talkgroup.UUID))
+        self.assertEqual(payloads[transmission_uuids[0]]["data"]["UUID"], transmission_uuids[0])
+
+        with CaptureQueriesContext(connection) as batch:
+            payloads = get_transmission_payloads(transmission_uuids + [missing])
+        self.assertEqual(len(batch), len(loading))
+        self.assertEqual(sorted(payloads), sorted(transmission_uuids))
+
+        with self.assertNumQueries(0):
+            payloads = get_transmission_payloads(transmission_uuids)
+        self.assertEqual(sorted(payloads), sorted(transmission_uuids))
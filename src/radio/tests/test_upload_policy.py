@@ -0,0 +1,117 @@
+import uuid
+
+from django.test import SimpleTestCase
+
+from rest_framework.test import APITestCase
+
+from radio.models import (
+    SystemACL,
+    SystemRecorder,
+    TalkGroup,
+    System
+)
+
+from radio.helpers.policy import (
+    UploadPolicy,
+    get_upload_policy
+)
+
+from radio.helpers.utils import validate_upload
+
+
+class UploadPolicyTruthTableTests(SimpleTestCase):
+    """
+    Tests the compiled recorder upload policy
+    """
+    def test_no_lists(self):
+        '''Test that everything is allowed without allow/deny lists'''
+        policy = UploadPolicy()
+
+        self.assertTrue(policy.allows(1))
+        self.assertTrue(policy.allows("2"))
+
+    def test_allowed_only(self):
+        '''Test that only allowed talkgroups pass an allow list'''
+        policy = UploadPolicy(allowed={1, 2})
+
+        self.assertTrue(policy.allows(1))
+        self.assertTrue(policy.allows("2"))
+        self.assertFalse(policy.allows(3))
+
+    def test_denied_only(self):
+        '''Test that everything but denied talkgroups pass a deny list'''
+        policy = UploadPolicy(denied={1})
+
+        self.assertFalse(policy.allows(1))
+        self.assertFalse(policy.allows("1"))
+        self.assertTrue(policy.allows(3))
+
+    def test_allowed_and_denied(self):
+        '''Test that deny wins and the allow list still applies when both are set'''
+        policy = UploadPolicy(allowed={1, 2}, denied={2, 3})
+
+        self.assertTrue(policy.allows(1))
+        self.assertFalse(policy.allows(2))
+        self.assertFalse(policy.allows(3))
+        self.assertFalse(policy.allows(4))
+
+
+class UploadPolicyRecorderTests(APITestCase):
+    """
+    Tests compiling and rebuilding recorder upload policies
+    """
+    def setUp(self):
+        self.system_acl: SystemACL = SystemACL.objects.create(
+            name="Default",
+            public=True
+        )
+
+        self.system: System = System.objects.create(
+            name="System1",
+            systemACL=self.system_acl,
+            rr_system_id="555",
+            enable_talkgroup_acls=True,
+            prune_transmissions=False,
+            notes=""
+        )
+
+        self.tg1: TalkGroup = TalkGroup.objects.create(
+            system=self.system,
+            decimal_id=1,
+            alpha_tag="tg1",
+            description="Talk group 1",
+        )
+        self.tg2: TalkGroup = TalkGroup.objects.create(
+            system=self.system,
+            decimal_id=2,
+            alpha_tag="tg2",
+            description="Talk group 2",
+        )
+
+        self.recorder: SystemRecorder = SystemRecorder.objects.create(
+            system=self.system,
+            name="Site 1",
+            site_id="1",
+            enabled=True,
+            api_key=uuid.uuid4()
+        )
+
+    def test_policy_rebuilt_on_m2m_change(self):
+        '''Test that policies are cached and rebuilt when the lists change'''
+        self.assertTrue(validate_upload(1, self.recorder))
+        self.assertTrue(validate_upload(2, self.recorder))
+
+        with self.assertNumQueries(0):
+            get_upload_policy(self.recorder)
+
+        self.recorder.talkgroups_allowed.add(self.tg1)
+        self.assertTrue(validate_upload(1, self.recorder))
+        self.assertFalse(validate_upload(2, self.recorder))
+
+        self.recorder.talkgroups_denyed.add(self.tg1)
+        self.assertFalse(validate_upload(1, self.recorder))
+
+        self.recorder.talkgroups_allowed.clear()
+        self.recorder.talkgroups_denyed.remove(self.tg1)
+        self.assertTrue(validate_upload(1, self.recorder))
+        self.assertTrue(validate_upload(2, self.recorder))
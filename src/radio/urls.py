@@ -134,6 +134,16 @@ urlpatterns = [
         transmission.Create.as_view(),
         name="transmission_create",
     ),
+    path(
+        "transmission/create/stream",
+        transmission.StreamCreate.as_view(),
+        name="transmission_create_stream",
+    ),
+    path(
+        "transmission/create/batch",
+        transmission.BatchCreate.as_view(),
+        name="transmission_create_batch",
+    ),
     path(
         "transmission/<uuid:request_uuid>",
         transmission.View.as_view(),
@@ -30,9 +30,17 @@ from radio.serializers import (
     ScanListSerializer
 )
 
+from radio.helpers.access import (
+    filter_transmissions_for_user
+)
+
 from radio.helpers.utils import (
-    get_user_allowed_systems,
-    get_user_allowed_talkgroups,
+    prime_transmission_counts,
+    with_transmission_list_relations
+)
+
+from radio.pagination import (
+    TransmissionPagination
 )
 
 from radio.permission import (
@@ -283,7 +291,7 @@ class TransmissionList(APIView, PaginationMixin):
     queryset = Transmission.objects.all()
     serializer_class = TransmissionListSerializer
     permission_classes = [IsSAOrReadOnly]
-    pagination_class = api_settings.DEFAULT_PAGINATION_CLASS
+    pagination_class = TransmissionPagination
     filter_backends = (filters.DjangoFilterBackend,)
     filterset_class = TransmissionFilter
 
@@ -304,27 +312,14 @@ class TransmissionList(APIView, PaginationMixin):
         user: UserProfile = request.user.userProfile
         scanlist: ScanList = self.get_object(request_uuid)
 
-        talkgroups = scanlist.talkgroups.all()
-        transmissions = Transmission.objects.filter(talkgroup__in=talkgroups)
-        allowed_transmissions = []
-
-        if user.site_admin:
-            allowed_transmissions = transmissions
-        else:
-            # pylint: disable=unused-variable
-            system_uuids, systems = get_user_allowed_systems(user.UUID)
-            del system_uuids
-            for system in systems:
-                if system.enable_talkgroup_acls:
-                    talkgroups_allowed = get_user_allowed_talkgroups(system, user.UUID)
-                    allowed_transmissions.extend(
-                        transmissions.filter(system=system, talkgroup__in=talkgroups_allowed)
-                    )
-                else:
-                    allowed_transmissions.extend(transmissions.filter(system=system))
+        transmissions = Transmission.objects.filter(
+            talkgroup__in=scanlist.talkgroups.values("UUID")
+        )
+        allowed_transmissions = filter_transmissions_for_user(transmissions, user)
 
         transmissions_fs = TransmissionFilter(self.request.GET, queryset=allowed_transmissions)
-        page = self.paginate_queryset(transmissions_fs.qs)
+        page = self.paginate_queryset(with_transmission_list_relations(transmissions_fs.qs))
         if page is not None:
+            prime_transmission_counts(page)
             serializer = TransmissionListSerializer(page, many=True)
             return self.get_paginated_response(serializer.data)
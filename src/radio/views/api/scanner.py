@@ -29,9 +29,17 @@ from radio.serializers import (
     ScannerSerializer
 )
 
+from radio.helpers.access import (
+    filter_transmissions_for_user
+)
+
 from radio.helpers.utils import (
-    get_user_allowed_systems,
-    get_user_allowed_talkgroups,
+    prime_transmission_counts,
+    with_transmission_list_relations
+)
+
+from radio.pagination import (
+    TransmissionPagination
 )
 
 from radio.permission import (
@@ -41,7 +49,6 @@ from radio.permission import (
 
 from radio.models import (
     UserProfile,
-    System,
     TalkGroup,
     Transmission,
     Scanner,
@@ -230,7 +237,7 @@ class TransmissionList(APIView, PaginationMixin):
     queryset = Transmission.objects.all()
     serializer_class = TransmissionListSerializer
     permission_classes = [IsSAOrReadOnly]
-    pagination_class = api_settings.DEFAULT_PAGINATION_CLASS
+    pagination_class = TransmissionPagination
     filter_backends = (filters.DjangoFilterBackend,)
     filterset_class = TransmissionFilter
 
@@ -250,48 +257,14 @@ class TransmissionList(APIView, PaginationMixin):
         """
         user: UserProfile = request.user.userProfile
         scanner: Scanner = self.get_object(request_uuid)
-        # pylint: disable=unused-variable
-        system_uuids, systems = get_user_allowed_systems(user.UUID)
-
-        allowed_transmisssions = []
-        scanlist_talkgroups = []
-        transmissions = []
-
-        scanlist_talkgroups = scanner.scanlists.all().values_list(
-            "talkgroups", flat=True
+        transmissions = Transmission.objects.filter(
+            talkgroup__in=TalkGroup.objects.filter(scanlist__scanner=scanner).values("UUID")
         )
-        scanlist_talkgroups = list(dict.fromkeys(scanlist_talkgroups))
-        transmissions = Transmission.objects.filter(talkgroup__in=scanlist_talkgroups)
-
-        if not user.site_admin:
-            acl_systems = transmissions.filter(
-                system__enable_talkgroup_acls=True, system__in=systems
-            ).values_list("system", flat=True)
-            non_acl_systems = transmissions.filter(
-                system__enable_talkgroup_acls=False, system__in=systems
-            ).values_list("system", flat=True)
-
-            non_acl_systems = list(dict.fromkeys(non_acl_systems))
-            acl_systems = list(dict.fromkeys(acl_systems))
-
-            talkgroups_allowed = []
-            talkgroups_allowed.extend(
-                TalkGroup.objects.filter(system__UUID__in=non_acl_systems)
-            )
-
-            for system in acl_systems:
-                system_object = System.objects.get(UUID=system)
-                user_allowed_talkgroups = get_user_allowed_talkgroups(
-                    system_object, user.UUID
-                )
-                talkgroups_allowed.extend(user_allowed_talkgroups)
-
-            allowed_transmisssions = transmissions.filter(talkgroup__in=talkgroups_allowed)
-        else:
-            allowed_transmisssions = transmissions
+        allowed_transmisssions = filter_transmissions_for_user(transmissions, user)
 
         filterobject_fs = TransmissionFilter(self.request.GET, queryset=allowed_transmisssions)
-        page = self.paginate_queryset(filterobject_fs.qs)
+        page = self.paginate_queryset(with_transmission_list_relations(filterobject_fs.qs))
         if page is not None:
+            prime_transmission_counts(page)
             serializer = TransmissionListSerializer(page, many=True)
             return self.get_paginated_response(serializer.data)
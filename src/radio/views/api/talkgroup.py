@@ -27,10 +27,21 @@ from radio.serializers import (
     TransmissionListSerializer
 )
 
+from radio.helpers.access import (
+    filter_transmissions_for_user,
+    get_user_access
+)
+
 from radio.helpers.utils import (
     get_user_allowed_talkgroups_for_systems,
     get_user_allowed_systems,
     get_user_allowed_talkgroups,
+    prime_transmission_counts,
+    with_transmission_list_relations,
+)
+
+from radio.pagination import (
+    TransmissionPagination
 )
 
 from radio.permission import (
@@ -243,7 +254,7 @@ class TransmissionList(APIView, PaginationMixin):
     queryset = Transmission.objects.all()
     serializer_class = TransmissionListSerializer
     permission_classes = [IsSAOrReadOnly]
-    pagination_class = api_settings.DEFAULT_PAGINATION_CLASS
+    pagination_class = TransmissionPagination
     filter_backends = (filters.DjangoFilterBackend,)
     filterset_class = TransmissionFilter
 
@@ -264,21 +275,15 @@ class TransmissionList(APIView, PaginationMixin):
         user: UserProfile = request.user.userProfile
         talkgroup: TalkGroup = self.get_object(request_uuid)
 
-        transmissions = Transmission.objects.filter(talkgroup=talkgroup)
-
-        if not user.site_admin:
-            system: System = talkgroup.system
-            # pylint: disable=unused-variable
-            system_uuids, systems = get_user_allowed_systems(user.UUID)
-            talkgroups_allowed = get_user_allowed_talkgroups(system, user.UUID)
-
-            if not system in systems:
-                raise PermissionDenied
+        if not user.site_admin and not get_user_access(user.UUID).can_read(talkgroup.UUID):
+            raise PermissionDenied
 
-            if not talkgroup in talkgroups_allowed:
-                raise PermissionDenied
+        transmissions = filter_transmissions_for_user(
+            Transmission.objects.filter(talkgroup=talkgroup), user
+        )
         transmissions_fs = TransmissionFilter(self.request.GET, queryset=transmissions)
-        page = self.paginate_queryset(transmissions_fs.qs)
+        page = self.paginate_queryset(with_transmission_list_relations(transmissions_fs.qs))
         if page is not None:
+            prime_transmission_counts(page)
             serializer = TransmissionListSerializer(page, many=True)
             return self.get_paginated_response(serializer.data)
@@ -1,16 +1,17 @@
 # import logging
+import json
 import logging
 import uuid
 
 from django.conf import settings
 from django.http import Http404
-from django.core.exceptions import PermissionDenied
+from django.core.exceptions import PermissionDenied, ValidationError
 
 
 from rest_framework.settings import api_settings
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework.parsers import JSONParser
+from rest_framework.parsers import JSONParser, MultiPartParser
 from rest_framework import status
 
 from django_filters import rest_framework as filters
@@ -30,9 +31,26 @@ from radio.serializers import (
     TransmissionSerializer
 )
 
+from radio.helpers.access import (
+    filter_transmissions_for_user,
+    get_user_access
+)
+
+from radio.helpers.cache import (
+    get_recorder
+)
+
 from radio.helpers.utils import (
-    get_user_allowed_systems,
-    get_user_allowed_talkgroups,
+    prime_transmission_counts,
+    with_transmission_list_relations
+)
+
+from radio.parsers import (
+    RawAudioParser
+)
+
+from radio.pagination import (
+    TransmissionPagination
 )
 
 from radio.permission import (
@@ -42,7 +60,6 @@ from radio.permission import (
 
 from radio.models import (
     UserProfile,
-    System,
     SystemRecorder,
     Transmission
 )
@@ -60,7 +77,7 @@ class List(APIView, PaginationMixin):
     queryset = Transmission.objects.all()
     serializer_class = TransmissionListSerializer
     permission_classes = [IsSAOrReadOnly]
-    pagination_class = api_settings.DEFAULT_PAGINATION_CLASS
+    pagination_class = TransmissionPagination
     filter_backends = (filters.DjangoFilterBackend,)
     filterset_class = TransmissionFilter
 
@@ -71,29 +88,12 @@ class List(APIView, PaginationMixin):
         """
         user: UserProfile = request.user.userProfile
 
-        if user.site_admin:
-            allowed_transmissions = Transmission.objects.all()
-        else:
-            # pylint: disable=unused-variable
-            system_uuids, systems = get_user_allowed_systems(user.UUID)
-            del system_uuids
-            allowed_transmissions_non_acl = Transmission.objects.none()
-            allowed_transmissions_acl = Transmission.objects.none()
-
-            for system in systems:
-                system: System
-                if system.enable_talkgroup_acls:
-                    talkgroups_allowed = get_user_allowed_talkgroups(system, user.UUID)
-                    allowed_transmissions_acl = allowed_transmissions_acl | Transmission.objects.filter(
-                            system=system, talkgroup__in=talkgroups_allowed
-                        )
-                else:
-                    allowed_transmissions_non_acl = allowed_transmissions_non_acl | Transmission.objects.filter(system=system)
-            allowed_transmissions = allowed_transmissions_acl | allowed_transmissions_non_acl 
+        allowed_transmissions = filter_transmissions_for_user(Transmission.objects.all(), user)
 
         filterobject_fs = TransmissionFilter(self.request.GET, queryset=allowed_transmissions)
-        page = self.paginate_queryset(filterobject_fs.qs)
+        page = self.paginate_queryset(with_transmission_list_relations(filterobject_fs.qs))
         if page is not None:
+            prime_transmission_counts(page)
             serializer = TransmissionListSerializer(page, many=True)
             return self.get_paginated_response(serializer.data)
 
@@ -153,9 +153,7 @@ class Create(APIView):
         data = JSONParser().parse(request)
  
         try:
-            recorder: SystemRecorder = SystemRecorder.objects.get(
-                api_key=data["recorder"]
-            )
+            recorder: SystemRecorder = get_recorder(data["recorder"])
 
             tg_id = data["json"]["talkgroup"]
             if not validate_upload(tg_id, recorder):
@@ -188,6 +186,221 @@ class Create(APIView):
             return Response(str(error), status=status.HTTP_400_BAD_REQUEST)
 
 
+class StreamCreate(APIView):
+    queryset = Transmission.objects.all()
+    serializer_class = TransmissionSerializer
+    permission_classes = [FeederFree]
+    parser_classes = [MultiPartParser, RawAudioParser]
+
+    @swagger_auto_schema(
+        tags=["Transmission"],
+        manual_parameters=[
+            openapi.Parameter(
+                "recorder", openapi.IN_FORM, type=openapi.TYPE_STRING, required=True, description="Recorder Key"
+            ),
+            openapi.Parameter(
+                "json", openapi.IN_FORM, type=openapi.TYPE_STRING, required=True, description="Trunk-Recorder JSON"
+            ),
+            openapi.Parameter(
+                "audio_file", openapi.IN_FORM, type=openapi.TYPE_FILE, required=True, description="M4A Audio"
+            ),
+            openapi.Parameter(
+                "tones", openapi.IN_FORM, type=openapi.TYPE_STRING, description="Tones Info JSON"
+            ),
+            openapi.Parameter(
+                "name", openapi.IN_FORM, type=openapi.TYPE_STRING, description="Audio File Name"
+            ),
+        ],
+    )
+    def post(self, request):
+        """
+        Transmission Streaming Create EP
+
+        Accepts multipart/form-data or a raw audio body (metadata in the X-TPNG-* headers),
+        streams the audio to storage and only queues the metadata for ingest
+        """
+        from radio.tasks import new_stored_transmission_handler
+        from radio.helpers.utils import validate_upload
+        from radio.helpers.transmission import _store_transmission_audio
+
+        try:
+            audio = request.FILES.get("audio_file") or request.data.get("audio_file")
+            jsonx = request.data.get("json")
+            tones = request.data.get("tones")
+            if isinstance(jsonx, str):
+                jsonx = json.loads(jsonx)
+            if isinstance(tones, str):
+                tones = json.loads(tones)
+
+            if not audio or not jsonx:
+                return Response(
+                    data={"error":"audio_file and json are required"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
+            data = {
+                "recorder": request.data.get("recorder"),
+                "json": jsonx,
+                "name": request.data.get("name") or audio.name or "audio.m4a",
+            }
+            if tones:
+                data["tones"] = tones
+
+            recorder: SystemRecorder = get_recorder(data["recorder"])
+
+            tg_id = jsonx["talkgroup"]
+            if not validate_upload(tg_id, recorder):
+                return Response(
+                    data={"error":"Not allowed to post this talkgroup"},
+                    status=status.HTTP_401_UNAUTHORIZED,
+                )
+        except (SystemRecorder.DoesNotExist, ValidationError):
+            return Response(
+                data={"error":"Not allowed to post this talkgroup"},
+                status=status.HTTP_401_UNAUTHORIZED,
+            )
+        except (ValueError, KeyError) as error:
+            return Response(str(error), status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            UUID = uuid.uuid4()
+            data["UUID"] = str(UUID)
+            data["audio_path"] = _store_transmission_audio(
+                audio, data["name"], recorder, tg_id, jsonx.get("talkgroup_tag", "")
+            )
+            new_stored_transmission_handler.delay(data)
+            logger.info(f"[+] Got new streamed tx - {UUID}", extra=data["json"])
+            return Response(data={"UUID": UUID}, status=status.HTTP_201_CREATED)
+        except Exception as error:
+            if settings.SEND_TELEMETRY:
+                sentry_sdk.set_context(
+                    "add_tx_data",
+                    {
+                        "data": data,
+                    },
+                )
+                sentry_sdk.capture_exception(error)
+
+            return Response(str(error), status=status.HTTP_400_BAD_REQUEST)
+
+
+class BatchCreate(APIView):
+    queryset = Transmission.objects.all()
+    serializer_class = TransmissionSerializer
+    permission_classes = [FeederFree]
+
+    @swagger_auto_schema(
+        tags=["Transmission"],
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            required=["recorder", "transmissions"],
+            properties={
+                "recorder": openapi.Schema(
+                    type=openapi.TYPE_STRING, description="Recorder Key"
+                ),
+                "transmissions": openapi.Schema(
+                    type=openapi.TYPE_ARRAY,
+                    description="Calls to ingest",
+                    items=openapi.Schema(
+                        type=openapi.TYPE_OBJECT,
+                        required=["json", "audio_file"],
+                        properties={
+                            "json": openapi.Schema(
+                                type=openapi.TYPE_OBJECT, description="Trunk-Recorder JSON"
+                            ),
+                            "audio_file": openapi.Schema(
+                                type=openapi.TYPE_STRING, description="M4A Base64"
+                            ),
+                            "tones": openapi.Schema(
+                                type=openapi.TYPE_OBJECT, description="Tones Info"
+                            ),
+                            "name": openapi.Schema(
+                                type=openapi.TYPE_STRING, description="Audio File Name"
+                            ),
+                        },
+                    ),
+                ),
+            },
+        ),
+    )
+    def post(self, request):
+        """
+        Transmission Batch Create EP
+
+        Queues every allowed call in the batch as a single ingest task,
+        rejected calls are returned by their index in the batch
+        """
+        from radio.tasks import new_transmission_batch_handler
+        from radio.helpers.utils import validate_upload
+
+        data = JSONParser().parse(request)
+
+        try:
+            transmissions: list = data["transmissions"]
+            if not isinstance(transmissions, list) or not transmissions:
+                return Response(
+                    data={"error":"transmissions must be a non empty list"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            if len(transmissions) > settings.TRANSMISSION_BATCH_MAX_SIZE:
+                return Response(
+                    data={"error":f"Batches are limited to {settings.TRANSMISSION_BATCH_MAX_SIZE} transmissions"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
+            recorder: SystemRecorder = get_recorder(data["recorder"])
+
+            allowed = {}
+            accepted = []
+            rejected = []
+            for index, item in enumerate(transmissions):
+                tg_id = item["json"]["talkgroup"]
+                if tg_id not in allowed:
+                    allowed[tg_id] = validate_upload(tg_id, recorder)
+
+                if allowed[tg_id]:
+                    item["UUID"] = str(uuid.uuid4())
+                    item.setdefault("name", "audio.m4a")
+                    accepted.append(item)
+                else:
+                    rejected.append(index)
+        except (SystemRecorder.DoesNotExist, ValidationError):
+            return Response(
+                data={"error":"Not allowed to post this talkgroup"},
+                status=status.HTTP_401_UNAUTHORIZED,
+            )
+        except (KeyError, TypeError) as error:
+            return Response(str(error), status=status.HTTP_400_BAD_REQUEST)
+
+        if not accepted:
+            return Response(
+                data={"error":"Not allowed to post this talkgroup", "rejected": rejected},
+                status=status.HTTP_401_UNAUTHORIZED,
+            )
+
+        try:
+            new_transmission_batch_handler.delay(
+                {"recorder": data["recorder"], "transmissions": accepted}
+            )
+            logger.info(f"[+] Got new tx batch - {len(accepted)} accepted, {len(rejected)} rejected")
+            return Response(
+                data={"UUIDs": [item["UUID"] for item in accepted], "rejected": rejected},
+                status=status.HTTP_201_CREATED
+            )
+        except Exception as error:
+            if settings.SEND_TELEMETRY:
+                sentry_sdk.set_context(
+                    "add_tx_batch_data",
+                    {
+                        "recorder": data["recorder"],
+                        "count": len(accepted),
+                    },
+                )
+                sentry_sdk.capture_exception(error)
+
+            return Response(str(error), status=status.HTTP_400_BAD_REQUEST)
+
+
 class View(APIView):
     queryset = Transmission.objects.all()
     serializer_class = TransmissionSerializer
@@ -210,15 +423,8 @@ class View(APIView):
         user: UserProfile = request.user.userProfile
 
         if not user.site_admin:
-            # pylint: disable=unused-variable
-            system_uuids, systems = get_user_allowed_systems(user.UUID)
-            if not transmission.system in systems:
+            if not get_user_access(user.UUID).can_read(transmission.talkgroup_id):
                 raise PermissionDenied
-            system: System = transmission.system
-            if system.enable_talkgroup_acls:
-                talkgroups_allowed = get_user_allowed_talkgroups(system, user.UUID)
-                if not transmission.talkgroup in talkgroups_allowed:
-                    raise PermissionDenied
 
         serializer = TransmissionSerializer(transmission)
         return Response(serializer.data)
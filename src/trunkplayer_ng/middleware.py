@@ -0,0 +1,36 @@
+import zlib
+
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import RequestDataTooBig, SuspiciousOperation
+
+
+class GZipRequestMiddleware:
+    """
+    Inflates request bodies sent with Content-Encoding: gzip
+
+    Forwarding instances gzip the transmissions and incidents they send, the
+    inflated body is held to DATA_UPLOAD_MAX_MEMORY_SIZE like any other body
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if request.META.get("HTTP_CONTENT_ENCODING", "").lower() == "gzip":
+            max_size = settings.DATA_UPLOAD_MAX_MEMORY_SIZE
+            inflater = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            try:
+                body = inflater.decompress(request.body, max_size or 0)
+            except zlib.error as error:
+                raise SuspiciousOperation(f"Invalid gzip request body - {error}")
+            if inflater.unconsumed_tail:
+                raise RequestDataTooBig("Inflated request body exceeded settings.DATA_UPLOAD_MAX_MEMORY_SIZE.")
+
+            request._body = body
+            request._stream = BytesIO(body)
+            request.META["CONTENT_LENGTH"] = str(len(body))
+            del request.META["HTTP_CONTENT_ENCODING"]
+
+        return self.get_response(request)
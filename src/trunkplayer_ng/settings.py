@@ -243,6 +243,7 @@ INSTALLED_APPS = [
 ######################################################################
 MIDDLEWARE = [
     "corsheaders.middleware.CorsMiddleware",
+    "trunkplayer_ng.middleware.GZipRequestMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     'django_session_timeout.middleware.SessionTimeoutMiddleware',
@@ -430,6 +431,155 @@ else:
     MEDIA_URL = "/mediafiles/"
     MEDIA_ROOT = os.path.join(BASE_DIR, "mediafiles")
 
+######################################################################
+# TRANSMISSION INGEST
+######################################################################
+# Maximum number of calls accepted by a single batch upload request
+TRANSMISSION_BATCH_MAX_SIZE = int(os.getenv("TRANSMISSION_BATCH_MAX_SIZE", "100"))
+
+######################################################################
+# TRANSMISSION FAN-OUT
+######################################################################
+# Sinks every new transmission is handed to, each is retried on its own when it fails
+TRANSMISSION_FANOUT_SINKS = [
+    "radio.helpers.fanout.WebSocketSink",
+    "radio.helpers.fanout.AlertSink",
+    "radio.helpers.fanout.MqttSink",
+    "radio.helpers.fanout.ForwarderSink",
+]
+
+######################################################################
+# SOCKET EMITTER
+######################################################################
+# Attempts at reaching the broker before a socket.io emit fails
+SOCKET_EMIT_MAX_RETRIES = int(os.getenv("SOCKET_EMIT_MAX_RETRIES", "3"))
+# Seconds between checks that a worker's emitter connection is still up
+SOCKET_EMIT_HEALTH_CHECK = float(os.getenv("SOCKET_EMIT_HEALTH_CHECK", "30"))
+# Also push every transmission to the shared transmission_party_bus room for clients
+# that have not moved to per-talkgroup subscriptions (register_tx_source)
+SOCKET_TRANSMISSION_PARTY_BUS = os.getenv("SOCKET_TRANSMISSION_PARTY_BUS", "True").lower() in SHITS_VALID_YO
+# Seconds a serialized transmission is shared between socket tx_request(s) before it is reloaded
+SOCKET_TX_CACHE_TTL = int(os.getenv("SOCKET_TX_CACHE_TTL", "30"))
+# Seconds a socket keeps its user's readable talkgroups before checking the ACLs again
+SOCKET_SESSION_ACCESS_TTL = int(os.getenv("SOCKET_SESSION_ACCESS_TTL", "60"))
+# Maximum number of transmissions answered by a single tx_request_batch
+SOCKET_TX_BATCH_MAX_SIZE = int(os.getenv("SOCKET_TX_BATCH_MAX_SIZE", "100"))
+# Seconds transmission_party_bus pushes are collected and sent as one list, 0 sends each on its own
+# Only turn this on once the web clients accept a list on that event
+SOCKET_COALESCE_WINDOW = float(os.getenv("SOCKET_COALESCE_WINDOW", "0"))
+# Pushes per coalesced emit, a full batch is sent without waiting for the window
+SOCKET_COALESCE_MAX_SIZE = int(os.getenv("SOCKET_COALESCE_MAX_SIZE", "100"))
+# Flushes a coalesced room's pushes are retried on before they are dropped
+SOCKET_COALESCE_MAX_ATTEMPTS = int(os.getenv("SOCKET_COALESCE_MAX_ATTEMPTS", "3"))
+
+######################################################################
+# USER ALERTS
+######################################################################
+# Longest alert trigger_time (seconds) answered from the per-second rate counters,
+# longer windows, and every window without a shared cache backend, are counted in the DB
+ALERT_RATE_MAX_WINDOW = int(os.getenv("ALERT_RATE_MAX_WINDOW", "300"))
+# Seconds alerts for the same Apprise URL are collected and sent as one digest
+APPRISE_DIGEST_WINDOW = float(os.getenv("APPRISE_DIGEST_WINDOW", "5"))
+# Apprise sends in flight at once per worker
+APPRISE_CONCURRENCY = int(os.getenv("APPRISE_CONCURRENCY", "20"))
+# Minimum seconds between sends to one Apprise URL, doubled after each failed send
+APPRISE_MIN_INTERVAL = float(os.getenv("APPRISE_MIN_INTERVAL", "1"))
+# Longest backoff (seconds) after failed sends to an Apprise URL
+APPRISE_BACKOFF_MAX = float(os.getenv("APPRISE_BACKOFF_MAX", "300"))
+# Failed sends to an Apprise URL before its queued messages are dropped
+APPRISE_MAX_ATTEMPTS = int(os.getenv("APPRISE_MAX_ATTEMPTS", "5"))
+
+######################################################################
+# FORWARDING
+######################################################################
+# Keep-alive connections each worker holds open to one SystemForwarder
+FORWARDING_POOL_SIZE = int(os.getenv("FORWARDING_POOL_SIZE", "10"))
+# Seconds to connect to / wait on a response from a remote instance
+FORWARDING_CONNECT_TIMEOUT = float(os.getenv("FORWARDING_CONNECT_TIMEOUT", "5"))
+FORWARDING_READ_TIMEOUT = float(os.getenv("FORWARDING_READ_TIMEOUT", "30"))
+# Gzip forwarded bodies, only for remotes that run GZipRequestMiddleware
+FORWARDING_GZIP = os.getenv("FORWARDING_GZIP", "False").lower() in SHITS_VALID_YO
+# Failures in a row before a forwarder is paused, and for how many seconds
+FORWARDING_BREAKER_THRESHOLD = int(os.getenv("FORWARDING_BREAKER_THRESHOLD", "5"))
+FORWARDING_BREAKER_COOLDOWN = float(os.getenv("FORWARDING_BREAKER_COOLDOWN", "30"))
+
+######################################################################
+# MQTT
+######################################################################
+# QoS launch_mqtt publishes transmissions with
+MQTT_PUBLISH_QOS = int(os.getenv("MQTT_PUBLISH_QOS", "0"))
+# Transmissions waiting per MQTT server before the RabbitMQ consumer is held back
+MQTT_PUBLISH_QUEUE_SIZE = int(os.getenv("MQTT_PUBLISH_QUEUE_SIZE", "1000"))
+# Seconds the consumer waits on a full MQTT server queue before dropping for that server
+MQTT_PUBLISH_QUEUE_TIMEOUT = float(os.getenv("MQTT_PUBLISH_QUEUE_TIMEOUT", "30"))
+# Unacknowledged QoS 1/2 publishes per MQTT server
+MQTT_MAX_INFLIGHT = int(os.getenv("MQTT_MAX_INFLIGHT", "100"))
+# Longest wait (seconds) between reconnect attempts to an MQTT server
+MQTT_RECONNECT_MAX_DELAY = int(os.getenv("MQTT_RECONNECT_MAX_DELAY", "60"))
+# Seconds between full reloads of the MQTT servers, for cache backends that are not shared
+MQTT_RELOAD_INTERVAL = float(os.getenv("MQTT_RELOAD_INTERVAL", "60"))
+# gevent workers launch_mqtt hands RabbitMQ messages to
+MQTT_CONSUMER_WORKERS = int(os.getenv("MQTT_CONSUMER_WORKERS", "4"))
+# Unacknowledged messages launch_mqtt takes from RabbitMQ at once
+MQTT_CONSUMER_PREFETCH = int(os.getenv("MQTT_CONSUMER_PREFETCH", "100"))
+# Seconds a message launch_mqtt failed to publish waits before it is retried
+MQTT_RETRY_DELAY = float(os.getenv("MQTT_RETRY_DELAY", "30"))
+# RabbitMQ connections each worker keeps open for handing transmissions to launch_mqtt
+MQTT_PUBLISHER_POOL_SIZE = int(os.getenv("MQTT_PUBLISHER_POOL_SIZE", "4"))
+# Wait for RabbitMQ to confirm each transmission handed to launch_mqtt
+MQTT_PUBLISHER_CONFIRMS = os.getenv("MQTT_PUBLISHER_CONFIRMS", "True").lower() in SHITS_VALID_YO
+
+######################################################################
+# TRANSMISSION PRUNING
+######################################################################
+# Transmissions deleted per chunk (one short transaction each)
+PRUNE_BATCH_SIZE = int(os.getenv("PRUNE_BATCH_SIZE", "1000"))
+# Upper bound on deleted rows per second across a prune run, 0 disables the limit
+PRUNE_MAX_ROWS_PER_SECOND = int(os.getenv("PRUNE_MAX_ROWS_PER_SECOND", "5000"))
+# Seconds a prune run may take before it stops and resumes from its checkpoint next run, 0 disables
+PRUNE_RUN_SECONDS = int(os.getenv("PRUNE_RUN_SECONDS", "240"))
+
+######################################################################
+# AUDIO GC
+######################################################################
+# Files removed per batch (capped at 1000, the S3 DeleteObjects limit)
+AUDIO_GC_BATCH_SIZE = int(os.getenv("AUDIO_GC_BATCH_SIZE", "1000"))
+# Batches per GC run before it queues a follow up run
+AUDIO_GC_MAX_BATCHES = int(os.getenv("AUDIO_GC_MAX_BATCHES", "50"))
+# Seconds deletes are collected before a GC run starts
+AUDIO_GC_DELAY = int(os.getenv("AUDIO_GC_DELAY", "60"))
+# Failed removals are retried this many times, then left in the admin for review
+AUDIO_GC_MAX_ATTEMPTS = int(os.getenv("AUDIO_GC_MAX_ATTEMPTS", "5"))
+# Seconds before a failed removal is retried, doubled after each failed attempt
+AUDIO_GC_RETRY_DELAY = int(os.getenv("AUDIO_GC_RETRY_DELAY", "300"))
+
+######################################################################
+# CACHES
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+######################################################################
+# Point this at a shared backend (memcached, redis, db) so cache invalidations
+# reach every web and worker process, the default is per-process memory.
+# Without a shared backend recorder API keys, ACLs and upload policies are only
+# cached for RESOLUTION_CACHE_VERSION_CHECK seconds so revocations apply everywhere,
+# and the user alert index is rebuilt from the DB on every check. A shared backend
+# is required for production
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv("CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": os.getenv("CACHE_LOCATION", "trunkplayer-ng"),
+    }
+}
+
+# LocMem culls at 300 entries by default, far fewer than the alert rate counters keep
+if CACHES["default"]["BACKEND"].endswith("LocMemCache"):
+    CACHES["default"]["OPTIONS"] = {"MAX_ENTRIES": int(os.getenv("CACHE_MAX_ENTRIES", "200000"))}
+
+# Seconds a process keeps a resolved recorder/system/talkgroup before reloading it
+RESOLUTION_CACHE_TTL = int(os.getenv("RESOLUTION_CACHE_TTL", "300"))
+
+# Seconds between checks of the shared cache version for invalidations
+RESOLUTION_CACHE_VERSION_CHECK = float(os.getenv("RESOLUTION_CACHE_VERSION_CHECK", "1"))
+
 ######################################################################
 # DRF REST_FRAMEWORK Settings
 # https://www.django-rest-framework.org/#installation
@@ -721,6 +871,12 @@ CELERY_TASK_ROUTES = {
     "radio.tasks.new_transmission_handler": {
         "queue": "transmission_ingest"
     },
+    "radio.tasks.new_stored_transmission_handler": {
+        "queue": "transmission_ingest"
+    },
+    "radio.tasks.new_transmission_batch_handler": {
+        "queue": "transmission_ingest"
+    },
     "radio.tasks.forward_Transmission": {
         "queue": "transmission_forwarding"
     },
@@ -748,9 +904,18 @@ CELERY_TASK_ROUTES = {
     "radio.tasks.broadcast_transmission": {
         "queue": "tranmission_push"
     },
+    "radio.tasks.fan_out_transmissions": {
+        "queue": "tranmission_push"
+    },
     "radio.tasks.send_transmission_signal": {
         "queue": "tranmission_push"
     },
+    "radio.tasks.collect_audio_garbage": {
+        "queue": "transmission_cleanup"
+    },
+    "radio.tasks.scan_orphan_audio": {
+        "queue": "transmission_cleanup"
+    },
 }
 
 REST_AUTH = {
@@ -759,6 +924,10 @@ REST_AUTH = {
 }
 
 MQTT_AMQP_QUQUE = "tpng_mqtt"
+# Messages launch_mqtt could not read
+MQTT_DEAD_LETTER_QUEUE = f"{MQTT_AMQP_QUQUE}.dead"
+# Messages launch_mqtt failed to publish wait here before going back on the queue
+MQTT_RETRY_QUEUE = f"{MQTT_AMQP_QUQUE}.retry"
 
 # URL for the message broker. Environment variable 'CELERY_BROKER_URL' is used to configure this.
 # The message broker is a service used to queue and distribute tasks.